@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 from decouple import config, Csv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
        "corsheaders.middleware.CorsMiddleware",   # ✅ must be at the top
+    "core.middleware.RequestMetricsMiddleware",  # Server-Timing + per-request log line
+    "core.middleware.CompressionMiddleware",     # br/gzip for large responses
        #'core.middleware.FirebaseAuthMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -65,10 +68,34 @@ TEMPLATES = [
     },
 ]
 
-# Use correct ASGI app when using Channels
-WSGI_APPLICATION = 'backend.asgi.application'
+# Production serves ASGI (gunicorn + uvicorn workers); wsgi.py stays for tooling
+WSGI_APPLICATION = 'backend.wsgi.application'
+
+ASGI_APPLICATION = 'backend.asgi.application'
 
 # Use Redis for pub/sub
+# Without REDIS_URL events only reach sockets served by the same process.
+REDIS_URL = config("REDIS_URL", default="")
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+# Shared cache (supervisor site scopes, etc.); per-process memory without Redis
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 DATABASES = {
     "default": {
@@ -135,7 +162,21 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': ['core.auth.FirebaseAuthentication'],
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
     # Disable global pagination for admin debug / development so full lists are returned.
+    # Shifts, attendance and incidents opt in to keyset pagination via ?page_size= / ?cursor=
+    # (see core.pagination.KeysetPagination).
     'DEFAULT_PAGINATION_CLASS': None,
+    # JSON through orjson (when installed); `Accept: application/msgpack` for MessagePack
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'core.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
  
 CORS_ALLOWED_ORIGINS = [
@@ -146,6 +187,9 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True 
+# Let the portals read the delta-sync token, ETags and timings, and send conditional GETs
+CORS_EXPOSE_HEADERS = ["X-Sync-Token", "ETag", "Server-Timing", "Idempotent-Replayed"]
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match", "idempotency-key")
 
 #GOOGLE_APPLICATION_CREDENTIALS = config("GOOGLE_APPLICATION_CREDENTIALS", default=None)
 #if GOOGLE_APPLICATION_CREDENTIALS:
@@ -153,3 +197,64 @@ CORS_ALLOW_CREDENTIALS = True
 
  
 FIREBASE_CONFIG = os.path.join(BASE_DIR,"firebase-service-account.json")
+
+# Verified ID tokens are cached per process until their `exp` (or the TTL, if sooner);
+# profile edits invalidate them in every process through a stamp in the shared cache
+FIREBASE_TOKEN_CACHE_SIZE = config("FIREBASE_TOKEN_CACHE_SIZE", cast=int, default=1024)
+FIREBASE_TOKEN_CACHE_TTL = config("FIREBASE_TOKEN_CACHE_TTL", cast=int, default=300)
+
+# Firebase Admin calls go through this client (core.firebase_client.FakeFirebaseClient for local runs)
+FIREBASE_CLIENT = config("FIREBASE_CLIENT", default="core.firebase_client.FirebaseAdminClient")
+
+# Firebase Admin calls are queued (core.FirebaseJob) and run by `manage.py run_firebase_jobs`
+FIREBASE_JOB_BATCH_SIZE = config("FIREBASE_JOB_BATCH_SIZE", cast=int, default=100)
+FIREBASE_JOB_MAX_ATTEMPTS = config("FIREBASE_JOB_MAX_ATTEMPTS", cast=int, default=8)
+FIREBASE_JOB_BACKOFF_BASE = config("FIREBASE_JOB_BACKOFF_BASE", cast=int, default=5)
+FIREBASE_JOB_BACKOFF_MAX = config("FIREBASE_JOB_BACKOFF_MAX", cast=int, default=3600)
+# Seconds a worker's claimed jobs stay hidden from other workers while it calls Firebase
+FIREBASE_JOB_CLAIM_TIMEOUT = config("FIREBASE_JOB_CLAIM_TIMEOUT", cast=int, default=300)
+# Queued account creations carry a PBKDF2-SHA256 hash of the password, never the password
+FIREBASE_PASSWORD_HASH_ROUNDS = config("FIREBASE_PASSWORD_HASH_ROUNDS", cast=int, default=100000)
+
+# Extra metres allowed beyond a site's geofence_radius_m for phone GPS error
+GEOFENCE_TOLERANCE_M = config("GEOFENCE_TOLERANCE_M", cast=int, default=25)
+
+# `manage.py classify_attendance`: check-ins later than shift start + grace are marked late
+ATTENDANCE_LATE_GRACE_MINUTES = config("ATTENDANCE_LATE_GRACE_MINUTES", cast=int, default=10)
+
+# POST /api/attendance/sync/: offline check-in/out batches (core.attendance_sync)
+ATTENDANCE_SYNC_MAX_EVENTS = config("ATTENDANCE_SYNC_MAX_EVENTS", cast=int, default=200)
+ATTENDANCE_SYNC_MAX_AGE_HOURS = config("ATTENDANCE_SYNC_MAX_AGE_HOURS", cast=int, default=72)
+
+# Seconds a check-in/check-out response is kept for replay under its Idempotency-Key (core.idempotency)
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", cast=int, default=86400)
+
+# Request instrumentation (core.middleware.RequestMetricsMiddleware): flag a SQL shape
+# repeated this many times in one request as N+1, and any query slower than SLOW_QUERY_MS
+N_PLUS_ONE_THRESHOLD = config("N_PLUS_ONE_THRESHOLD", cast=int, default=10)
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", cast=int, default=100)
+
+# Logging: JSON lines from the "core" loggers, written by a background thread (core.log).
+# The per-request auth logs are sampled; warnings and errors are always kept.
+LOG_LEVEL = config("LOG_LEVEL", default="INFO")
+AUTH_LOG_SAMPLE_RATE = config("AUTH_LOG_SAMPLE_RATE", cast=float, default=0.1)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "core.log.JsonFormatter"},
+    },
+    "filters": {
+        "auth_sample": {"()": "core.log.SampleFilter", "rate": AUTH_LOG_SAMPLE_RATE},
+    },
+    "handlers": {
+        "queue": {"class": "core.log.QueuedStreamHandler", "formatter": "json"},
+    },
+    "loggers": {
+        "core": {"handlers": ["queue"], "level": LOG_LEVEL, "propagate": False},
+        "core.auth": {"filters": ["auth_sample"]},
+    },
+}
+
+# core.middleware.CompressionMiddleware: responses smaller than this go out uncompressed
+COMPRESS_MIN_BYTES = config("COMPRESS_MIN_BYTES", cast=int, default=1024)
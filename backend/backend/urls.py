@@ -2,7 +2,7 @@ from django import core
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from core.views import SiteViewSet, WorkShiftViewSet, AttendanceViewSet, IncidentViewSet, whoami
+from core.views import SiteViewSet, WorkShiftViewSet, AttendanceViewSet, IncidentViewSet
 from core import views as core_views
 from core import views 
 router = DefaultRouter()
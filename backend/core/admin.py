@@ -1,3 +1,16 @@
 from django.contrib import admin
+from django.utils.timezone import now
 
-# Register your models here.
+from .models import FirebaseJob
+
+
+@admin.register(FirebaseJob)
+class FirebaseJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "action", "uid", "status", "attempts", "available_at", "last_error")
+    list_filter = ("status", "action")
+    search_fields = ("uid",)
+    actions = ["retry"]
+
+    @admin.action(description="Retry selected jobs now")
+    def retry(self, request, queryset):
+        queryset.update(status="pending", attempts=0, available_at=now())
@@ -7,3 +7,7 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals
+        from django.db.backends.signals import connection_created
+        from core.instrumentation import install_query_recorder
+
+        connection_created.connect(install_query_recorder, dispatch_uid="core_query_recorder")
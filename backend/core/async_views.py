@@ -0,0 +1,146 @@
+# core/async_views.py
+"""
+Async versions of the hottest guard endpoints (whoami, check-in, check-out).
+
+They are plain Django async views rather than DRF actions, because DRF's
+dispatch is sync-only; under ASGI a burst of check-ins at shift change
+then waits on the database, not on a free worker thread. Responses keep
+the same shape as the DRF endpoints they replace. Check-in and check-out
+honour an `Idempotency-Key` header (see core.idempotency).
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.utils.timezone import now
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+
+from .attendance import close_open_record, drop_absences
+from .geofence import fence_violation, parse_point
+from .idempotency import run_once
+from .models import AttendanceRecord, WorkShift
+from .serializers import AttendanceSerializer
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+def _payload(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+def _point(data):
+    """Returns (point or None, None) or (None, error response)."""
+    try:
+        return parse_point(data.get("lat"), data.get("lng")), None
+    except (TypeError, ValueError):
+        return None, _json({"error": "Invalid coordinates"}, status.HTTP_400_BAD_REQUEST)
+
+
+async def _authenticate(request, role=None):
+    """Returns (profile, None) or (None, error response), mirroring DRF's 403s."""
+    from .auth import aauthenticate_id_token, bearer_token  # defer Firebase init to first use
+
+    id_token = bearer_token(request)
+    if id_token is None:
+        return None, _json({"detail": "Authentication credentials were not provided."}, status.HTTP_403_FORBIDDEN)
+    try:
+        user = await aauthenticate_id_token(id_token)
+    except exceptions.AuthenticationFailed as e:
+        return None, _json({"detail": str(e.detail)}, status.HTTP_403_FORBIDDEN)
+    if role and user.role != role:
+        return None, _json({"detail": "You do not have permission to perform this action."}, status.HTTP_403_FORBIDDEN)
+    request.user = user
+    return user, None
+
+
+@csrf_exempt
+@require_GET
+async def whoami(request):
+    user, error = await _authenticate(request)
+    if error:
+        return error
+    return _json({
+        "uid": user.uid,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role,
+    })
+
+
+@csrf_exempt
+@require_POST
+async def check_in(request):
+    user, error = await _authenticate(request, role="guard")
+    if error:
+        return error
+    return await run_once(request, user, lambda: _check_in(request, user))
+
+
+async def _check_in(request, user):
+    data = _payload(request)
+    point, error = _point(data)
+    if error:
+        return error
+
+    shift = await WorkShift.objects.select_related("site").filter(pk=data.get("shift") or 0).afirst()
+    if shift is None:
+        return _json({"error": "Unknown shift"}, status.HTTP_400_BAD_REQUEST)
+    violation = fence_violation(shift.site, point)
+    if violation:
+        return _json(violation, status.HTTP_400_BAD_REQUEST)
+
+    lat, lng = point or (None, None)
+    try:
+        ar = await AttendanceRecord.objects.acreate(
+            shift=shift,
+            user=user,
+            check_in_time=now(),
+            check_in_lat=lat,
+            check_in_lng=lng,
+        )
+    except IntegrityError:
+        # attendance_one_open_per_shift: a double tap or retry lost the race
+        return _json({"error": "Already checked in to this shift"}, status.HTTP_409_CONFLICT)
+    await sync_to_async(drop_absences)(user, [shift.pk])
+    # shift/site/user are already attached, so serializing does no I/O
+    return _json(AttendanceSerializer(ar).data)
+
+
+@csrf_exempt
+@require_POST
+async def check_out(request):
+    user, error = await _authenticate(request, role="guard")
+    if error:
+        return error
+    return await run_once(request, user, lambda: _check_out(request, user))
+
+
+async def _check_out(request, user):
+    data = _payload(request)
+    point, error = _point(data)
+    if error:
+        return error
+
+    shift = await WorkShift.objects.select_related("site").filter(pk=data.get("shift") or 0).afirst()
+    if shift is None:
+        return _json({"error": "No open check-in record found"}, status.HTTP_400_BAD_REQUEST)
+    violation = fence_violation(shift.site, point)
+    if violation:
+        return _json(violation, status.HTTP_400_BAD_REQUEST)
+
+    ar = await sync_to_async(close_open_record)(shift, user, now(), point)
+    if ar is None:
+        return _json({"error": "No open check-in record found"}, status.HTTP_400_BAD_REQUEST)
+    return _json(AttendanceSerializer(ar).data)
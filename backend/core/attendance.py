@@ -0,0 +1,64 @@
+# core/attendance.py
+"""
+Check-out as one conditional UPDATE ... RETURNING.
+
+The `check_out_time IS NULL` condition is re-evaluated under the row
+lock, so of two concurrent check-outs for the same record exactly one
+updates it and the other gets no row back; nothing is read first and
+then overwritten. The partial unique constraint on open records
+guarantees there is at most one row to update.
+"""
+from django.db import connection
+
+from .events import publish_change
+from .models import AttendanceRecord
+from .sync import next_change_seq
+from .timesheets import bucket_for, refresh_buckets
+
+_SET = ("check_out_time", "check_out_lat", "check_out_lng")
+
+
+def _close_sql():
+    meta, quote = AttendanceRecord._meta, connection.ops.quote_name
+    # Postgres draws (and leases) the change marker inside the same statement
+    seq = "core_next_change_seq()" if connection.vendor == "postgresql" else "%s"
+    return (
+        f"UPDATE {quote(meta.db_table)} "
+        f"SET {', '.join(f'{quote(name)} = %s' for name in _SET)}, {quote('change_seq')} = {seq} "
+        f"WHERE {quote('shift_id')} = %s AND {quote('user_id')} = %s AND {quote('check_out_time')} IS NULL "
+        f"RETURNING {', '.join(quote(field.column) for field in meta.concrete_fields)}"
+    )
+
+
+def drop_absences(user, shift_ids):
+    """
+    Delete the classifier's "absent" records of `user` on `shift_ids` once a
+    real check-in exists for them (e.g. one synced from offline after the
+    shift was classified). Row by row, so the delete signals push the
+    change, tombstone it and fix the rollup.
+    """
+    AttendanceRecord.objects.filter(user=user, shift_id__in=shift_ids, status="absent").delete()
+
+
+def close_open_record(shift, user, when, point):
+    """
+    Close the user's open record for `shift` and return it (with `shift`
+    and `user` attached), or None if there is no open record.
+    """
+    lat, lng = point or (None, None)
+    meta = AttendanceRecord._meta
+    params = [meta.get_field(name).get_db_prep_save(value, connection) for name, value in zip(_SET, (when, lat, lng))]
+    if connection.vendor != "postgresql":
+        params.append(next_change_seq())
+    params += [shift.pk, user.pk]
+
+    # raw() maps the RETURNING row onto a model instance with the usual field conversions
+    record = next(iter(AttendanceRecord.objects.raw(_close_sql(), params)), None)
+    if record is None:
+        return None
+    record.shift, record.user = shift, user
+
+    # No save(), so no post_save signal: push and roll up here
+    publish_change("attendance", "updated", record.pk, shift.site_id, user.pk, record.change_seq)
+    refresh_buckets([bucket_for(user.pk, shift.site_id, record.check_in_time)])
+    return record
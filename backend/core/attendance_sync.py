@@ -0,0 +1,202 @@
+# core/attendance_sync.py
+"""
+Batch check-in/check-out for guards who queued events while offline.
+
+Every event carries a client-generated UUID, stored on the record it
+opened or closed, so replaying a batch (or part of one) after a lost
+response is harmless: events already applied come back as "duplicate".
+A batch is applied in one transaction with one bulk INSERT and one bulk
+UPDATE, using the same rules as the single check-in/check-out views.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .attendance import drop_absences
+from .events import publish_change
+from .geofence import fence_violation, parse_point
+from .models import AttendanceRecord, WorkShift
+from .sync import next_change_seq
+from .timesheets import bucket_for, refresh_buckets
+
+MAX_EVENTS = getattr(settings, "ATTENDANCE_SYNC_MAX_EVENTS", 200)
+MAX_AGE = timedelta(hours=getattr(settings, "ATTENDANCE_SYNC_MAX_AGE_HOURS", 72))
+# Passes over a batch that keeps colliding with concurrent writes before giving up on it
+MAX_PASSES = 3
+CLOCK_SKEW = timedelta(minutes=5)  # device clocks running a little fast
+
+
+class EventSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    type = serializers.ChoiceField(choices=("check_in", "check_out"))
+    shift = serializers.IntegerField()
+    timestamp = serializers.DateTimeField()
+    lat = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    lng = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    def validate_timestamp(self, value):
+        current = now()
+        if value > current + CLOCK_SKEW:
+            raise serializers.ValidationError("Timestamp is in the future.")
+        if value < current - MAX_AGE:
+            raise serializers.ValidationError("Event is too old to sync.")
+        return value
+
+    def validate(self, attrs):
+        try:
+            attrs["point"] = parse_point(attrs.pop("lat", None), attrs.pop("lng", None))
+        except (TypeError, ValueError):
+            raise serializers.ValidationError({"lat": "Invalid coordinates"})
+        return attrs
+
+
+def parse_events(request):
+    """The event list from `{"events": [...]}` or a bare JSON list."""
+    data = request.data
+    if isinstance(data, dict):
+        data = data.get("events")
+    if not isinstance(data, list) or not data:
+        raise ValidationError({"events": "Send a non-empty list of events."})
+    if len(data) > MAX_EVENTS:
+        raise ValidationError({"events": f"At most {MAX_EVENTS} events per sync."})
+    return data
+
+
+def apply_events(user, raw_events):
+    """
+    Apply a guard's queued events in timestamp order and return one outcome
+    per event, in request order: "applied" or "duplicate" with the record
+    id, or "rejected" with the error.
+    """
+    outcomes = [None] * len(raw_events)
+    events, seen = [], set()
+    for index, raw in enumerate(raw_events):
+        serializer = EventSerializer(data=raw if isinstance(raw, dict) else {})
+        if not serializer.is_valid():
+            outcomes[index] = {"id": raw.get("id") if isinstance(raw, dict) else None,
+                               "status": "rejected", "error": serializer.errors}
+            continue
+        event = serializer.validated_data
+        if event["id"] in seen:
+            outcomes[index] = {"id": event["id"], "status": "rejected", "error": "Duplicate id in this batch."}
+            continue
+        seen.add(event["id"])
+        events.append((index, event))
+    events.sort(key=lambda item: item[1]["timestamp"])
+
+    for _ in range(MAX_PASSES):
+        try:
+            results = _apply_batch(user, events)
+            break
+        except IntegrityError:
+            # A concurrent replay or check-in won the insert; the next pass sees its rows
+            continue
+    else:
+        # Events are idempotent, so the client can simply send them again
+        results = {index: {"id": event["id"], "status": "rejected", "error": "Conflicting sync in progress; retry."}
+                   for index, event in events}
+    for index, outcome in results.items():
+        outcomes[index] = outcome
+    return outcomes
+
+
+@transaction.atomic
+def _apply_batch(user, events):
+    ids = [event["id"] for _, event in events]
+    applied = {}
+    for record_id, check_in_event, check_out_event in (
+        AttendanceRecord.objects
+        .filter(Q(check_in_event__in=ids) | Q(check_out_event__in=ids), user=user)
+        .values_list("id", "check_in_event", "check_out_event")
+    ):
+        for event_id in (check_in_event, check_out_event):
+            if event_id is not None:
+                applied[event_id] = record_id
+
+    shift_ids = {event["shift"] for _, event in events}
+    shifts = WorkShift.objects.select_related("site").in_bulk(shift_ids)
+    # Latest open record per shift; locked so a concurrent check-out can't close it twice
+    open_records = {}
+    for record in (
+        AttendanceRecord.objects.select_for_update()
+        .filter(user=user, shift_id__in=shift_ids, check_out_time__isnull=True)
+        .order_by("check_in_time")
+    ):
+        open_records[record.shift_id] = record
+
+    created, updated, outcomes, touched = [], {}, {}, {}
+    for index, event in events:
+        if event["id"] in applied:
+            outcomes[index] = {"id": event["id"], "status": "duplicate", "record": applied[event["id"]]}
+            continue
+        record, error = _apply(user, event, shifts.get(event["shift"]), open_records, created, updated)
+        if error:
+            outcomes[index] = {"id": event["id"], "status": "rejected", **error}
+        else:
+            touched[index] = (event["id"], record)
+    if not touched:
+        return outcomes
+
+    seq = next_change_seq()
+    for record in [*created, *updated.values()]:
+        record.change_seq = seq
+    AttendanceRecord.objects.bulk_create(created)
+    # A check-in synced after the classifier marked the shift missed replaces that "absent" record
+    drop_absences(user, {record.shift_id for record in created})
+    AttendanceRecord.objects.bulk_update(
+        list(updated.values()),
+        ["check_out_time", "check_out_lat", "check_out_lng", "check_out_event", "change_seq"],
+    )
+
+    # bulk writes skip the post_save signal, so push and roll up here
+    for action, records in (("created", created), ("updated", updated.values())):
+        for record in records:
+            publish_change("attendance", action, record.pk, shifts[record.shift_id].site_id, user.id, seq)
+    refresh_buckets([
+        bucket_for(user.id, shifts[record.shift_id].site_id, record.check_in_time)
+        for record in [*created, *updated.values()] if record.check_out_time
+    ])
+
+    # New records only have their pk after the bulk INSERT
+    for index, (event_id, record) in touched.items():
+        outcomes[index] = {"id": event_id, "status": "applied", "record": record.pk}
+    return outcomes
+
+
+def _apply(user, event, shift, open_records, created, updated):
+    """Apply one event to the in-memory state; returns (record, None) or (None, error payload)."""
+    if shift is None:
+        return None, {"error": "Unknown shift"}
+    violation = fence_violation(shift.site, event["point"])
+    if violation:
+        return None, violation
+    lat, lng = event["point"] or (None, None)
+
+    if event["type"] == "check_in":
+        if shift.pk in open_records:
+            return None, {"error": "Already checked in to this shift"}
+        record = AttendanceRecord(
+            shift=shift, user=user, check_in_time=event["timestamp"],
+            check_in_lat=lat, check_in_lng=lng, check_in_event=event["id"],
+        )
+        created.append(record)
+        open_records[shift.pk] = record
+        return record, None
+
+    record = open_records.get(shift.pk)
+    if record is None:
+        return None, {"error": "No open check-in record found"}
+    if event["timestamp"] < record.check_in_time:
+        return None, {"error": "Check-out is before the check-in"}
+    record.check_out_time = event["timestamp"]
+    record.check_out_lat, record.check_out_lng = lat, lng
+    record.check_out_event = event["id"]
+    if record.pk is not None:
+        updated[record.pk] = record
+    del open_records[shift.pk]
+    return record, None
@@ -1,11 +1,15 @@
 # backend/core/auth.py
+import logging
 import os
 import firebase_admin
 from firebase_admin import auth as fb_auth
 from rest_framework import authentication, exceptions
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from .models import UserProfile
+from . import token_cache
+from .instrumentation import span
 from firebase_admin import credentials, auth
 # Init admin SDK once
 #BASE_DIR = settings.BASE_DIR
@@ -14,37 +18,107 @@ from firebase_admin import credentials, auth
     
 cred = credentials.Certificate(settings.FIREBASE_CONFIG) 
 firebase_app = firebase_admin.initialize_app(cred)
+
+logger = logging.getLogger(__name__)
+
+
+def _profile_defaults(decoded):
+    email = decoded.get('email', '')
+    return {'email': email, 'full_name': email.split('@')[0], 'role': 'guard'}
+
+
+def _claimed_role(decoded):
+    # If you use Firebase custom claims for role, sync it:
+    return decoded.get('role') or decoded.get('claims', {}).get('role')
+
+
+def _verify(id_token):
+    try:
+        with span("firebase"):
+            decoded = fb_auth.verify_id_token(id_token)
+    except Exception as e:
+        logger.warning("Token verification failed: %s", e, extra={"error": type(e).__name__})
+        raise exceptions.AuthenticationFailed('Invalid Firebase ID token')
+    return decoded
+
+
+def authenticate_id_token(id_token):
+    """
+    Verify a Firebase ID token and resolve its UserProfile.
+    Used by the DRF authentication class.
+    """
+    with span("auth"):
+        return _authenticate_id_token(id_token)
+
+
+def _authenticate_id_token(id_token):
+    # Fast path: token already verified and profile resolved in this process
+    cache_key = token_cache.token_key(id_token)
+    profile = token_cache.get_profile(cache_key)
+    if profile is not None:
+        return profile
+
+    decoded = _verify(id_token)
+    # Stamp first: an edit committed while we load the profile then invalidates this entry
+    version = token_cache.profile_version(decoded['uid'])
+    # Ensure local profile exists; role can come from custom claims or DB
+    profile, _ = UserProfile.objects.get_or_create(uid=decoded['uid'], defaults=_profile_defaults(decoded))
+    role = _claimed_role(decoded)
+    if role and role != profile.role:
+        profile.role = role
+        profile.save()
+
+    token_cache.set_profile(cache_key, profile, decoded.get('exp'), version)
+    return profile
+
+
+async def aauthenticate_id_token(id_token):
+    """
+    Async twin of authenticate_id_token for the async views and the push
+    sockets (core.consumers). Signature verification (certificate fetch +
+    RSA) runs in a worker thread so it never blocks the event loop; the
+    profile upsert uses the async ORM.
+    """
+    with span("auth"):
+        return await _aauthenticate_id_token(id_token)
+
+
+async def _aauthenticate_id_token(id_token):
+    cache_key = token_cache.token_key(id_token)
+    profile = await token_cache.aget_profile(cache_key)
+    if profile is not None:
+        return profile
+
+    decoded = await sync_to_async(_verify, thread_sensitive=False)(id_token)
+    version = await token_cache.aprofile_version(decoded['uid'])
+    profile, _ = await UserProfile.objects.aget_or_create(uid=decoded['uid'], defaults=_profile_defaults(decoded))
+    role = _claimed_role(decoded)
+    if role and role != profile.role:
+        profile.role = role
+        await profile.asave()
+
+    token_cache.set_profile(cache_key, profile, decoded.get('exp'), version)
+    return profile
+
+
+def bearer_token(request):
+    """Raw ID token from an `Authorization: Bearer ...` header, or None."""
+    auth_header = request.META.get('HTTP_AUTHORIZATION')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split('Bearer ')[1]
+
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
     
     
     def authenticate(self, request):
-        print("🔥 FirebaseAuthentication.authenticate() was called")
-
-        auth_header = request.META.get('HTTP_AUTHORIZATION')
-        print(auth_header)
-        if not auth_header or not auth_header.startswith('Bearer '):
-            print("No valid Authorization header found")
+        id_token = bearer_token(request)
+        if id_token is None:
+            logger.debug("No bearer token", extra={"path": request.path})
             return None
-        id_token = auth_header.split('Bearer ')[1]
-        try:
-            decoded = fb_auth.verify_id_token(id_token)
-            print("Decoded token:", decoded)
-        except Exception as e:
-            print("Token verification failed:", str(e))
-            raise exceptions.AuthenticationFailed('Invalid Firebase ID token')
-
-        uid = decoded['uid']
-        email = decoded.get('email', '')
-        # Ensure local profile exists; role can come from custom claims or DB
-        profile, _ = UserProfile.objects.get_or_create(uid=uid, defaults={
-            'email': email, 'full_name': email.split('@')[0], 'role': 'guard'
-        })
-        # If you use Firebase custom claims for role, sync it:
-        role = decoded.get('role') or decoded.get('claims', {}).get('role')
-        if role and role != profile.role:
-            profile.role = role
-            profile.save()
+        profile = authenticate_id_token(id_token)
 
         # DRF expects a (user, auth) tuple; we use profile as user-like object
-        print("🎯 Authenticated user:", profile)
+        logger.debug("Authenticated", extra={"user": profile.pk, "role": profile.role, "path": request.path})
         return (profile, None)
@@ -0,0 +1,464 @@
+# core/benchmark.py
+"""
+Synthetic data (`manage.py seed_benchmark`) and the endpoint benchmark
+(`manage.py run_benchmark`). Meant for a throwaway local Postgres: every
+seeded row is tagged with BENCH_PREFIX so it can be flushed again.
+"""
+import contextlib
+import json
+import logging
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.text import compress_string
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+
+from . import token_cache
+from .middleware import CompressionMiddleware, brotli
+from .renderers import FastJSONRenderer, MessagePackRenderer
+from .models import (
+    AttendanceRecord, DailyAttendanceRollup, IncidentReport, ShiftTemplate, Site, UserProfile, WorkShift,
+)
+from .sync import next_change_seq
+from .timesheets import rebuild
+
+BENCH_PREFIX = "bench-"
+BATCH_SIZE = 5000
+SHIFT_STARTS = (6, 14, 22)  # three 8-hour shifts a day
+SHIFT_HOURS = 8
+
+INCIDENT_TEXTS = (
+    "Unlocked gate found on patrol",
+    "Visitor without badge escorted out",
+    "Alarm triggered, false positive",
+    "Broken light in car park",
+    "Suspicious vehicle reported to police",
+)
+
+
+# ---------- Seeding ----------
+def flush():
+    """
+    Remove previously seeded rows. Uses raw DELETEs (no per-row signals),
+    so a million rows don't turn into a million tombstones and events.
+    """
+    users = UserProfile.objects.filter(uid__startswith=BENCH_PREFIX)
+    sites = Site.objects.filter(name__startswith=BENCH_PREFIX)
+    with transaction.atomic():
+        for queryset in (
+            IncidentReport.objects.filter(user__in=users),
+            AttendanceRecord.objects.filter(user__in=users),
+            DailyAttendanceRollup.objects.filter(guard__in=users),
+            WorkShift.objects.filter(site__in=sites),
+            ShiftTemplate.objects.filter(site__in=sites),
+            UserProfile.supervisor_sites.through.objects.filter(site__in=sites),
+            users,
+            sites,
+        ):
+            queryset._raw_delete(queryset.db)
+
+
+def _bulk(model, objs):
+    return model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+
+
+def seed(sites=200, guards=5000, supervisors=50, shifts=1_000_000, days=365,
+         attendance_rate=1.0, incident_rate=1.0, rng_seed=42, log=print):
+    """
+    Generate a deterministic data set with bulk_create only. Shifts are
+    spread over `days` ending a fifth of the way into the future, with no
+    guard double-booked; every ended shift gets attendance with the
+    probability `attendance_rate`, and every attended one an incident with
+    `incident_rate`. Returns the row counts.
+    """
+    rng = random.Random(rng_seed)
+    seq = next_change_seq()  # one marker for the whole data set
+    counts = {}
+
+    site_objs = _bulk(Site, [
+        Site(name=f"{BENCH_PREFIX}site-{i}", location=f"{i} Benchmark Street",
+             latitude=round(51.3 + rng.random() * 0.4, 6), longitude=round(-0.4 + rng.random() * 0.6, 6),
+             geofence_radius_m=150, change_seq=seq)
+        for i in range(sites)
+    ])
+    profiles = [UserProfile(uid=f"{BENCH_PREFIX}admin", full_name="Bench Admin",
+                            email=f"{BENCH_PREFIX}admin@example.com", role="admin", change_seq=seq)]
+    profiles += [UserProfile(uid=f"{BENCH_PREFIX}supervisor-{i}", full_name=f"Bench Supervisor {i}",
+                             email=f"{BENCH_PREFIX}supervisor-{i}@example.com", role="supervisor", change_seq=seq)
+                 for i in range(supervisors)]
+    profiles += [UserProfile(uid=f"{BENCH_PREFIX}guard-{i}", full_name=f"Bench Guard {i}",
+                             email=f"{BENCH_PREFIX}guard-{i}@example.com", role="guard", change_seq=seq)
+                 for i in range(guards)]
+    profiles = _bulk(UserProfile, profiles)
+    supervisor_objs = [p for p in profiles if p.role == "supervisor"]
+    guard_objs = [p for p in profiles if p.role == "guard"]
+
+    # Each supervisor covers a contiguous slice of sites
+    per_supervisor = max(1, math.ceil(sites / max(supervisors, 1)))
+    through = UserProfile.supervisor_sites.through
+    _bulk(through, [
+        through(userprofile_id=sup.pk, site_id=site.pk)
+        for i, sup in enumerate(supervisor_objs)
+        for site in site_objs[i * per_supervisor:(i + 1) * per_supervisor]
+    ])
+    counts.update(sites=len(site_objs), users=len(profiles))
+    log(f"sites={len(site_objs)} users={len(profiles)}")
+
+    per_guard = math.ceil(shifts / max(guards, 1))
+    if per_guard > days:
+        raise ValueError(f"{per_guard} shifts per guard don't fit in {days} days; raise --days or --guards")
+    first_day = datetime.combine((now() - timedelta(days=days * 4 // 5)).date(), datetime.min.time(),
+                                 tzinfo=dt_timezone.utc)
+    current = now()
+    counts.update(shifts=0, attendance=0, incidents=0)
+
+    def flush_batch(batch):
+        created = _bulk(WorkShift, batch)
+        records, incidents = [], []
+        for shift in created:
+            if shift.end > current or rng.random() >= attendance_rate:
+                continue
+            site = site_by_id[shift.site_id]
+            late = rng.random() < 0.1
+            check_in = shift.start + timedelta(minutes=rng.uniform(15, 60) if late else rng.uniform(-15, 9))
+            records.append(AttendanceRecord(
+                shift=shift, user_id=shift.assigned_user_id,
+                check_in_time=check_in,
+                check_out_time=shift.end + timedelta(minutes=rng.uniform(-10, 20)),
+                check_in_lat=round(float(site.latitude) + rng.gauss(0, 0.0005), 6),
+                check_in_lng=round(float(site.longitude) + rng.gauss(0, 0.0005), 6),
+                status="late" if late else "pending",
+                change_seq=seq,
+            ))
+            if rng.random() < incident_rate:
+                incidents.append(IncidentReport(
+                    shift=shift, user_id=shift.assigned_user_id,
+                    severity=rng.choice(("low", "low", "medium", "high")),
+                    description=rng.choice(INCIDENT_TEXTS),
+                    status=rng.choice(("pending", "reviewed", "resolved", "resolved")),
+                    change_seq=seq,
+                ))
+        _bulk(AttendanceRecord, records)
+        _bulk(IncidentReport, incidents)
+        counts["shifts"] += len(created)
+        counts["attendance"] += len(records)
+        counts["incidents"] += len(incidents)
+
+    site_by_id = {site.pk: site for site in site_objs}
+    batch = []
+    remaining = shifts
+    for guard in guard_objs:
+        if remaining <= 0:
+            break
+        take = min(per_guard, remaining)
+        remaining -= take
+        home_sites = rng.sample(site_objs, k=min(3, len(site_objs)))
+        # Distinct days, so one guard never has overlapping shifts
+        for day in rng.sample(range(days), k=take):
+            start = first_day + timedelta(days=day, hours=rng.choice(SHIFT_STARTS))
+            batch.append(WorkShift(site=rng.choice(home_sites), assigned_user=guard, start=start,
+                                   end=start + timedelta(hours=SHIFT_HOURS), change_seq=seq))
+        if len(batch) >= BATCH_SIZE:
+            flush_batch(batch)
+            batch = []
+            log(f"shifts={counts['shifts']} attendance={counts['attendance']} incidents={counts['incidents']}")
+    flush_batch(batch)
+
+    # auto_now_add stamped every incident "now"; move them into their shift
+    IncidentReport.objects.filter(user__uid__startswith=BENCH_PREFIX).update(created_at=Subquery(
+        WorkShift.objects.filter(pk=OuterRef("shift_id"))
+        .annotate(at=F("start") + timedelta(hours=SHIFT_HOURS // 2)).values("at")[:1]
+    ))
+    counts["rollups"] = rebuild()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    return counts
+
+
+# ---------- Runner ----------
+# name, method, path template, roles, body template (writes run in a rolled-back transaction)
+SCENARIOS = [
+    ("whoami", "GET", "/api/whoami/", ("admin", "supervisor", "guard"), None),
+    ("dashboard", "GET", "/api/dashboard/summary/", ("admin", "supervisor", "guard"), None),
+    ("sites-list", "GET", "/api/sites/", ("admin", "supervisor", "guard"), None),
+    ("users-list", "GET", "/api/users/", ("admin",), None),
+    ("shifts-page", "GET", "/api/shifts/?page_size=50", ("admin", "supervisor", "guard"), None),
+    ("shifts-page-304", "GET", "/api/shifts/?page_size=50", ("admin", "supervisor", "guard"), None),
+    ("shifts-list", "GET", "/api/shifts/", ("guard",), None),
+    ("shifts-delta", "GET", "/api/shifts/?since={since}", ("admin", "supervisor", "guard"), None),
+    ("shifts-detail", "GET", "/api/shifts/{shift}/", ("admin", "supervisor", "guard"), None),
+    ("shifts-conflicts", "GET", "/api/shifts/conflicts/", ("admin", "supervisor"), None),
+    ("shift-templates-list", "GET", "/api/shift-templates/", ("admin", "supervisor"), None),
+    ("attendance-page", "GET", "/api/attendance/?page_size=50", ("admin", "supervisor", "guard"), None),
+    ("attendance-list", "GET", "/api/attendance/", ("guard",), None),
+    ("attendance-export", "GET", "/api/attendance/export/?from={week_ago}", ("admin", "supervisor"), None),
+    ("geofence-audit", "GET", "/api/attendance/geofence-audit/?from={month_ago}", ("admin", "supervisor"), None),
+    ("incidents-page", "GET", "/api/incidents/?page_size=50", ("admin", "supervisor", "guard"), None),
+    ("incidents-detail", "GET", "/api/incidents/{incident}/", ("admin", "supervisor", "guard"), None),
+    ("incidents-export", "GET", "/api/incidents/export/?from={week_ago}", ("admin", "supervisor"), None),
+    ("timesheets", "GET", "/api/timesheets/?from={month_ago}", ("admin", "supervisor", "guard"), None),
+    ("check-in-out", "POST", "/api/attendance/check_in/", ("guard",),
+     {"shift": "{future_shift}", "lat": "{lat}", "lng": "{lng}"}),
+    ("incidents-create", "POST", "/api/incidents/", ("guard",),
+     {"shift": "{shift}", "severity": "low", "description": "Benchmark incident"}),
+    ("shifts-create", "POST", "/api/shifts/", ("admin",),
+     {"site": "{site}", "assigned_user": "{guard}", "start": "{far_start}", "end": "{far_end}"}),
+    ("shifts-update", "PATCH", "/api/shifts/{shift}/", ("admin",), {"end": "{shift_end}"}),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _fake_verify(id_token):
+    # Stands in for Firebase: the bearer token is the uid of a seeded profile
+    return {"uid": id_token, "exp": time.time() + 3600}
+
+
+@contextlib.contextmanager
+def _quiet_logs():
+    """Keep the per-request log lines out of the report; errors still show."""
+    logging.disable(logging.WARNING)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _context(role_user):
+    """Ids and values the scenario templates refer to, as seen by this user."""
+    current = now()
+    shifts = WorkShift.objects.filter(site__name__startswith=BENCH_PREFIX)
+    incidents = IncidentReport.objects.filter(user__uid__startswith=BENCH_PREFIX)
+    if role_user.role == "supervisor":
+        site_ids = list(role_user.supervisor_sites.values_list("id", flat=True))
+        shifts, incidents = shifts.filter(site_id__in=site_ids), incidents.filter(shift__site_id__in=site_ids)
+    elif role_user.role == "guard":
+        shifts, incidents = shifts.filter(assigned_user=role_user), incidents.filter(user=role_user)
+    shift = shifts.filter(end__lt=current).order_by("-end").first()
+    future = shifts.filter(start__gt=current).select_related("site").order_by("start").first()
+    guard = UserProfile.objects.filter(uid=f"{BENCH_PREFIX}guard-0").first()
+    far_start = current + timedelta(days=3650)
+    return {
+        "shift": shift.pk if shift else 0,
+        "shift_end": (shift.end + timedelta(minutes=1)).isoformat() if shift else "",
+        "future_shift": future.pk if future else 0,
+        "lat": str(future.site.latitude) if future else "",
+        "lng": str(future.site.longitude) if future else "",
+        "incident": incidents.order_by("-created_at").values_list("pk", flat=True).first() or 0,
+        "site": shift.site_id if shift else 0,
+        "guard": guard.pk if guard else 0,
+        # A client that is up to date: the delta poll should come back empty
+        "since": WorkShift.objects.order_by("-change_seq").values_list("change_seq", flat=True).first() or 0,
+        "week_ago": (current - timedelta(days=7)).date().isoformat(),
+        "month_ago": (current - timedelta(days=30)).date().isoformat(),
+        "far_start": far_start.isoformat(),
+        "far_end": (far_start + timedelta(hours=SHIFT_HOURS)).isoformat(),
+    }
+
+
+def _fill(template, context):
+    if isinstance(template, dict):
+        return {key: _fill(value, context) for key, value in template.items()}
+    return template.format(**context)
+
+
+def _request(client, method, path, body, headers):
+    if method == "GET":
+        return client.get(path, **headers)
+    return client.generic(method, path, json.dumps(body), content_type="application/json", **headers)
+
+
+def _measure(client, name, method, path, body, headers):
+    """One timed request; writes are rolled back so runs stay repeatable."""
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            began = time.perf_counter()
+            response = _request(client, method, path, body, headers)
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+            if name == "check-in-out" and response.status_code == 200:
+                response = _request(client, method, path.replace("check_in", "check_out"), body, headers)
+                content += response.content
+            elapsed = (time.perf_counter() - began) * 1000
+        transaction.set_rollback(True)
+    return elapsed, response.status_code, len(queries), len(content)
+
+
+def run_suite(iterations=20, warmup=2, only=None, log=print):
+    """
+    Run every scenario for each role it applies to and return the report:
+    latency percentiles (ms), SQL queries and response bytes per request.
+    Firebase token verification is stubbed out; everything else, including
+    the token cache and the async views, runs for real.
+    """
+    users = {
+        role: UserProfile.objects.filter(uid__startswith=BENCH_PREFIX, role=role).order_by("pk").first()
+        for role in ("admin", "supervisor", "guard")
+    }
+    if not all(users.values()):
+        raise ValueError("No benchmark data found; run `manage.py seed_benchmark` first")
+
+    from . import auth  # initializes Firebase Admin; only its verification is stubbed
+
+    token_cache.clear()
+    client = Client()
+    results = []
+    with (
+        mock.patch.object(auth, "_verify", _fake_verify),
+        override_settings(ALLOWED_HOSTS=["*"]),
+        _quiet_logs(),
+    ):
+        for role, user in users.items():
+            context = _context(user)
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {user.uid}"}
+            for name, method, template, roles, body in SCENARIOS:
+                if role not in roles or (only and not only.search(name)):
+                    continue
+                path = _fill(template, context)
+                body = _fill(body, context) if body else None
+                request_headers = dict(headers)
+                if name == "shifts-page-304":
+                    first = client.get(path, **headers)
+                    request_headers["HTTP_IF_NONE_MATCH"] = first.get("ETag", "")
+
+                for _ in range(warmup):
+                    _measure(client, name, method, path, body, request_headers)
+                timings, statuses = [], set()
+                for _ in range(iterations):
+                    elapsed, status_code, queries, size = _measure(client, name, method, path, body, request_headers)
+                    timings.append(elapsed)
+                    statuses.add(status_code)
+                timings.sort()
+                results.append({
+                    "name": name,
+                    "role": role,
+                    "method": method,
+                    "path": path,
+                    "status": sorted(statuses),
+                    "p50_ms": round(percentile(timings, 50), 2),
+                    "p90_ms": round(percentile(timings, 90), 2),
+                    "p99_ms": round(percentile(timings, 99), 2),
+                    "max_ms": round(timings[-1], 2),
+                    "queries": queries,
+                    "bytes": size,
+                })
+                log(f"{name:<22} {role:<10} p50={results[-1]['p50_ms']:>9.2f}ms "
+                    f"queries={queries:<4} bytes={size} status={sorted(statuses)}")
+
+    return {
+        "generated_at": now().isoformat(),
+        "database": connection.vendor,
+        "iterations": iterations,
+        "rows": {
+            "sites": Site.objects.count(),
+            "users": UserProfile.objects.count(),
+            "shifts": WorkShift.objects.count(),
+            "attendance": AttendanceRecord.objects.count(),
+            "incidents": IncidentReport.objects.count(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, report):
+    """Lines of p50/query/size changes against an earlier report."""
+    previous = {(r["name"], r["role"]): r for r in baseline.get("results", [])}
+    lines = []
+    for result in report["results"]:
+        before = previous.get((result["name"], result["role"]))
+        if before is None:
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+        lines.append(
+            f"{result['name']:<22} {result['role']:<10} p50 {before['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f}ms "
+            f"({change:+.0f}%)  queries {before['queries']} -> {result['queries']}  "
+            f"bytes {before['bytes']} -> {result['bytes']}"
+        )
+    return lines
+
+
+# ---------- Renderers ----------
+# The big list payloads the portals re-fetch on every poll
+RENDER_SCENARIOS = [
+    ("sites-list", "/api/sites/"),
+    ("users-list", "/api/users/"),
+    ("shifts-list", "/api/shifts/"),
+    ("attendance-list", "/api/attendance/"),
+    ("incidents-list", "/api/incidents/"),
+]
+RENDERERS = [
+    ("json-drf", JSONRenderer()),
+    ("json-fast", FastJSONRenderer()),
+    ("msgpack", MessagePackRenderer()),
+]
+
+
+def _timed(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        began = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return result, round(percentile(timings, 50), 2)
+
+
+def run_render_suite(iterations=5, only=None, log=print):
+    """
+    Render each admin list payload with every renderer and report p50 render
+    time plus raw, gzip and (if installed) Brotli sizes and compress times.
+    """
+    admin = UserProfile.objects.filter(uid__startswith=BENCH_PREFIX, role="admin").order_by("pk").first()
+    if admin is None:
+        raise ValueError("No benchmark data found; run `manage.py seed_benchmark` first")
+
+    from . import auth
+
+    token_cache.clear()
+    client = Client()
+    results = []
+    with mock.patch.object(auth, "_verify", _fake_verify), override_settings(ALLOWED_HOSTS=["*"]), _quiet_logs():
+        for name, path in RENDER_SCENARIOS:
+            if only and not only.search(name):
+                continue
+            data = client.get(path, HTTP_AUTHORIZATION=f"Bearer {admin.uid}").data
+            for renderer_name, renderer in RENDERERS:
+                body, render_ms = _timed(lambda: renderer.render(data), iterations)
+                gzipped, gzip_ms = _timed(lambda: compress_string(body), iterations)
+                result = {
+                    "name": name,
+                    "renderer": renderer_name,
+                    "rows": len(data),
+                    "render_ms": render_ms,
+                    "bytes": len(body),
+                    "gzip_bytes": len(gzipped),
+                    "gzip_ms": gzip_ms,
+                }
+                if brotli is not None:
+                    quality = CompressionMiddleware.brotli_quality
+                    compressed, br_ms = _timed(lambda: brotli.compress(body, quality=quality), iterations)
+                    result.update(br_bytes=len(compressed), br_ms=br_ms)
+                results.append(result)
+                log(f"{name:<16} {renderer_name:<10} render={render_ms:>8.2f}ms bytes={len(body):<9} "
+                    f"gzip={len(gzipped)} ({gzip_ms:.2f}ms)"
+                    + (f" br={result['br_bytes']} ({result['br_ms']:.2f}ms)" if brotli is not None else ""))
+
+    return {
+        "generated_at": now().isoformat(),
+        "iterations": iterations,
+        "results": results,
+    }
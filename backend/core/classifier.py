@@ -0,0 +1,151 @@
+# core/classifier.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils.timezone import now
+
+from .events import publish_change
+from .models import AttendanceRecord, JobCheckpoint, WorkShift
+from .sync import current_change_seq, next_change_seq
+from .timesheets import bucket_for, rebuild, refresh_buckets
+
+LATE_GRACE = timedelta(minutes=getattr(settings, "ATTENDANCE_LATE_GRACE_MINUTES", 10))
+BATCH_SIZE = 2000  # rows per chunk, and per transaction
+REBUILD_THRESHOLD = 500  # touched timesheet buckets
+CHECKPOINT = "attendance_classifier"
+
+
+def mark_late(since_seq, until_seq, limit):
+    """
+    Mark up to `limit` pending records changed in (since_seq, until_seq]
+    whose check-in came after the shift start plus grace "late", oldest
+    change first, in one UPDATE. Returns (id, user_id, site_id, check_in,
+    change_seq) rows.
+    """
+    rows = list(
+        AttendanceRecord.objects
+        .filter(change_seq__gt=since_seq, change_seq__lte=until_seq, status="pending",
+                check_in_time__gt=F("shift__start") + LATE_GRACE)
+        .order_by("change_seq", "id")
+        .values_list("id", "user_id", "shift__site_id", "check_in_time", "change_seq")[:limit]
+    )
+    if rows:
+        seq = next_change_seq()
+        AttendanceRecord.objects.filter(pk__in=[row[0] for row in rows], status="pending").update(
+            status="late", change_seq=seq,
+        )
+        for record_id, user_id, site_id, _, _ in rows:
+            publish_change("attendance", "updated", record_id, site_id, user_id, seq)
+    return rows
+
+
+def create_absences(shifts, limit):
+    """
+    Bulk-insert an "absent" record for up to `limit` of the assigned
+    `shifts` (in their order) nobody checked in to. Returns (id, user_id,
+    site_id, check_in, shift end) rows.
+    """
+    missing = list(
+        shifts.filter(assigned_user__isnull=False)
+        .filter(~Exists(AttendanceRecord.objects.filter(shift=OuterRef("pk"), user=OuterRef("assigned_user"))))
+        .values_list("id", "site_id", "assigned_user_id", "start", "end")[:limit]
+    )
+    if not missing:
+        return []
+    seq = next_change_seq()
+    # Closed at the shift start: zero worked time, and never "on duty"
+    created = AttendanceRecord.objects.bulk_create([
+        AttendanceRecord(shift_id=shift_id, user_id=user_id, check_in_time=start,
+                         check_out_time=start, status="absent", change_seq=seq)
+        for shift_id, _, user_id, start, _ in missing
+    ])
+    rows = []
+    for record, (_, site_id, user_id, start, end) in zip(created, missing):
+        publish_change("attendance", "created", record.pk, site_id, user_id, seq)
+        rows.append((record.pk, user_id, site_id, start, end))
+    return rows
+
+
+def _locked_checkpoint():
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    return JobCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+
+
+def _refresh_rollups(rows):
+    keys = {bucket_for(user_id, site_id, check_in) for _, user_id, site_id, check_in, _ in rows}
+    if len(keys) > REBUILD_THRESHOLD:
+        # Typically a chunk of a first run over history: one streaming rebuild beats per-bucket refreshes
+        days = [day for _, _, day in keys]
+        rebuild(min(days), max(days))
+    else:
+        refresh_buckets(keys)
+
+
+def classify(reset=False):
+    """
+    One incremental classifier run; returns (late, absent) counts.
+
+    Late: pending records changed since the last run (change_seq watermark).
+    Absent: assigned shifts that ended since the last run (ran_at
+    watermark), plus already-ended shifts edited since then (e.g.
+    reassigned or entered after the fact). The first run, or one with
+    reset=True, covers all history.
+
+    Work is done in chunks of BATCH_SIZE rows, each in its own transaction
+    that also refreshes the chunk's timesheet rollups and moves the
+    watermark past it, so locks and memory stay bounded and an interrupted
+    run resumes where it stopped. Chunks are serialized on the checkpoint
+    row and re-read the watermark, so overlapping runs do not redo work.
+    """
+    if reset:
+        JobCheckpoint.objects.filter(name=CHECKPOINT).update(change_seq=0, ran_at=None)
+    run_seq, run_at = current_change_seq(), now()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    since_seq, since = checkpoint.change_seq, checkpoint.ran_at
+    ended = WorkShift.objects.filter(end__lte=run_at)
+    late = absent = 0
+
+    if since is not None:
+        # Edited after they had ended; every chunk fills its gaps, so the next query skips them
+        edited = ended.filter(end__lt=since, change_seq__gt=since_seq, change_seq__lte=run_seq)
+        while True:
+            with transaction.atomic():
+                _locked_checkpoint()
+                rows = create_absences(edited.order_by("change_seq", "id"), BATCH_SIZE)
+                _refresh_rollups(rows)
+            absent += len(rows)
+            if len(rows) < BATCH_SIZE:
+                break
+
+    while True:
+        with transaction.atomic():
+            checkpoint = _locked_checkpoint()
+            shifts = ended if checkpoint.ran_at is None else ended.filter(end__gte=checkpoint.ran_at)
+            rows = create_absences(shifts.order_by("end", "id"), BATCH_SIZE)
+            _refresh_rollups(rows)
+            # A full chunk may have left shifts with the same end; they are still missing, so >= finds them
+            reached = rows[-1][4] if len(rows) == BATCH_SIZE else run_at
+            if checkpoint.ran_at is None or reached > checkpoint.ran_at:
+                checkpoint.ran_at = reached
+                checkpoint.save(update_fields=["ran_at"])
+        absent += len(rows)
+        if len(rows) < BATCH_SIZE:
+            break
+
+    while True:
+        with transaction.atomic():
+            checkpoint = _locked_checkpoint()
+            rows = mark_late(checkpoint.change_seq, run_seq, BATCH_SIZE)
+            _refresh_rollups(rows)
+            # Likewise for records sharing the last change_seq: the marked ones are no longer pending
+            reached = rows[-1][4] - 1 if len(rows) == BATCH_SIZE else run_seq
+            if reached > checkpoint.change_seq:
+                checkpoint.change_seq = reached
+                checkpoint.save(update_fields=["change_seq"])
+        late += len(rows)
+        if len(rows) < BATCH_SIZE:
+            break
+
+    return late, absent
@@ -0,0 +1,98 @@
+# core/conditional.py
+import hashlib
+
+from django.db.models import Max
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Tombstone
+from .site_scope import supervisor_site_ids
+from .sync import current_change_seq
+
+
+def _etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison, so ignore any W/ prefix
+    candidates = {tag.removeprefix("W/") for tag in parse_etags(header)}
+    return "*" in candidates or etag in candidates
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags for list/retrieve, checked before any serialization runs.
+
+    The version of a response is the max change_seq of the role-scoped
+    queryset and of the model's tombstones (deletions and rows leaving a
+    scope), plus the max change_seq of every model in `etag_dependencies`
+    whose fields are embedded in the payload (site names, guard names...).
+    All of these are index range ends, so no rows are counted. It is hashed
+    together with the caller's scope and query string, so a matching
+    If-None-Match costs a few index lookups and returns 304 with no body.
+
+    A version above the sync token (see core.sync.current_change_seq) may
+    still have an uncommitted row below it, so such responses get no ETag.
+    """
+    etag_dependencies = ()
+
+    def get_etag_version(self, queryset):
+        """Version parts for `queryset`, or None while they are not settled"""
+        model = queryset.model
+        seqs = [
+            queryset.order_by().aggregate(seq=Max("change_seq"))["seq"] or 0,
+            Tombstone.objects.filter(model=model._meta.model_name).aggregate(seq=Max("change_seq"))["seq"] or 0,
+        ]
+        for dependency in self.etag_dependencies:
+            seqs.append(dependency.objects.aggregate(seq=Max("change_seq"))["seq"] or 0)
+        # DeltaSyncMixin has already read the token for this request
+        token = getattr(self, "sync_token", None)
+        if max(seqs) > (current_change_seq() if token is None else token):
+            return None
+        return [model._meta.label, *seqs]
+
+    def build_etag(self, request, parts):
+        user = request.user
+        raw = "|".join(str(p) for p in [
+            *parts,
+            getattr(user, "pk", ""),
+            getattr(user, "role", ""),
+            # A supervisor's rows change when their sites do
+            sorted(supervisor_site_ids(user)) if getattr(user, "role", "") == "supervisor" else "",
+            request.accepted_renderer.format if hasattr(request, "accepted_renderer") else "",
+            request.META.get("QUERY_STRING", ""),
+        ])
+        return quote_etag(hashlib.sha1(raw.encode("utf-8")).hexdigest())
+
+    def conditional_response(self, request, etag, handler, *args, **kwargs):
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+            # Let browsers keep the body but revalidate on every poll
+            response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        version = self.get_etag_version(self.filter_queryset(self.get_queryset()))
+        if version is None:
+            return super().list(request, *args, **kwargs)
+        etag = self.build_etag(request, version)
+        return self.conditional_response(request, etag, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup]}
+            )
+        except (TypeError, ValueError):
+            # Malformed lookup; let the normal path answer 404
+            return super().retrieve(request, *args, **kwargs)
+        version = self.get_etag_version(queryset)
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = self.build_etag(request, version)
+        return self.conditional_response(request, etag, super().retrieve, *args, **kwargs)
@@ -1,35 +1,106 @@
 # core/consumers.py
+"""
+Push sockets for the portals (/ws/<role>/).
+
+Browsers cannot set headers on a WebSocket request, and a token in the URL
+would end up in access and proxy logs, so the client authenticates with
+its first message instead: {"type": "auth", "token": "<Firebase ID token>"}.
+Until that arrives the socket is in no group and receives nothing; it is
+then answered with {"type": "ready"}, or closed with 4401 (bad or missing
+token, or none within AUTH_TIMEOUT seconds) or 4403 (wrong role).
+"""
+import asyncio
 import json
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from rest_framework import exceptions
+
+from .events import ADMIN_GROUP, guard_group, site_group
+from .site_scope import supervisor_site_ids
+
+AUTH_TIMEOUT = 10  # seconds
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_FORBIDDEN = 4403
+
 
 class BaseConsumer(AsyncWebsocketConsumer):
-    group_name = None
+    role = None
 
     async def connect(self):
-        user = self.scope["user"]
-        if not user.is_authenticated:
-            await self.close()
+        self.user, self.group_names = None, []
+        await self.accept()
+        self.auth_deadline = asyncio.ensure_future(self.close_unless_authenticated())
+
+    async def close_unless_authenticated(self):
+        await asyncio.sleep(AUTH_TIMEOUT)
+        if self.user is None:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if self.user is not None:
+            return  # nothing else is read from clients
+        try:
+            message = json.loads(text_data or "")
+        except ValueError:
+            message = None
+        token = message.get("token") if isinstance(message, dict) and message.get("type") == "auth" else None
+        if not isinstance(token, str) or not token:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
             return
+        await self.authenticate(token)
 
-        if self.group_name:
-            await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+    async def authenticate(self, token):
+        from .auth import aauthenticate_id_token  # defer Firebase init to first use
+
+        try:
+            user = await aauthenticate_id_token(token)
+        except exceptions.AuthenticationFailed:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+        if getattr(user, "role", None) != self.role:
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+
+        self.user = user
+        self.auth_deadline.cancel()
+        self.group_names = await self.get_group_names(user)
+        for group in self.group_names:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.send(text_data=json.dumps({"type": "ready"}))
 
     async def disconnect(self, close_code):
-        if self.group_name:
-            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        deadline = getattr(self, "auth_deadline", None)
+        if deadline is not None:
+            deadline.cancel()
+        for group in getattr(self, "group_names", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def get_group_names(self, user):
+        return []
 
     async def broadcast_event(self, event):
         await self.send(text_data=json.dumps(event["event"]))
 
 
 class AdminConsumer(BaseConsumer):
-    group_name = "admins"
+    role = "admin"
+
+    async def get_group_names(self, user):
+        return [ADMIN_GROUP]
 
 
 class SupervisorConsumer(BaseConsumer):
-    group_name = "supervisors"
+    role = "supervisor"
+
+    async def get_group_names(self, user):
+        # Only the sites this supervisor manages
+        site_ids = await database_sync_to_async(supervisor_site_ids)(user)
+        return [site_group(site_id) for site_id in site_ids]
 
 
 class GuardConsumer(BaseConsumer):
-    group_name = "guards"
+    role = "guard"
+
+    async def get_group_names(self, user):
+        return [guard_group(user.id)]
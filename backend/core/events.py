@@ -0,0 +1,91 @@
+# core/events.py
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ADMIN_GROUP = "admins"
+
+# Pending events for the current thread's transaction, keyed by (model, id)
+_pending = threading.local()
+
+
+def site_group(site_id):
+    return f"site_{site_id}"
+
+
+def guard_group(user_id):
+    return f"guard_{user_id}"
+
+
+def publish_change(model, action, obj_id, site_id=None, user_id=None, seq=None, previous=None):
+    """
+    Queue a compact change event and send it once the surrounding
+    transaction commits. Repeated changes to the same row inside one
+    transaction collapse into a single event, and every group receives
+    one message per commit however many rows changed.
+
+    `previous` is the row's (site_id, user_id) before a reassignment; the
+    old site and guard groups get the event too, so they drop the row.
+    """
+    connection = transaction.get_connection()
+    buffer = getattr(_pending, "events", None)
+    # A rolled-back transaction discards our callback but not the buffer
+    scheduled = buffer is not None and connection.in_atomic_block and any(
+        func is _flush for _, func, _ in connection.run_on_commit
+    )
+    if not scheduled:
+        buffer = _pending.events = {}
+
+    earlier = buffer.get((model, obj_id))
+    if earlier:
+        if earlier["action"] == "created" and action == "updated":
+            action = "created"
+        # The scope the row had before the first change in this transaction
+        previous = earlier["previous"] or previous
+    buffer[(model, obj_id)] = {
+        "model": model,
+        "action": action,
+        "id": obj_id,
+        "site": site_id,
+        "user": user_id,
+        "seq": seq,
+        "previous": previous,
+    }
+    if not scheduled:
+        # Outside a transaction this flushes immediately
+        transaction.on_commit(_flush)
+
+
+def _flush():
+    buffer = getattr(_pending, "events", None) or {}
+    _pending.events = None
+    if not buffer:
+        return
+
+    by_group = {}
+    for event in buffer.values():
+        previous = event.pop("previous")
+        site_ids, user_ids = {event["site"]}, {event["user"]}
+        if previous:
+            site_ids.add(previous[0])
+            user_ids.add(previous[1])
+        groups = [ADMIN_GROUP]
+        groups += [site_group(site_id) for site_id in site_ids if site_id]
+        groups += [guard_group(user_id) for user_id in user_ids if user_id]
+        for group in groups:
+            by_group.setdefault(group, []).append(event)
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    send = async_to_sync(channel_layer.group_send)
+    for group, events in by_group.items():
+        try:
+            send(group, {"type": "broadcast_event", "event": {"type": "changes", "changes": events}})
+        except Exception as e:
+            logger.warning("Failed to publish %d change(s) to %s: %s", len(events), group, e)
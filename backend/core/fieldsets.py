@@ -0,0 +1,215 @@
+# core/fieldsets.py
+"""
+Sparse fieldsets and the read-only list fast path.
+
+`?fields=id,name` trims any serializer using SparseFieldsMixin to those
+fields on reads. When every remaining field maps onto a column, lists skip
+model instances altogether: the queryset is narrowed with .values() to
+just those columns and each row is built straight from the dict. Forward
+many-to-many id lists cost one extra query per field for the whole list.
+"""
+from decimal import Decimal
+from operator import itemgetter
+
+from django.db import models
+from django.db.models.query import ModelIterable
+from rest_framework import ISO_8601, serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .instrumentation import span
+
+FIELDS_PARAM = "fields"
+
+# Fields whose database value is already their JSON representation
+_PASSTHROUGH = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+# Fields that need a model instance (or a request) to render
+_NEEDS_INSTANCE = (
+    serializers.BaseSerializer,
+    serializers.RelatedField,
+    serializers.ManyRelatedField,
+    serializers.FileField,
+    serializers.SerializerMethodField,
+    serializers.HiddenField,
+)
+
+
+def requested_fields(request):
+    """Names from `?fields=a,b`, or None when the parameter is absent."""
+    params = getattr(request, "query_params", request.GET)
+    if FIELDS_PARAM not in params:
+        return None
+    return {name.strip() for name in params[FIELDS_PARAM].split(",") if name.strip()}
+
+
+def _datetime(field):
+    """DateTimeField.to_representation, minus the per-value setting lookups."""
+    if getattr(field, "format", api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+        return field.to_representation
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if tz is None:
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    return convert
+
+
+def _decimal(field):
+    """DecimalField.to_representation for the default string output."""
+    coerce = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value: format(value.quantize(exponent), "f")
+
+
+def _m2m_ids(field, model):
+    """Forward many-to-many field rendered as primary keys, else None."""
+    if not isinstance(field, serializers.ManyRelatedField):
+        return None
+    if type(field.child_relation) is not serializers.PrimaryKeyRelatedField or field.child_relation.pk_field:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source)
+    except Exception:
+        return None
+    return model_field if isinstance(model_field, models.ManyToManyField) else None
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin: `?fields=` on safe methods, and the .values() plan
+    used by ValuesListSerializer. `values_methods` maps a method field to
+    (columns, function) so the fast path can compute it from raw values.
+    """
+    values_methods = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only serializers built for a request (never the nested, class-level ones)
+        request = self._context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        wanted = requested_fields(request)
+        if wanted is None:
+            return
+        unknown = wanted - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({FIELDS_PARAM: f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        for name in set(self.fields) - wanted:
+            self.fields.pop(name)
+
+    def values_plan(self):
+        """
+        (columns, steps, m2m) for the readable fields, or None when one of
+        them needs a model instance. Each step is (name, function of the row).
+        """
+        model = self.Meta.model
+        columns, steps, m2m = {"id"}, [], []
+        for field in self._readable_fields:
+            name = field.field_name
+            if name in self.values_methods:
+                sources, function = self.values_methods[name]
+                columns.update(sources)
+                steps.append((name, _method_getter(sources, function)))
+            elif (model_field := _m2m_ids(field, model)) is not None:
+                m2m.append((name, model_field))
+            elif isinstance(field, _NEEDS_INSTANCE) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+                return None
+            elif field.source == "*":
+                return None
+            else:
+                column = "__".join(field.source_attrs)
+                columns.add(column)
+                steps.append((name, _column_getter(field, column)))
+        return columns, steps, m2m
+
+    def rows_to_representation(self, plan, rows):
+        """Render .values() dicts according to `plan`."""
+        _, steps, m2m = plan
+        with span("serialize"):
+            data = [{name: get(row) for name, get in steps} for row in rows]
+            for name, model_field in m2m:
+                related = _related_ids(model_field, [row["id"] for row in rows])
+                for item, row in zip(data, rows):
+                    item[name] = related.get(row["id"], [])
+        return data
+
+
+def _column_getter(field, column):
+    if isinstance(field, _PASSTHROUGH):
+        return itemgetter(column)
+    if isinstance(field, serializers.DateTimeField):
+        convert = _datetime(field)
+    elif isinstance(field, serializers.DecimalField):
+        convert = _decimal(field)
+    else:
+        convert = field.to_representation
+
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def _method_getter(sources, function):
+    if len(sources) == 1:
+        source, = sources
+        return lambda row: function(row[source])
+    return lambda row: function(*[row[source] for source in sources])
+
+
+def _related_ids(model_field, ids):
+    """{owner id: [related ids]} for a forward many-to-many, in one query."""
+    through = model_field.remote_field.through
+    owner, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+    related = {}
+    pairs = through.objects.filter(**{f"{owner}__in": ids}).order_by("pk").values_list(f"{owner}_id", f"{target}_id")
+    for owner_id, target_id in pairs:
+        related.setdefault(owner_id, []).append(target_id)
+    return related
+
+
+def project(queryset, plan, extra=()):
+    """The queryset narrowed to the plan's columns (plus `extra`, e.g. a keyset field)."""
+    return queryset.values(*sorted(plan[0] | set(extra)))
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """many=True serializer that renders unevaluated querysets through .values()."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.QuerySet) and data._result_cache is None and data._iterable_class is ModelIterable:
+            plan = self.child.values_plan()
+            if plan is not None:
+                return self.child.rows_to_representation(plan, list(project(data, plan)))
+        return super().to_representation(data)
+
+
+class ValuesListMixin:
+    """
+    Viewset mixin: list() pages and renders .values() rows when the
+    serializer's plan allows it, and falls back to model instances if not.
+    """
+
+    def list(self, request, *args, **kwargs):
+        child = self.get_serializer(many=True).child
+        plan = child.values_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        ordering = getattr(self, "keyset_ordering", None)
+        rows = project(self.filter_queryset(self.get_queryset()), plan, [ordering.lstrip("-")] if ordering else [])
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(child.rows_to_representation(plan, page))
+        return Response(child.rows_to_representation(plan, list(rows)))
@@ -0,0 +1,153 @@
+# core/firebase_client.py
+"""
+The Firebase Admin calls the app makes, behind one small interface so the
+outbox worker and the bulk import can run against an in-memory fake
+(settings.FIREBASE_CLIENT = "core.firebase_client.FakeFirebaseClient").
+Bulk calls return their per-item failures as [(index, reason), ...].
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from firebase_admin import auth as firebase_auth
+
+# import_users() accepts at most 1000 records per call (delete_users too)
+BULK_LIMIT = 1000
+# PBKDF2-SHA256 rounds for passwords that wait in the outbox (see hash_password)
+PASSWORD_HASH_ROUNDS = getattr(settings, "FIREBASE_PASSWORD_HASH_ROUNDS", 100_000)
+
+_clients = {}
+
+
+def hash_password(password):
+    """
+    Salted PBKDF2-SHA256 hash of a new account's password, in the form
+    create_user() takes, so queued jobs never hold the password itself.
+    """
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PASSWORD_HASH_ROUNDS)
+    return {
+        "password_hash": base64.b64encode(digest).decode(),
+        "password_salt": base64.b64encode(salt).decode(),
+        "password_rounds": PASSWORD_HASH_ROUNDS,
+    }
+
+
+def get_client():
+    path = getattr(settings, "FIREBASE_CLIENT", "core.firebase_client.FirebaseAdminClient")
+    if path not in _clients:
+        _clients[path] = import_string(path)()
+    return _clients[path]
+
+
+class FirebaseAdminClient:
+    """The real thing: thin wrappers over firebase_admin.auth."""
+
+    def __init__(self):
+        from . import auth  # noqa: F401  (initializes the Firebase Admin app)
+
+    def create_user(self, uid, email, display_name=None, password_hash=None, password_salt=None,
+                    password_rounds=None):
+        """
+        Create one account. With a hash from hash_password() it goes through
+        import_users(), the only Admin API that takes a password hash;
+        Firebase re-hashes it with its own scrypt on first sign-in.
+        """
+        if password_hash is None:
+            firebase_auth.create_user(uid=uid, email=email, display_name=display_name)
+            return
+        record = firebase_auth.ImportUserRecord(
+            uid=uid,
+            email=email,
+            display_name=display_name,
+            password_hash=base64.b64decode(password_hash),
+            password_salt=base64.b64decode(password_salt),
+        )
+        result = firebase_auth.import_users(
+            [record], hash_alg=firebase_auth.UserImportHash.pbkdf2_sha256(rounds=password_rounds),
+        )
+        if result.errors:
+            raise ValueError(result.errors[0].reason)
+
+    def update_user(self, uid, **fields):
+        firebase_auth.update_user(uid, **fields)
+
+    def set_custom_user_claims(self, uid, claims):
+        firebase_auth.set_custom_user_claims(uid, claims)
+
+    def delete_users(self, uids):
+        result = firebase_auth.delete_users(uids)
+        return [(e.index, e.reason) for e in result.errors]
+
+    def import_users(self, users):
+        """
+        Create up to 1000 accounts in one call. `users` are dicts with uid,
+        email, display_name, password and claims. Passwords are sent as
+        HMAC-SHA256 hashes under a one-off key; Firebase re-hashes them with
+        its own scrypt on first sign-in.
+        """
+        key = os.urandom(32)
+        records = []
+        for user in users:
+            salt = os.urandom(16)
+            records.append(firebase_auth.ImportUserRecord(
+                uid=user["uid"],
+                email=user["email"],
+                display_name=user.get("display_name"),
+                custom_claims=user.get("claims"),
+                password_hash=hmac.new(key, user["password"].encode() + salt, hashlib.sha256).digest(),
+                password_salt=salt,
+            ))
+        result = firebase_auth.import_users(records, hash_alg=firebase_auth.UserImportHash.hmac_sha256(key))
+        return [(e.index, e.reason) for e in result.errors]
+
+
+class FakeFirebaseClient:
+    """In-memory stand-in with the same behaviour for local runs and tests."""
+
+    def __init__(self):
+        self.users = {}
+
+    def _email_taken(self, email, uid=None):
+        return any(u["email"] == email and u["uid"] != uid for u in self.users.values())
+
+    def create_user(self, uid, email, display_name=None, password_hash=None, password_salt=None,
+                    password_rounds=None):
+        if uid in self.users:
+            raise firebase_auth.UidAlreadyExistsError("uid exists", None, None)
+        if self._email_taken(email):
+            raise firebase_auth.EmailAlreadyExistsError("email exists", None, None)
+        self.users[uid] = {"uid": uid, "email": email, "display_name": display_name, "claims": {}}
+
+    def update_user(self, uid, **fields):
+        if uid not in self.users:
+            raise firebase_auth.UserNotFoundError("no such user")
+        self.users[uid].update(fields)
+
+    def set_custom_user_claims(self, uid, claims):
+        if uid not in self.users:
+            raise firebase_auth.UserNotFoundError("no such user")
+        self.users[uid]["claims"] = dict(claims or {})
+
+    def delete_users(self, uids):
+        for uid in uids:
+            self.users.pop(uid, None)
+        return []
+
+    def import_users(self, users):
+        errors = []
+        for index, user in enumerate(users):
+            # Like Firebase, an existing uid is overwritten; emails must stay unique
+            if self._email_taken(user["email"], user["uid"]):
+                errors.append((index, "email already exists"))
+                continue
+            self.users[user["uid"]] = {
+                "uid": user["uid"],
+                "email": user["email"],
+                "display_name": user.get("display_name"),
+                "claims": dict(user.get("claims") or {}),
+            }
+        return errors
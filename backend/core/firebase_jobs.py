@@ -0,0 +1,168 @@
+# core/firebase_jobs.py
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+from firebase_admin import auth as firebase_auth
+from firebase_admin import exceptions as firebase_exceptions
+
+from .firebase_client import BULK_LIMIT, get_client
+from .models import FirebaseJob, UserProfile
+from .sync import next_change_seq
+
+BATCH_SIZE = getattr(settings, "FIREBASE_JOB_BATCH_SIZE", 100)
+MAX_ATTEMPTS = getattr(settings, "FIREBASE_JOB_MAX_ATTEMPTS", 8)
+BACKOFF_BASE = getattr(settings, "FIREBASE_JOB_BACKOFF_BASE", 5)      # seconds
+BACKOFF_MAX = getattr(settings, "FIREBASE_JOB_BACKOFF_MAX", 3600)     # seconds
+# How long a claimed batch stays hidden from other workers (a crashed worker's jobs come back after it)
+CLAIM_TIMEOUT = timedelta(seconds=getattr(settings, "FIREBASE_JOB_CLAIM_TIMEOUT", 300))
+
+# Payload fields that are credentials, dropped once a job fails for good
+CREDENTIAL_FIELDS = ("password_hash", "password_salt", "password_rounds")
+
+# Retrying these cannot help; the job goes straight to "failed"
+PERMANENT_ERRORS = (
+    ValueError,
+    firebase_auth.EmailAlreadyExistsError,
+    firebase_auth.UserNotFoundError,
+    firebase_exceptions.InvalidArgumentError,
+)
+
+
+def enqueue(action, uid, **payload):
+    """
+    Queue a Firebase Admin call for `uid`. Call inside the transaction that
+    changes the UserProfile so the job exists if and only if that commits.
+    """
+    return FirebaseJob.objects.create(action=action, uid=uid, payload=payload)
+
+
+def backoff(attempts):
+    """Exponential backoff with full jitter, capped at BACKOFF_MAX."""
+    return timedelta(seconds=random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempts)))
+
+
+def _run(client, job):
+    data = job.payload
+    if job.action == "create_user":
+        try:
+            client.create_user(
+                uid=job.uid,
+                email=data["email"],
+                display_name=data.get("display_name"),
+                **{field: data[field] for field in CREDENTIAL_FIELDS if field in data},
+            )
+        except firebase_auth.UidAlreadyExistsError:
+            pass  # an earlier attempt created it before failing on the claims
+        if data.get("role"):
+            client.set_custom_user_claims(job.uid, {"role": data["role"]})
+    elif job.action == "update_user":
+        client.update_user(job.uid, **data)
+    elif job.action == "set_claims":
+        client.set_custom_user_claims(job.uid, data)
+    else:
+        raise ValueError(f"Unknown Firebase job action {job.action!r}")
+
+
+def _delete_users(client, jobs):
+    """One delete_users() call per 1000 uids; returns {job.pk: error}."""
+    errors = {}
+    for i in range(0, len(jobs), BULK_LIMIT):
+        chunk = jobs[i:i + BULK_LIMIT]
+        try:
+            failures = client.delete_users([job.uid for job in chunk])
+        except Exception as e:
+            errors.update((job.pk, e) for job in chunk)
+            continue
+        for index, reason in failures:
+            errors[chunk[index].pk] = RuntimeError(reason)
+    return errors
+
+
+def _record_sync_status(jobs, errors):
+    """
+    Mirror job outcomes on the profiles so admins can see accounts that are
+    out of sync: the error of a job that failed for good is stored in
+    UserProfile.firebase_error, and cleared once a later job for the uid
+    succeeds. At most one job per uid is in a batch.
+    """
+    failed = {job.uid: job.last_error for job in jobs if job.status == "failed"}
+    synced = [job.uid for job in jobs if job.pk not in errors]
+    recovered = list(
+        UserProfile.objects.filter(uid__in=synced).exclude(firebase_error="").values_list("pk", flat=True)
+    ) if synced else []
+    if not failed and not recovered:
+        return
+
+    seq = next_change_seq()  # so delta sync and ETags pick the change up
+    UserProfile.objects.filter(pk__in=recovered).update(firebase_error="", change_seq=seq)
+    for uid, error in failed.items():
+        UserProfile.objects.filter(uid=uid).update(firebase_error=error, change_seq=seq)
+
+
+def run_batch(batch_size=BATCH_SIZE):
+    """
+    Execute up to `batch_size` due jobs and settle them. Returns a Counter
+    of done / retried / failed.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and pushed
+    CLAIM_TIMEOUT into the future, and that transaction commits before any
+    Firebase call, so several workers can drain the queue side by side
+    without holding row locks across network calls. Jobs for one uid run
+    in queue order: a job is only picked once no earlier job for its uid
+    is still pending (due, claimed or backing off). Deletions are sent
+    together through the bulk delete_users() API, and permanent failures
+    are shown on the profile (see _record_sync_status).
+    """
+    stats = Counter()
+    client = get_client()
+    earlier = FirebaseJob.objects.filter(uid=OuterRef("uid"), id__lt=OuterRef("id"), status="pending")
+    with transaction.atomic():
+        jobs = list(
+            FirebaseJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="pending", available_at__lte=now())
+            .filter(~Exists(earlier))
+            .order_by("id")[:batch_size]
+        )
+        FirebaseJob.objects.filter(pk__in=[job.pk for job in jobs]).update(available_at=now() + CLAIM_TIMEOUT)
+
+    errors, deletes = {}, []
+    for job in jobs:
+        if job.action == "delete_user":
+            deletes.append(job)
+            continue
+        try:
+            _run(client, job)
+        except Exception as e:
+            errors[job.pk] = e
+    errors.update(_delete_users(client, deletes))
+
+    done, settled = [], []
+    for job in jobs:
+        error = errors.get(job.pk)
+        if error is None:
+            done.append(job.pk)
+            continue
+        job.attempts += 1
+        job.last_error = f"{type(error).__name__}: {error}"[:2000]
+        if isinstance(error, PERMANENT_ERRORS) or job.attempts >= MAX_ATTEMPTS:
+            job.status = "failed"
+            for field in CREDENTIAL_FIELDS:
+                job.payload.pop(field, None)  # don't keep credentials around
+            stats["failed"] += 1
+        else:
+            job.available_at = now() + backoff(job.attempts)
+            stats["retried"] += 1
+        settled.append(job)
+
+    with transaction.atomic():
+        FirebaseJob.objects.filter(pk__in=done).delete()
+        FirebaseJob.objects.bulk_update(settled, ["attempts", "last_error", "status", "payload", "available_at"])
+        _record_sync_status(jobs, errors)
+    stats["done"] += len(done)
+    return stats
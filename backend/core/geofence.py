@@ -0,0 +1,102 @@
+# core/geofence.py
+import math
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+
+EARTH_RADIUS_M = 6_371_008.8  # mean Earth radius
+# Slack on top of each site's radius for phone GPS error
+TOLERANCE_M = getattr(settings, "GEOFENCE_TOLERANCE_M", 25)
+AUDIT_CHUNK_SIZE = 50_000
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres between two (lat, lng) points in degrees."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def haversine_m_array(lat1, lng1, lat2, lng2):
+    """Element-wise haversine_m over NumPy arrays; NaN in, NaN out."""
+    lat1, lng1, lat2, lng2 = (np.radians(x) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def parse_point(lat, lng):
+    """(lat, lng) as floats, or None when neither was sent; ValueError if malformed."""
+    if lat in (None, "") and lng in (None, ""):
+        return None
+    lat, lng = float(lat), float(lng)  # TypeError/ValueError for junk or a missing half
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("coordinates out of range")
+    return lat, lng
+
+
+def fence_violation(site, point):
+    """
+    None if `point` is acceptable for `site`, else an error payload for the
+    response. Sites without coordinates are not fenced.
+    """
+    if site is None or site.latitude is None or site.longitude is None:
+        return None
+    if point is None:
+        return {"error": "Location is required at this site"}
+    distance = haversine_m(float(site.latitude), float(site.longitude), *point)
+    if distance > site.geofence_radius_m + TOLERANCE_M:
+        return {
+            "error": "You are outside the site geofence",
+            "distance_m": round(distance),
+            "radius_m": site.geofence_radius_m,
+        }
+    return None
+
+
+AUDIT_COLUMNS = (
+    "id", "user_id", "shift__site_id", "check_in_time",
+    "check_in_lat", "check_in_lng", "check_out_lat", "check_out_lng",
+    "shift__site__latitude", "shift__site__longitude", "shift__site__geofence_radius_m",
+)
+
+
+def audit(records, chunk_size=AUDIT_CHUNK_SIZE):
+    """
+    Score attendance records against their site's fence in one streaming
+    pass. Each chunk of rows becomes one float matrix and both distances are
+    computed for the whole chunk at once. Returns the summary counts plus
+    the records whose check-in or check-out fell outside the fence.
+    """
+    rows = (
+        records.filter(shift__site__latitude__isnull=False, shift__site__longitude__isnull=False)
+        .order_by()
+        .values_list(*AUDIT_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+    summary = {"checked": 0, "outside": 0, "missing_location": 0, "results": []}
+    while chunk := list(islice(rows, chunk_size)):
+        # None -> NaN, so missing coordinates never count as outside
+        m = np.array([row[4:] for row in chunk], dtype=float)
+        in_lat, in_lng, out_lat, out_lng, site_lat, site_lng, radius = m.T
+        limit = radius + TOLERANCE_M
+        d_in = haversine_m_array(site_lat, site_lng, in_lat, in_lng)
+        d_out = haversine_m_array(site_lat, site_lng, out_lat, out_lng)
+        flagged = (d_in > limit) | (d_out > limit)
+
+        summary["checked"] += len(chunk)
+        summary["outside"] += int(flagged.sum())
+        summary["missing_location"] += int(np.isnan(d_in).sum())
+        for i in np.flatnonzero(flagged):
+            record_id, user_id, site_id, check_in_time = chunk[i][:4]
+            summary["results"].append({
+                "id": record_id,
+                "user": user_id,
+                "site": site_id,
+                "check_in_time": check_in_time,
+                "check_in_distance_m": None if np.isnan(d_in[i]) else round(float(d_in[i])),
+                "check_out_distance_m": None if np.isnan(d_out[i]) else round(float(d_out[i])),
+                "radius_m": int(radius[i]),
+            })
+    return summary
@@ -0,0 +1,78 @@
+# core/idempotency.py
+"""
+`Idempotency-Key` support for the async write endpoints.
+
+The first request with a given key runs and its response is kept in the
+shared Django cache for IDEMPOTENCY_KEY_TTL seconds; a retry with the
+same key gets that response back (marked `Idempotent-Replayed: true`)
+instead of running again. Keys are scoped per user and endpoint. A retry
+that arrives while the first attempt is still running gets a 409, and
+reusing a key for a different request body gets a 422. 5xx responses are
+not kept, so the client can retry them with the same key.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+TTL = getattr(settings, "IDEMPOTENCY_KEY_TTL", 86400)
+# How long a key stays claimed by an attempt that never finishes (a crashed worker)
+LOCK_TTL = 60
+
+
+def _cache_key(user, request, key):
+    digest = hashlib.sha256(f"{user.pk}:{request.path}:{key}".encode()).hexdigest()
+    return f"core:idempotency:{digest}"
+
+
+def _error(message, status_code):
+    return JsonResponse({"error": message}, status=status_code)
+
+
+async def run_once(request, user, handler):
+    """
+    Await `handler()` at most once per Idempotency-Key. Requests without
+    the header run as usual.
+    """
+    key = request.META.get(HEADER)
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return _error(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters", status.HTTP_400_BAD_REQUEST)
+
+    cache_key = _cache_key(user, request, key)
+    fingerprint = hashlib.sha256(request.body).hexdigest()
+    # add() is atomic, so of two concurrent attempts exactly one claims the key
+    if not await cache.aadd(cache_key, {"fingerprint": fingerprint}, LOCK_TTL):
+        entry = await cache.aget(cache_key)
+        if entry is None:  # expired in between
+            return _error("Request with this Idempotency-Key is in progress", status.HTTP_409_CONFLICT)
+        if entry["fingerprint"] != fingerprint:
+            return _error("Idempotency-Key was already used for a different request",
+                          status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if "status" not in entry:
+            return _error("Request with this Idempotency-Key is in progress", status.HTTP_409_CONFLICT)
+        response = HttpResponse(entry["content"], status=entry["status"], content_type=entry["content_type"])
+        response[REPLAYED_HEADER] = "true"
+        return response
+
+    try:
+        response = await handler()
+    except BaseException:
+        await cache.adelete(cache_key)
+        raise
+    if response.status_code >= 500:
+        await cache.adelete(cache_key)
+    else:
+        await cache.aset(cache_key, {
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "content": response.content,
+            "content_type": response["Content-Type"],
+        }, TTL)
+    return response
@@ -0,0 +1,111 @@
+# core/instrumentation.py
+"""
+Per-request timing: SQL, auth, Firebase verification, serialization and
+rendering, collected in a context variable so it follows the request into
+sync_to_async threads. Outside a request everything here is a no-op.
+RequestMetricsMiddleware (core.middleware) turns it into a Server-Timing
+header and one structured log line.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+N_PLUS_ONE_THRESHOLD = getattr(settings, "N_PLUS_ONE_THRESHOLD", 10)
+SLOW_QUERY_MS = getattr(settings, "SLOW_QUERY_MS", 100)
+
+_current = ContextVar("request_metrics", default=None)
+
+# `IN (%s, %s, ...)` lists vary in length for the same statement
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class RequestMetrics:
+    __slots__ = ("started", "queries", "sql_ms", "spans", "shapes", "slow", "_depth")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.spans = Counter()
+        self.shapes = Counter()
+        self.slow = []
+        self._depth = Counter()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def repeated_queries(self):
+        """SQL shapes run at least N_PLUS_ONE_THRESHOLD times: likely N+1 loops."""
+        return [(sql, n) for sql, n in self.shapes.most_common() if n >= N_PLUS_ONE_THRESHOLD]
+
+
+def start():
+    """Begin collecting for the current request; returns the token for stop()."""
+    return _current.set(RequestMetrics())
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Add the enclosed wall time to `name`. Re-entrant: only the outermost
+    span of a name counts, so nested serializers aren't double-counted.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics._depth[name]:
+        yield
+        return
+    metrics._depth[name] += 1
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += (time.perf_counter() - began) * 1000
+        metrics._depth[name] -= 1
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper; installed on every connection (see CoreConfig.ready)."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - began) * 1000
+        metrics.queries += 1
+        metrics.sql_ms += elapsed
+        shape = _IN_LIST.sub("IN (...)", sql)
+        metrics.shapes[shape] += 1
+        if elapsed >= SLOW_QUERY_MS:
+            metrics.slow.append((shape, elapsed))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: wrap every new database connection once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """
+    Counts to_representation() time as "serialize". In a list this is timed
+    per item, so evaluating the queryset itself stays under "db"; lazy
+    queries fired while serializing an item count in both.
+    """
+
+    def to_representation(self, instance):
+        with span("serialize"):
+            return super().to_representation(instance)
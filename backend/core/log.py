@@ -0,0 +1,86 @@
+# core/log.py
+"""
+Logging building blocks wired up by settings.LOGGING: JSON lines, a
+sampling filter for the per-request auth logs, and a handler that hands
+records to a background thread so stream I/O never runs on a request.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, plus any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Pass `rate` of the records below `keep_level`; everything at or above it passes."""
+
+    def __init__(self, rate=1.0, keep_level=logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.keep_level = logging._checkLevel(keep_level)
+
+    def filter(self, record):
+        return record.levelno >= self.keep_level or random.random() < self.rate
+
+
+class QueuedStreamHandler(QueueHandler):
+    """
+    Enqueues records on the calling thread; a QueueListener thread formats
+    and writes them to `stream`. The listener starts with the handler (so
+    after any fork, in the process that configures logging) and is flushed
+    at exit.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Drain the queue and join the listener thread; safe to call twice."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, in the target handler
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Freeze what can't cross threads safely, but keep `extra=` fields for the formatter
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        self.stop()
+        super().close()
@@ -0,0 +1,29 @@
+# core/management/commands/classify_attendance.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.classifier import classify
+
+
+class Command(BaseCommand):
+    help = "Mark late check-ins and create absent records for missed shifts (incremental)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true",
+                            help="Forget the checkpoint and reclassify all history.")
+        parser.add_argument("--interval", type=float,
+                            help="Keep running, every N seconds (default: run once).")
+
+    def handle(self, *args, **options):
+        reset = options["reset"]
+        while True:
+            close_old_connections()
+            began = time.perf_counter()
+            late, absent = classify(reset=reset)
+            reset = False
+            self.stdout.write(f"late={late} absent={absent} in {time.perf_counter() - began:.2f}s")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,139 @@
+# core/management/commands/explain_querysets.py
+import random
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from core.models import Site, WorkShift, AttendanceRecord, IncidentReport, UserProfile
+from core.views import SiteViewSet, WorkShiftViewSet, AttendanceViewSet, IncidentViewSet, UserProfileViewSet
+
+VIEWSETS = [SiteViewSet, WorkShiftViewSet, AttendanceViewSet, IncidentViewSet, UserProfileViewSet]
+ROLES = ["admin", "supervisor", "guard"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Print EXPLAIN (ANALYZE on Postgres) for every viewset's list queryset per role, "
+        "optionally against a synthetic dataset that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Insert this many synthetic shifts (plus attendance/incidents) first.")
+        parser.add_argument("--sites", type=int, default=50)
+        parser.add_argument("--guards", type=int, default=500)
+        parser.add_argument("--page-size", type=int, default=50,
+                            help="LIMIT applied to list querysets, like a paginated request.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed"]:
+                users = self.seed(options["seed"], options["sites"], options["guards"])
+            else:
+                users = self.pick_users()
+            for viewset in VIEWSETS:
+                for role in ROLES:
+                    user = users.get(role)
+                    if user is None:
+                        continue
+                    view = viewset()
+                    view.request = SimpleNamespace(user=user, query_params={})
+                    view.action = "list"
+                    queryset = view.get_queryset()[: options["page_size"]]
+                    self.explain(f"{viewset.__name__} list as {role}", queryset)
+
+            guard = users.get("guard")
+            if guard is not None:
+                open_record = (
+                    AttendanceRecord.objects
+                    .filter(user=guard, check_out_time__isnull=True)
+                    .values_list("shift_id", flat=True).first()
+                )
+                queryset = (
+                    AttendanceRecord.objects
+                    .filter(shift_id=open_record or 0, user=guard, check_out_time__isnull=True)
+                    .order_by("-check_in_time")[:1]
+                )
+                self.explain("AttendanceViewSet.check_out lookup", queryset)
+
+            # Never keep the synthetic rows
+            transaction.set_rollback(True)
+
+    def explain(self, label, queryset):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"== {label}"))
+        if connection.vendor == "postgresql":
+            plan = queryset.explain(analyze=True, buffers=True)
+        else:
+            plan = queryset.explain()
+        self.stdout.write(plan)
+        self.stdout.write("")
+
+    def pick_users(self):
+        users = {}
+        for role in ROLES:
+            users[role] = UserProfile.objects.filter(role=role).order_by("id").first()
+        return users
+
+    def seed(self, shift_count, site_count, guard_count):
+        """Bulk-insert a synthetic dataset of roughly `shift_count` shifts."""
+        stamp = now().strftime("%Y%m%d%H%M%S")
+        sites = Site.objects.bulk_create(
+            Site(name=f"explain-{stamp}-site-{i}") for i in range(site_count)
+        )
+        guards = UserProfile.objects.bulk_create(
+            UserProfile(uid=f"explain-{stamp}-g{i}", email=f"g{i}.{stamp}@explain.local",
+                        full_name=f"Guard {i}", role="guard")
+            for i in range(guard_count)
+        )
+        supervisor = UserProfile.objects.create(
+            uid=f"explain-{stamp}-sup", email=f"sup.{stamp}@explain.local",
+            full_name="Supervisor", role="supervisor",
+        )
+        supervisor.supervisor_sites.set(sites[:5])
+        admin = UserProfile.objects.create(
+            uid=f"explain-{stamp}-admin", email=f"admin.{stamp}@explain.local",
+            full_name="Admin", role="admin",
+        )
+
+        rng = random.Random(42)
+        base = now() - timedelta(days=365)
+        shifts = WorkShift.objects.bulk_create(
+            (
+                WorkShift(
+                    site=rng.choice(sites),
+                    assigned_user=rng.choice(guards),
+                    start=(start := base + timedelta(minutes=rng.randrange(365 * 24 * 60))),
+                    end=start + timedelta(hours=8),
+                )
+                for _ in range(shift_count)
+            ),
+            batch_size=5000,
+        )
+        AttendanceRecord.objects.bulk_create(
+            (
+                AttendanceRecord(
+                    shift=shift,
+                    user=shift.assigned_user,
+                    check_in_time=shift.start + timedelta(minutes=rng.randrange(-10, 30)),
+                    # ~2% still open
+                    check_out_time=None if rng.random() < 0.02 else shift.end,
+                )
+                for shift in shifts
+            ),
+            batch_size=5000,
+        )
+        IncidentReport.objects.bulk_create(
+            (
+                IncidentReport(shift=shift, user=shift.assigned_user, severity="low", description="seed")
+                for shift in rng.sample(shifts, len(shifts) // 10)
+            ),
+            batch_size=5000,
+        )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        self.stdout.write(f"Seeded {len(shifts)} shifts across {site_count} sites and {guard_count} guards.")
+        return {"admin": admin, "supervisor": supervisor, "guard": guards[0]}
@@ -0,0 +1,33 @@
+# core/management/commands/rebuild_timesheets.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.timesheets import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyAttendanceRollup rows from AttendanceRecord (optionally for a date range)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Last day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = self.parse(options["start"], "--from")
+        end = self.parse(options["end"], "--to")
+        began = time.perf_counter()
+        written = rebuild(start, end, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} daily rollups in {time.perf_counter() - began:.1f}s."
+        ))
+
+    def parse(self, value, flag):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{flag} must be YYYY-MM-DD")
+        return day
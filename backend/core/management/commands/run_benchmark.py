@@ -0,0 +1,48 @@
+# core/management/commands/run_benchmark.py
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import compare, run_render_suite, run_suite
+
+
+class Command(BaseCommand):
+    help = "Benchmark every endpoint per role against seed_benchmark data; prints a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", help="Regex on scenario names (e.g. 'shifts|attendance').")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument("--compare", help="Earlier JSON report to diff p50/queries/bytes against.")
+        parser.add_argument("--renderers", action="store_true",
+                            help="Compare renderers and compression on the big list payloads instead.")
+
+    def handle(self, *args, **options):
+        only = re.compile(options["only"]) if options["only"] else None
+        try:
+            if options["renderers"]:
+                report = run_render_suite(iterations=options["iterations"], only=only, log=self.stderr.write)
+            else:
+                report = run_suite(
+                    iterations=options["iterations"],
+                    warmup=options["warmup"],
+                    only=only,
+                    log=self.stderr.write,
+                )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["compare"] and not options["renderers"]:
+            with open(options["compare"]) as f:
+                for line in compare(json.load(f), report):
+                    self.stderr.write(line)
+
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(payload + "\n")
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,32 @@
+# core/management/commands/run_firebase_jobs.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.firebase_jobs import BATCH_SIZE, run_batch
+
+
+class Command(BaseCommand):
+    help = "Drain the Firebase Admin outbox (FirebaseJob), retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Process due jobs until none are left, then exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            close_old_connections()
+            stats = run_batch(batch_size)
+            if stats["done"] or stats["retried"] or stats["failed"]:
+                self.stdout.write(f"done={stats['done']} retried={stats['retried']} failed={stats['failed']}")
+            # A full batch means more may be due; otherwise wait for new work
+            if sum(stats.values()) >= batch_size:
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
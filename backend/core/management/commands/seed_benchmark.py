@@ -0,0 +1,48 @@
+# core/management/commands/seed_benchmark.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import flush, seed
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic sites/users/shifts/attendance/incidents for benchmarking (bulk inserts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sites", type=int, default=200)
+        parser.add_argument("--guards", type=int, default=5000)
+        parser.add_argument("--supervisors", type=int, default=50)
+        parser.add_argument("--shifts", type=int, default=1_000_000)
+        parser.add_argument("--days", type=int, default=365, help="Span of the shift calendar.")
+        parser.add_argument("--attendance-rate", type=float, default=1.0,
+                            help="Share of ended shifts that get an attendance record.")
+        parser.add_argument("--incident-rate", type=float, default=1.0,
+                            help="Share of attended shifts that get an incident report.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed, same data).")
+        parser.add_argument("--flush", action="store_true", help="Delete earlier benchmark data first.")
+        parser.add_argument("--flush-only", action="store_true", help="Delete benchmark data and exit.")
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        if options["flush"] or options["flush_only"]:
+            flush()
+            self.stdout.write("Removed earlier benchmark data.")
+            if options["flush_only"]:
+                return
+        try:
+            counts = seed(
+                sites=options["sites"],
+                guards=options["guards"],
+                supervisors=options["supervisors"],
+                shifts=options["shifts"],
+                days=options["days"],
+                attendance_rate=options["attendance_rate"],
+                incident_rate=options["incident_rate"],
+                rng_seed=options["seed"],
+                log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        summary = " ".join(f"{k}={v}" for k, v in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary} in {time.perf_counter() - began:.1f}s."))
@@ -0,0 +1,127 @@
+# core/middleware.py
+import logging
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import instrumentation
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+request_logger = logging.getLogger("core.requests")
+
+
+class RequestMetricsMiddleware:
+    """
+    Times each HTTP request (see core.instrumentation) and reports it as a
+    Server-Timing header plus one structured log line on the "core.requests"
+    logger, at WARNING when it ran a query shape N+1 times or a slow query.
+    Async-capable, so async views don't get pushed onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = instrumentation.start()
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            instrumentation.stop(token)
+
+    async def __acall__(self, request):
+        token = instrumentation.start()
+        try:
+            response = await self.get_response(request)
+            return self.finish(request, response)
+        finally:
+            instrumentation.stop(token)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that as "render"
+        span = instrumentation.span("render")
+        span.__enter__()
+
+        def rendered(response):
+            span.__exit__(None, None, None)  # must return None, or it replaces the response
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response):
+        metrics = instrumentation.current()
+        total = metrics.elapsed_ms()
+        spans = metrics.spans
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={metrics.sql_ms:.1f};desc="{metrics.queries} queries"',
+            *(f"{name};dur={ms:.1f}" for name, ms in spans.items()),
+            f"total;dur={total:.1f}",
+        ])
+
+        repeated = metrics.repeated_queries()
+        user = getattr(request, "user", None)
+        entry = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "ms": round(total, 1),
+            "queries": metrics.queries,
+            "sql_ms": round(metrics.sql_ms, 1),
+            **{f"{name}_ms": round(ms, 1) for name, ms in spans.items()},
+            "user": getattr(user, "pk", None),
+        }
+        if response.streaming:
+            entry["streaming"] = True  # body (and its queries) still to come
+        if repeated:
+            entry["n_plus_one"] = [{"sql": sql[:300], "count": n} for sql, n in repeated[:5]]
+        if metrics.slow:
+            entry["slow_queries"] = [{"sql": sql[:300], "ms": round(ms, 1)} for sql, ms in metrics.slow[:5]]
+        level = logging.WARNING if repeated or metrics.slow else logging.INFO
+        request_logger.log(level, "%s %s %s", request.method, request.path, response.status_code, extra=entry)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses bodies of at least COMPRESS_MIN_BYTES: Brotli when the client
+    accepts it and the `brotli` package is installed, gzip otherwise (and
+    always for streaming bodies). Like GZipMiddleware, strong ETags become
+    weak; ConditionalGetMixin compares them weakly.
+    """
+    min_bytes = getattr(settings, "COMPRESS_MIN_BYTES", 1024)
+    brotli_quality = 5  # on-the-fly: 11 is several times slower for a few % smaller
+    accepts_br = re.compile(r"\bbr\b")
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return response
+        with instrumentation.span("compress"):
+            if (brotli is None or response.streaming or response.has_header("Content-Encoding")
+                    or not self.accepts_br.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))):
+                return super().process_response(request, response)
+
+            patch_vary_headers(response, ("Accept-Encoding",))
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+            etag = response.get("ETag")
+            if etag and etag.startswith('"'):
+                response.headers["ETag"] = "W/" + etag
+            response.headers["Content-Encoding"] = "br"
+            return response
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['-check_in_time', '-id'], name='attendance_checkin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['user', '-check_in_time'], name='attendance_user_checkin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(condition=models.Q(('check_out_time__isnull', True)), fields=['shift', 'user', '-check_in_time'], name='attendance_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentreport',
+            index=models.Index(fields=['-created_at', '-id'], name='incident_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentreport',
+            index=models.Index(fields=['user', '-created_at'], name='incident_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentreport',
+            index=models.Index(fields=['shift', '-created_at'], name='incident_shift_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workshift',
+            index=models.Index(fields=['-start', '-id'], name='shift_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workshift',
+            index=models.Index(fields=['site', '-start'], name='shift_site_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workshift',
+            index=models.Index(fields=['assigned_user', '-start'], name='shift_guard_start_idx'),
+        ),
+    ]
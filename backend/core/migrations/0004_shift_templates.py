@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.CharField(max_length=7)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('active', models.BooleanField(default=True)),
+                ('assigned_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shift_templates', to='core.userprofile')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_templates', to='core.site')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='workshift',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shifts', to='core.shifttemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='workshift',
+            constraint=models.UniqueConstraint(condition=models.Q(('template__isnull', False)), fields=('template', 'start'), name='unique_template_occurrence'),
+        ),
+    ]
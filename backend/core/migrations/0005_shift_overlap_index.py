@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_shift_templates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workshift',
+            index=models.Index(fields=['assigned_user', 'end'], name='shift_guard_end_idx'),
+        ),
+    ]
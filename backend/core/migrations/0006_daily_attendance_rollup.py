@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_shift_overlap_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('worked_seconds', models.BigIntegerField(default=0)),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('guard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.userprofile')),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.site')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'guard'], name='rollup_date_guard_idx'), models.Index(fields=['site', 'date'], name='rollup_site_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('guard', 'site', 'date'), name='unique_daily_rollup')],
+            },
+        ),
+    ]
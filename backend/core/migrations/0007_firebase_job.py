@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_daily_attendance_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirebaseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('create_user', 'Create user'), ('update_user', 'Update user'), ('set_claims', 'Set custom claims'), ('delete_user', 'Delete user')], max_length=20)),
+                ('uid', models.CharField(max_length=128)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['available_at', 'id'], name='firebase_job_due_idx'), models.Index(fields=['uid'], name='firebase_job_uid_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_firebase_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='site',
+            name='geofence_radius_m',
+            field=models.PositiveIntegerField(default=150),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='site',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+    ]
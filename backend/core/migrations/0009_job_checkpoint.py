@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_site_geofence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('change_seq', models.BigIntegerField(default=0)),
+                ('ran_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:16
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.utils.timezone import localdate, make_aware
+
+
+def _next_change_seq(apps, connection):
+    # core.sync.next_change_seq(), frozen at this point in the schema
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('core_change_seq')")
+            return cursor.fetchone()[0]
+    ChangeCounter = apps.get_model("core", "ChangeCounter")
+    counter, _ = ChangeCounter.objects.get_or_create(pk=1)
+    ChangeCounter.objects.filter(pk=1).update(value=F("value") + 1)
+    return counter.value + 1
+
+
+def _refresh_rollups(apps, buckets):
+    # core.timesheets.refresh_buckets() and summarize(), frozen likewise
+    AttendanceRecord = apps.get_model("core", "AttendanceRecord")
+    DailyAttendanceRollup = apps.get_model("core", "DailyAttendanceRollup")
+    for user_id, site_id, day in buckets:
+        day_start = make_aware(datetime.combine(day, time.min))
+        rows = AttendanceRecord.objects.filter(
+            user_id=user_id, shift__site_id=site_id,
+            check_in_time__gte=day_start, check_in_time__lt=day_start + timedelta(days=1),
+        ).values_list("check_in_time", "check_out_time", "status")
+        totals = {"worked_seconds": 0, "records": 0, "late_count": 0, "absent_count": 0}
+        for check_in, check_out, status in rows:
+            totals["records"] += 1
+            if status == "absent":
+                totals["absent_count"] += 1
+                continue
+            if status == "late":
+                totals["late_count"] += 1
+            if check_out is not None and check_out > check_in:
+                totals["worked_seconds"] += int((check_out - check_in).total_seconds())
+        if totals["records"]:
+            DailyAttendanceRollup.objects.update_or_create(
+                guard_id=user_id, site_id=site_id, date=day, defaults=totals,
+            )
+        else:
+            DailyAttendanceRollup.objects.filter(guard_id=user_id, site_id=site_id, date=day).delete()
+
+
+def close_duplicate_open_records(apps, schema_editor):
+    # Duplicates came from double taps/retries: keep the latest open, close the rest with zero length
+    AttendanceRecord = apps.get_model("core", "AttendanceRecord")
+    duplicates = list(
+        AttendanceRecord.objects.filter(check_out_time__isnull=True)
+        .values("shift_id", "user_id")
+        .annotate(open_count=Count("id"))
+        .filter(open_count__gt=1)
+    )
+    if not duplicates:
+        return
+    # Closed rows must reach delta-sync clients like any other write
+    seq = _next_change_seq(apps, schema_editor.connection)
+    buckets = set()
+    for pair in duplicates:
+        open_records = AttendanceRecord.objects.filter(
+            shift_id=pair["shift_id"], user_id=pair["user_id"], check_out_time__isnull=True,
+        )
+        stale = list(
+            open_records.order_by("-check_in_time", "-id").values_list("id", "shift__site_id", "check_in_time")[1:]
+        )
+        AttendanceRecord.objects.filter(pk__in=[row[0] for row in stale]).update(
+            check_out_time=F("check_in_time"), change_seq=seq,
+        )
+        buckets.update((pair["user_id"], site_id, localdate(check_in)) for _, site_id, check_in in stale)
+    _refresh_rollups(apps, buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_attendance_sync_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_records, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='attendancerecord',
+            name='attendance_open_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('check_out_time__isnull', True)), fields=('shift', 'user'), name='attendance_one_open_per_shift'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Draws the next change marker. The first draw in a transaction also takes a
+# shared advisory lock on a lower bound of every value the transaction will
+# draw (the sequence's next value, read before nextval) and holds it until
+# the transaction ends; core.sync.current_change_seq() keeps sync tokens
+# below the oldest such lease, so a token never passes an uncommitted row.
+CREATE_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_next_change_seq() RETURNS bigint
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF current_setting('core.change_seq_leased', true) IS DISTINCT FROM 'on' THEN
+        PERFORM pg_advisory_xact_lock_shared(
+            (SELECT last_value + CASE WHEN is_called THEN 1 ELSE 0 END FROM core_change_seq)
+        );
+        PERFORM set_config('core.change_seq_leased', 'on', true);
+    END IF;
+    RETURN nextval('core_change_seq');
+END
+$$
+"""
+
+
+def create_next_change_seq(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_FUNCTION)
+
+
+def drop_next_change_seq(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP FUNCTION IF EXISTS core_next_change_seq()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_attendance_one_open_record'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_next_change_seq, drop_next_change_seq),
+    ]
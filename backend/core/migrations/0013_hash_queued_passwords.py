@@ -0,0 +1,35 @@
+import base64
+import hashlib
+import os
+
+from django.db import migrations
+
+# Same scheme as core.firebase_client.hash_password, frozen here
+ROUNDS = 100_000
+
+
+def hash_queued_passwords(apps, schema_editor):
+    FirebaseJob = apps.get_model("core", "FirebaseJob")
+    jobs = list(FirebaseJob.objects.filter(payload__has_key="password"))
+    for job in jobs:
+        password = job.payload.pop("password") or ""
+        if password:
+            salt = os.urandom(16)
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, ROUNDS)
+            job.payload.update(
+                password_hash=base64.b64encode(digest).decode(),
+                password_salt=base64.b64encode(salt).decode(),
+                password_rounds=ROUNDS,
+            )
+    FirebaseJob.objects.bulk_update(jobs, ["payload"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_change_seq_leases'),
+    ]
+
+    operations = [
+        migrations.RunPython(hash_queued_passwords, migrations.RunPython.noop),
+    ]
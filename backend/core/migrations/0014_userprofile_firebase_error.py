@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_hash_queued_passwords'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='firebase_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -1,9 +1,22 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 
 class Site(models.Model):
     name = models.CharField(max_length=100, unique=True)
     location = models.CharField(max_length=255, blank=True)
+    # Geofence for check-in/check-out; not enforced while the coordinates are unset
+    latitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.DecimalField(
+        max_digits=9, decimal_places=6, null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+    geofence_radius_m = models.PositiveIntegerField(default=150)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -24,6 +37,9 @@ class UserProfile(models.Model):
         blank=True,
         related_name="supervisors",
     )
+    # Why the Firebase account is out of sync (a queued job failed for good); blank when it isn't
+    firebase_error = models.TextField(blank=True, editable=False)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     def __str__(self):
         return f"{self.full_name} ({self.role})"
@@ -33,6 +49,30 @@ class UserProfile(models.Model):
         return True
 
 
+class ShiftTemplate(models.Model):
+    """Recurring weekly shift used to generate WorkShift rows in bulk."""
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, related_name="shift_templates")
+    # Weekday digits, Monday=0 … Sunday=6 (e.g. "01234" for weekdays)
+    weekdays = models.CharField(max_length=7)
+    start_time = models.TimeField()
+    end_time = models.TimeField()  # at or before start_time means the shift ends the next day
+    assigned_user = models.ForeignKey(
+        "UserProfile",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="shift_templates",
+    )
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.site.name}: {self.weekdays} {self.start_time}–{self.end_time}"
+
+    @property
+    def weekday_set(self):
+        return {int(d) for d in self.weekdays}
+
+
 class WorkShift(models.Model):
     site = models.ForeignKey(
         Site,
@@ -50,6 +90,33 @@ class WorkShift(models.Model):
         blank=True,
         related_name="shifts",
     )
+    template = models.ForeignKey(
+        ShiftTemplate,
+        on_delete=models.SET_NULL,   # generated shifts outlive their template
+        null=True,
+        blank=True,
+        related_name="shifts",
+    )
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        constraints = [
+            # Makes roster generation idempotent
+            models.UniqueConstraint(
+                fields=["template", "start"],
+                condition=models.Q(template__isnull=False),
+                name="unique_template_occurrence",
+            ),
+        ]
+        indexes = [
+            # Admin list + keyset pagination
+            models.Index(fields=["-start", "-id"], name="shift_start_idx"),
+            # Supervisor (site__in) and guard (assigned_user) lists
+            models.Index(fields=["site", "-start"], name="shift_site_start_idx"),
+            models.Index(fields=["assigned_user", "-start"], name="shift_guard_start_idx"),
+            # Double-booking checks: "guard's shifts ending after X"
+            models.Index(fields=["assigned_user", "end"], name="shift_guard_end_idx"),
+        ]
 
     def __str__(self):
         site_name = self.site.name if self.site else "Unassigned Site"
@@ -82,6 +149,24 @@ class AttendanceRecord(models.Model):
         ("absent", "Absent"),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    # Client-generated ids of the offline events that opened/closed this record (core.attendance_sync)
+    check_in_event = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    check_out_event = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-check_in_time", "-id"], name="attendance_checkin_idx"),
+            models.Index(fields=["user", "-check_in_time"], name="attendance_user_checkin_idx"),
+        ]
+        constraints = [
+            # At most one open record per guard and shift; also serves check-out and the on-duty KPI
+            models.UniqueConstraint(
+                fields=["shift", "user"],
+                name="attendance_one_open_per_shift",
+                condition=models.Q(check_out_time__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         site_name = self.shift.site.name if self.shift and self.shift.site else "Unassigned Site"
@@ -120,6 +205,117 @@ class IncidentReport(models.Model):
         ("resolved", "Resolved"),
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="incident_created_idx"),
+            models.Index(fields=["user", "-created_at"], name="incident_user_created_idx"),
+            models.Index(fields=["shift", "-created_at"], name="incident_shift_created_idx"),
+        ]
 
     def __str__(self):
         return f"Incident ({self.severity}) by {self.user.full_name} — {self.status}"
+
+
+class ChangeCounter(models.Model):
+    """
+    Single-row fallback for the change sequence on databases without
+    native sequences (Postgres uses the `core_change_seq` sequence).
+    """
+    value = models.BigIntegerField(default=0)
+
+
+class Tombstone(models.Model):
+    """Records deletions so delta-sync clients can drop rows they still hold."""
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField(db_index=True)
+    # Denormalized scope so supervisors/guards only see their own deletions
+    site_id = models.BigIntegerField(null=True, blank=True)
+    user_id = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "change_seq"])]
+
+    def __str__(self):
+        return f"{self.model}#{self.object_id} deleted @ {self.change_seq}"
+
+
+class DailyAttendanceRollup(models.Model):
+    """
+    Materialized per guard/site/day attendance totals backing /timesheets/.
+    Maintained incrementally from AttendanceRecord changes (core.timesheets)
+    and rebuildable with `manage.py rebuild_timesheets`.
+    """
+    guard = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="daily_rollups")
+    site = models.ForeignKey(Site, on_delete=models.CASCADE, null=True, blank=True, related_name="daily_rollups")
+    date = models.DateField()
+    worked_seconds = models.BigIntegerField(default=0)
+    records = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["guard", "site", "date"], name="unique_daily_rollup"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "guard"], name="rollup_date_guard_idx"),
+            models.Index(fields=["site", "date"], name="rollup_site_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.guard_id}@{self.site_id} {self.date}: {self.worked_seconds}s"
+
+
+class FirebaseJob(models.Model):
+    """
+    Outbox row for a Firebase Admin call. Written in the same transaction as
+    the UserProfile change and executed by `manage.py run_firebase_jobs`
+    (core.firebase_jobs); rows are deleted once the call succeeds.
+    """
+    ACTION_CHOICES = [
+        ("create_user", "Create user"),
+        ("update_user", "Update user"),
+        ("set_claims", "Set custom claims"),
+        ("delete_user", "Delete user"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("failed", "Failed"),
+    ]
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    uid = models.CharField(max_length=128)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                name="firebase_job_due_idx",
+                condition=models.Q(status="pending"),
+            ),
+            models.Index(fields=["uid"], name="firebase_job_uid_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.uid} ({self.status}, {self.attempts} attempts)"
+
+
+class JobCheckpoint(models.Model):
+    """
+    High-water marks of an incremental background job, so each run only
+    looks at rows changed since the previous one (see core.classifier).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    change_seq = models.BigIntegerField(default=0)
+    ran_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.change_seq} ({self.ran_at})"
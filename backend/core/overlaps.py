@@ -0,0 +1,94 @@
+# core/overlaps.py
+import heapq
+from itertools import groupby
+
+from rest_framework.exceptions import ValidationError
+
+from .models import UserProfile, WorkShift
+
+
+def conflicting_shift(user_id, start, end, exclude_pk=None):
+    """
+    First shift of `user_id` overlapping [start, end), or None.
+
+    Filtering on `end > start` first keeps this a short range scan on the
+    (assigned_user, end) index no matter how much history the guard has.
+    """
+    if not user_id or start is None or end is None:
+        return None
+    queryset = WorkShift.objects.filter(assigned_user_id=user_id, end__gt=start, start__lt=end)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset.order_by("start").first()
+
+
+def ensure_no_overlap(user_id, start, end, exclude_pk=None):
+    """
+    Raise a 400 if the guard is already booked in [start, end).
+    Call inside a transaction: the guard row is locked so two concurrent
+    assignments of the same guard cannot both pass the check.
+    """
+    if not user_id:
+        return
+    list(UserProfile.objects.select_for_update().filter(pk=user_id).values_list("pk"))
+    clash = conflicting_shift(user_id, start, end, exclude_pk)
+    if clash is not None:
+        raise ValidationError({
+            "assigned_user": f"Guard is already booked on shift #{clash.pk} ({clash.start} → {clash.end})."
+        })
+
+
+def find_overlaps(rows):
+    """
+    Sweep-line over (id, user_id, start, end) rows; yields overlapping pairs
+    as (user_id, first_id, second_id, overlap_start, overlap_end).
+
+    Rows must be ordered by (user_id, start). Each guard's shifts are swept
+    once with a min-heap of end times, so the cost is O(n log n + pairs)
+    instead of comparing every shift with every other.
+    """
+    for user_id, shifts in groupby(rows, key=lambda r: r[1]):
+        active = []  # heap of (end, id)
+        for shift_id, _, start, end in shifts:
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for other_end, other_id in active:
+                yield user_id, other_id, shift_id, start, min(end, other_end)
+            heapq.heappush(active, (end, shift_id))
+
+
+def shifts_overlapping_batch(shifts):
+    """
+    Split unsaved shifts into (ok, conflicting) for bulk assignment: a shift
+    conflicts if its guard already has an overlapping shift in the database
+    or an earlier shift in the same batch.
+    """
+    assigned = [s for s in shifts if s.assigned_user_id]
+    if not assigned:
+        return list(shifts), []
+
+    window_start = min(s.start for s in assigned)
+    window_end = max(s.end for s in assigned)
+    existing = (
+        WorkShift.objects
+        .filter(
+            assigned_user_id__in={s.assigned_user_id for s in assigned},
+            end__gt=window_start,
+            start__lt=window_end,
+        )
+        .values_list("assigned_user_id", "start", "end")
+    )
+    booked = {}
+    for user_id, start, end in existing:
+        booked.setdefault(user_id, []).append((start, end))
+
+    ok, conflicts = [], []
+    for shift in sorted(shifts, key=lambda s: (s.assigned_user_id or 0, s.start)):
+        intervals = booked.setdefault(shift.assigned_user_id, []) if shift.assigned_user_id else None
+        if intervals is not None and any(s < shift.end and e > shift.start for s, e in intervals):
+            conflicts.append(shift)
+            continue
+        if intervals is not None:
+            intervals.append((shift.start, shift.end))
+        ok.append(shift)
+    return ok, conflicts
@@ -0,0 +1,114 @@
+# core/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination on ``(view.keyset_ordering, id)``.
+
+    Each page continues after the last row with
+    ``WHERE field <= last_field AND (field < last_field OR id < last_id)``
+    (mirrored for ascending order). The first conjunct bounds the index
+    range scan on ``(field, id)``, so deep pages cost the same as the first
+    one; the OR only sorts out ties at the boundary. Pagination is opt-in:
+    requests without ``cursor`` or ``page_size`` still get the full list,
+    which keeps the current portals working unchanged.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 200
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        try:
+            size = int(params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, view):
+        ordering = getattr(view, "keyset_ordering", "-id")
+        return ordering.lstrip("-"), ordering.startswith("-")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size_value = self.get_page_size(request)
+        if self.page_size_value is None:
+            return None
+
+        self.request = request
+        self.field, self.descending = self.get_ordering(view)
+        prefix = "-" if self.descending else ""
+        queryset = queryset.order_by(f"{prefix}{self.field}", f"{prefix}id")
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            value, pk = self.decode_cursor(encoded, queryset.model)
+            op = "lt" if self.descending else "gt"
+            # The plain comparison gives the planner an index bound; an OR alone would not
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{op}e": value}),
+                Q(**{f"{self.field}__{op}": value}) | Q(**{f"id__{op}": pk}),
+            )
+
+        rows = list(queryset[: self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        rows = rows[: self.page_size_value]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+        return replace_query_param(url, self.page_size_query_param, self.page_size_value)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    # ---------- Cursor encoding ----------
+    def encode_cursor(self, obj):
+        # Model instances, or .values() rows from the list fast path (core.fieldsets)
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj["id"]
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        raw = json.dumps([value, pk], separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, encoded, model):
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            value, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            value = model._meta.get_field(self.field).to_python(value)
+            pk = int(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
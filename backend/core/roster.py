@@ -0,0 +1,90 @@
+# core/roster.py
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils.timezone import get_current_timezone, make_aware
+
+from .events import publish_change
+from .models import UserProfile, WorkShift
+from .overlaps import shifts_overlapping_batch
+from .sync import next_change_seq
+
+BULK_BATCH_SIZE = 1000
+
+
+def expand_templates(templates, start_date, end_date):
+    """Yield unsaved WorkShift rows for every template occurrence in [start_date, end_date]."""
+    tz = get_current_timezone()
+    plans = [(t, t.weekday_set) for t in templates]
+    day = start_date
+    while day <= end_date:
+        weekday = day.weekday()
+        for template, weekdays in plans:
+            if weekday not in weekdays:
+                continue
+            end_day = day + timedelta(days=1) if template.end_time <= template.start_time else day
+            yield WorkShift(
+                site_id=template.site_id,
+                assigned_user_id=template.assigned_user_id,
+                template=template,
+                start=make_aware(datetime.combine(day, template.start_time), tz),
+                end=make_aware(datetime.combine(end_day, template.end_time), tz),
+            )
+        day += timedelta(days=1)
+
+
+def generate_shifts(templates, start_date, end_date):
+    """
+    Materialize template occurrences as WorkShift rows in one transaction.
+
+    Occurrences that already exist (same template and start) are skipped,
+    so re-running a range is safe. Occurrences whose guard is already
+    booked at that time are still created, but left unassigned. Rows go in
+    with bulk_create, which skips save() signals, so the change marker and
+    push events are issued once for the whole batch here instead.
+    Returns (created, skipped, unassigned), counting only the rows this
+    call actually inserted.
+    """
+    templates = list(templates)
+    candidates = list(expand_templates(templates, start_date, end_date))
+    if not candidates:
+        return 0, 0, 0
+
+    with transaction.atomic():
+        existing = set(
+            WorkShift.objects
+            .filter(
+                template__in=templates,
+                start__gte=min(s.start for s in candidates),
+                start__lte=max(s.start for s in candidates),
+            )
+            .values_list("template_id", "start")
+        )
+        new_shifts = [s for s in candidates if (s.template_id, s.start) not in existing]
+
+        # Double-booking check for every guard in the batch, under a row lock
+        guard_ids = {s.assigned_user_id for s in new_shifts if s.assigned_user_id}
+        list(UserProfile.objects.select_for_update().filter(pk__in=guard_ids).values_list("pk"))
+        _, conflicts = shifts_overlapping_batch(new_shifts)
+        for shift in conflicts:
+            shift.assigned_user_id = None
+
+        ours = set()
+        if new_shifts:
+            seq = next_change_seq()
+            for shift in new_shifts:
+                shift.change_seq = seq
+            # ignore_conflicts covers a concurrent run racing us on the unique constraint
+            WorkShift.objects.bulk_create(new_shifts, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+            # Skipped rows get no pk back, but only ours carry this change marker
+            ours = set(
+                WorkShift.objects.filter(template__in=templates, change_seq=seq).values_list("template_id", "start")
+            )
+            inserted = [s for s in new_shifts if (s.template_id, s.start) in ours]
+            for site_id in {s.site_id for s in inserted}:
+                publish_change("roster", "generated", site_id, site_id=site_id, seq=seq)
+            for user_id in {s.assigned_user_id for s in inserted if s.assigned_user_id}:
+                publish_change("guard_roster", "generated", user_id, user_id=user_id, seq=seq)
+
+    unassigned = sum(1 for s in conflicts if (s.template_id, s.start) in ours)
+    return len(ours), len(candidates) - len(ours), unassigned
@@ -1,24 +1,28 @@
 from rest_framework import serializers
-from firebase_admin import auth as firebase_auth
-from .models import Site, WorkShift, AttendanceRecord, IncidentReport, UserProfile
+from django.db import transaction
+from .models import Site, ShiftTemplate, WorkShift, AttendanceRecord, IncidentReport, UserProfile
+from . import firebase_jobs
+from .fieldsets import SparseFieldsMixin, ValuesListSerializer
+from .instrumentation import TimedSerializerMixin
 
 
 # ---------- User Profiles ----------
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProfile
+        list_serializer_class = ValuesListSerializer
         fields = "__all__"
 
     def update(self, instance, validated_data):
         """
-        Ensure updates also sync to Firebase.
+        Ensure updates also sync to Firebase (queued for the worker).
         """
         old_email = instance.email
         old_role = instance.role
 
-        instance = super().update(instance, validated_data)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
 
-        try:
             # Sync to Firebase if user has a UID
             if instance.uid:
                 update_fields = {}
@@ -28,21 +32,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
                     update_fields["display_name"] = validated_data["full_name"]
 
                 if update_fields:
-                    firebase_auth.update_user(instance.uid, **update_fields)
+                    firebase_jobs.enqueue("update_user", instance.uid, **update_fields)
 
                 if "role" in validated_data and validated_data["role"] != old_role:
-                    firebase_auth.set_custom_user_claims(instance.uid, {"role": instance.role})
-
-        except Exception as e:
-            # Don't break API if Firebase sync fails, but log the error
-            print(f"⚠️ Failed to sync user {instance.uid} to Firebase: {e}")
+                    firebase_jobs.enqueue("set_claims", instance.uid, role=instance.role)
 
         return instance
 
 
 # ---------- Sites ----------
-class SiteSerializer(serializers.ModelSerializer):
-    supervisors = UserProfileSerializer(many=True, read_only=True)
+class SupervisorSummarySerializer(serializers.ModelSerializer):
+    """Compact nested supervisor: just enough for the site list."""
+    class Meta:
+        model = UserProfile
+        fields = ("id", "full_name")
+
+
+class SiteSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    supervisors = SupervisorSummarySerializer(many=True, read_only=True)
     supervisor_ids = serializers.PrimaryKeyRelatedField(
         many=True,
         queryset=UserProfile.objects.filter(role="supervisor"),
@@ -53,13 +60,18 @@ class SiteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Site
+        list_serializer_class = ValuesListSerializer
         fields = '__all__'
 
 
 # ---------- Shifts ----------
-class WorkShiftSerializer(serializers.ModelSerializer):
+class WorkShiftSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     site_name = serializers.SerializerMethodField()
     assigned_user_name = serializers.SerializerMethodField()
+    values_methods = {
+        "site_name": (("site__name",), lambda name: "Unassigned" if name is None else name),
+        "assigned_user_name": (("assigned_user__full_name",), lambda name: "Unassigned" if name is None else name),
+    }
 
     # Accept nullable IDs for updates; frontend may send strings so coerce below
     site = serializers.PrimaryKeyRelatedField(
@@ -75,6 +87,7 @@ class WorkShiftSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WorkShift
+        list_serializer_class = ValuesListSerializer
         fields = [
             'id',
             'site',             # expose site ID (nullable)
@@ -83,7 +96,16 @@ class WorkShiftSerializer(serializers.ModelSerializer):
             'assigned_user_name',
             'start',
             'end',
+            'template',         # source template for generated shifts (nullable)
         ]
+        read_only_fields = ('template',)
+
+    def validate(self, attrs):
+        start = attrs.get("start", getattr(self.instance, "start", None))
+        end = attrs.get("end", getattr(self.instance, "end", None))
+        if start and end and end <= start:
+            raise serializers.ValidationError({"end": "Shift must end after it starts."})
+        return attrs
 
     def get_site_name(self, obj):
         # Return friendly name for UI even if null
@@ -108,16 +130,61 @@ class WorkShiftSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
+# ---------- Shift Templates ----------
+class ShiftTemplateSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
+    site_name = serializers.CharField(source="site.name", read_only=True)
+    assigned_user = serializers.PrimaryKeyRelatedField(
+        queryset=UserProfile.objects.filter(role="guard"),
+        allow_null=True,
+        required=False
+    )
+
+    class Meta:
+        model = ShiftTemplate
+        list_serializer_class = ValuesListSerializer
+        fields = '__all__'
+
+    def validate_weekdays(self, value):
+        if not value or any(c not in "0123456" for c in value) or len(set(value)) != len(value):
+            raise serializers.ValidationError("Use unique weekday digits 0 (Mon) to 6 (Sun), e.g. '01234'.")
+        return "".join(sorted(value))
+
+
+class RosterGenerateSerializer(serializers.Serializer):
+    MAX_DAYS = 92
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    templates = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=ShiftTemplate.objects.all(),
+        required=False
+    )
+    site = serializers.PrimaryKeyRelatedField(queryset=Site.objects.all(), required=False)
+
+    def validate(self, attrs):
+        days = (attrs["end_date"] - attrs["start_date"]).days
+        if days < 0:
+            raise serializers.ValidationError("end_date must be on or after start_date.")
+        if days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"Generate at most {self.MAX_DAYS} days at a time.")
+        return attrs
+
+
 # ---------- Attendance ----------
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     shift_info = serializers.SerializerMethodField()
     shift_start = serializers.DateTimeField(source="shift.start", read_only=True)
     shift_end = serializers.DateTimeField(source="shift.end", read_only=True)
     user_name = serializers.CharField(source="user.full_name", read_only=True)
     site_name = serializers.CharField(source="shift.site.name", read_only=True)
+    values_methods = {
+        "shift_info": (("shift__start", "shift__end"), lambda start, end: f"{start} → {end}"),
+    }
 
     class Meta:
         model = AttendanceRecord
+        list_serializer_class = ValuesListSerializer
         fields = '__all__'
         read_only_fields = (
             "user",
@@ -134,13 +201,14 @@ class AttendanceSerializer(serializers.ModelSerializer):
 
 
 # ---------- Incidents ----------
-class IncidentSerializer(serializers.ModelSerializer):
+class IncidentSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     site_name = serializers.CharField(source="shift.site.name", read_only=True)
     user_name = serializers.CharField(source="user.full_name", read_only=True)
     shift_id = serializers.IntegerField(source="shift.id", read_only=True)
 
     class Meta:
         model = IncidentReport
+        list_serializer_class = ValuesListSerializer
         fields = '__all__'
         read_only_fields = ("user", "created_at")  # status is editable
 
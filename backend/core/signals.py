@@ -1,34 +1,207 @@
 # core/signals.py
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.db import connections, transaction
 from django.dispatch import receiver
-from .models import WorkShift, IncidentReport
+from .models import Site, WorkShift, AttendanceRecord, IncidentReport, UserProfile
+from . import site_scope, token_cache
+from .events import publish_change
+from .sync import NextChangeSeq, next_change_seq, record_departures, record_scope_resets, record_tombstone
+from .timesheets import bucket_for, refresh_buckets
+
+logger = logging.getLogger(__name__)
+
+TRACKED_MODELS = (Site, UserProfile, WorkShift, AttendanceRecord, IncidentReport)
+
+
+def _shift_site_id(shift_id):
+    return WorkShift.objects.filter(pk=shift_id).values_list("site_id", flat=True).first()
+
+
+def _site_id_for(instance):
+    """Site of an attendance/incident row, without a query when the shift is loaded"""
+    if type(instance).shift.is_cached(instance):
+        return instance.shift.site_id
+    return _shift_site_id(instance.shift_id)
+
+
+# ---------- Change tracking (delta sync) ----------
+def stamp_change_seq(sender, instance, raw=False, using=None, **kwargs):
+    """Give every saved row a fresh position in the global change sequence"""
+    if raw:
+        return
+    if connections[using].vendor == "postgresql":
+        # Drawn by the INSERT/UPDATE itself, so its lease covers the write even in autocommit
+        instance.change_seq = NextChangeSeq()
+    else:
+        instance.change_seq = next_change_seq()
+
+
+def load_change_seq(sender, instance, raw=False, using=None, **kwargs):
+    """Replace the NextChangeSeq expression with the value it drew (for pushes and responses)"""
+    if isinstance(instance.change_seq, NextChangeSeq):
+        instance.change_seq = (
+            sender._base_manager.using(using).filter(pk=instance.pk).values_list("change_seq", flat=True).get()
+        )
+
+
+for _model in TRACKED_MODELS:
+    pre_save.connect(stamp_change_seq, sender=_model, dispatch_uid=f"stamp_change_seq_{_model.__name__}")
+    # Connected before the push receivers below, which read the value
+    post_save.connect(load_change_seq, sender=_model, dispatch_uid=f"load_change_seq_{_model.__name__}")
+
+
+@receiver(pre_delete, sender=Site)
+def site_deleting(sender, instance, **kwargs):
+    """Shifts are SET_NULL without save(), so bump them explicitly"""
+    seq = next_change_seq()
+    WorkShift.objects.filter(site=instance).update(change_seq=seq)
+    # Supervisor links are cascaded without m2m_changed: the site's rows just left their scope
+    supervisor_ids = set(instance.supervisors.values_list("id", flat=True))
+    record_scope_resets(supervisor_ids, seq)
+    site_scope.invalidate(supervisor_ids)
+    transaction.on_commit(lambda: site_scope.invalidate(supervisor_ids))
+
+
+@receiver(pre_save, sender=WorkShift)
+def shift_saving(sender, instance, raw=False, **kwargs):
+    """Remember who could see the shift before this save (see shift_left_scope)"""
+    instance._previous_scope = None
+    if not raw and not instance._state.adding:
+        instance._previous_scope = (
+            WorkShift.objects.filter(pk=instance.pk).values_list("site_id", "assigned_user_id").first()
+        )
+
 
+def shift_left_scope(shift, old_site_id, old_user_id):
+    """
+    The shift moved to another site or guard: tombstone it for the old
+    scope, and carry its attendance and incidents over to the new site.
+    """
+    with transaction.atomic():
+        seq = next_change_seq()
+        if old_user_id and old_user_id != shift.assigned_user_id:
+            record_departures("workshift", [shift.pk], seq, user_id=old_user_id)
+        if old_site_id and old_site_id != shift.site_id:
+            record_departures("workshift", [shift.pk], seq, site_id=old_site_id)
+            for model in (AttendanceRecord, IncidentReport):
+                ids = list(model.objects.filter(shift=shift).values_list("pk", flat=True))
+                model.objects.filter(pk__in=ids).update(change_seq=seq)
+                record_departures(model._meta.model_name, ids, seq, site_id=old_site_id)
+            # Timesheet buckets are per site, so the shift's hours move too
+            records = AttendanceRecord.objects.filter(shift=shift).values_list("user_id", "check_in_time")
+            refresh_buckets([
+                bucket_for(user_id, site_id, check_in)
+                for user_id, check_in in records for site_id in (old_site_id, shift.site_id)
+            ])
+
+
+@receiver(pre_delete, sender=UserProfile)
+def profile_deleting(sender, instance, **kwargs):
+    WorkShift.objects.filter(assigned_user=instance).update(change_seq=next_change_seq())
+
+
+@receiver(post_delete, sender=Site)
+def site_deleted(sender, instance, **kwargs):
+    record_tombstone(instance, site_id=instance.id)
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    record_tombstone(instance, user_id=instance.id)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def attendance_deleted(sender, instance, **kwargs):
+    site_id = _site_id_for(instance)
+    seq = record_tombstone(instance, site_id=site_id, user_id=instance.user_id)
+    publish_change("attendance", "deleted", instance.id, site_id, instance.user_id, seq)
+    refresh_buckets([bucket_for(instance.user_id, site_id, instance.check_in_time)])
+
+
+@receiver(post_delete, sender=IncidentReport)
+def incident_deleted(sender, instance, **kwargs):
+    site_id = _site_id_for(instance)
+    seq = record_tombstone(instance, site_id=site_id, user_id=instance.user_id)
+    publish_change("incident", "deleted", instance.id, site_id, instance.user_id, seq)
+
+
+@receiver(m2m_changed, sender=UserProfile.supervisor_sites.through)
+def supervisor_sites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Site <-> supervisor links are shown on both sides, so bump both"""
+    if action == "pre_clear" and reverse:
+        # post_clear doesn't say which supervisors lost the site
+        instance._cleared_supervisor_ids = set(instance.supervisors.values_list("id", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        if action == "post_clear":
+            pk_set = getattr(instance, "_cleared_supervisor_ids", set())
+        profile_ids, site_ids = pk_set or set(), {instance.pk}
+    else:
+        profile_ids, site_ids = {instance.pk}, pk_set or set()
+
+    site_scope.invalidate(profile_ids)
+    # Also after commit, in case another request re-cached the old scope meanwhile
+    transaction.on_commit(lambda: site_scope.invalidate(profile_ids))
+
+    seq = next_change_seq()
+    UserProfile.objects.filter(pk__in=profile_ids).update(change_seq=seq)
+    Site.objects.filter(pk__in=site_ids).update(change_seq=seq)
+    # Rows of the added/removed sites appear or vanish without changing themselves
+    record_scope_resets(profile_ids, seq)
+
+
+# ---------- Real-time push (sent after commit, see core.events) ----------
 @receiver(post_save, sender=WorkShift)
 def shift_updated(sender, instance, created, **kwargs):
-    """Handle shift creation and updates - No WebSocket"""
-    try:
-        if created:
-            print(f"✅ Shift created: {instance.id}")
-        else:
-            print(f"✅ Shift updated: {instance.id}")
-    except Exception as e:
-        print(f"⚠️ Shift update signal error: {e}")
+    """Handle shift creation and updates"""
+    previous = getattr(instance, "_previous_scope", None)
+    if previous == (instance.site_id, instance.assigned_user_id):
+        previous = None
+    if previous:
+        shift_left_scope(instance, *previous)
+    publish_change(
+        "shift", "created" if created else "updated", instance.id,
+        instance.site_id, instance.assigned_user_id, instance.change_seq, previous=previous,
+    )
+    logger.debug("Shift %s", "created" if created else "updated", extra={"shift": instance.id})
 
 @receiver(post_delete, sender=WorkShift)
 def shift_deleted(sender, instance, **kwargs):
-    """Handle shift deletion - No WebSocket"""
-    try:
-        print(f"✅ Shift deleted: {instance.id}")
-    except Exception as e:
-        print(f"⚠️ Shift deletion signal error: {e}")
+    """Handle shift deletion"""
+    seq = record_tombstone(instance, site_id=instance.site_id, user_id=instance.assigned_user_id)
+    publish_change("shift", "deleted", instance.id, instance.site_id, instance.assigned_user_id, seq)
+    logger.debug("Shift deleted", extra={"shift": instance.id})
 
 @receiver(post_save, sender=IncidentReport)
 def incident_updated(sender, instance, created, **kwargs):
-    """Handle incident creation and updates - No WebSocket"""
-    try:
-        if created:
-            print(f"✅ Incident created: {instance.id}")
-        else:
-            print(f"✅ Incident updated: {instance.id}")
-    except Exception as e:
-        print(f"⚠️ Incident update signal error: {e}")
+    """Handle incident creation and updates"""
+    publish_change(
+        "incident", "created" if created else "updated", instance.id,
+        _site_id_for(instance), instance.user_id, instance.change_seq,
+    )
+    logger.debug("Incident %s", "created" if created else "updated", extra={"incident": instance.id})
+
+@receiver(post_save, sender=AttendanceRecord)
+def attendance_updated(sender, instance, created, **kwargs):
+    """Check-ins, check-outs and status changes"""
+    site_id = _site_id_for(instance)
+    publish_change(
+        "attendance", "created" if created else "updated", instance.id,
+        site_id, instance.user_id, instance.change_seq,
+    )
+    # Closed or classified records move the timesheet rollup
+    if instance.check_out_time or instance.status != "pending":
+        refresh_buckets([bucket_for(instance.user_id, site_id, instance.check_in_time)])
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    """Drop cached auth entries so role/profile edits apply on the next request, in every worker"""
+    uid = instance.uid
+    token_cache.invalidate_uid(uid)
+    # Again after commit, in case another worker re-cached the old row meanwhile
+    transaction.on_commit(lambda: token_cache.invalidate_uid(uid))
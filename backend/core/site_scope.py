@@ -0,0 +1,60 @@
+# core/site_scope.py
+import threading
+import time
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+
+# Supervisor -> site-id list, resolved once and reused by every role-scoped
+# queryset. Two tiers: a short-lived per-process cache in front of the shared
+# Django cache. As in core.token_cache, each local entry remembers the user's
+# version stamp from the shared cache, and invalidate() (called on
+# m2m_changed of supervisor_sites, see core.signals) bumps it, so a local
+# copy in any process is only served while the stamp still matches.
+LOCAL_TTL = getattr(settings, "SITE_SCOPE_LOCAL_TTL", 30)
+SHARED_TTL = getattr(settings, "SITE_SCOPE_SHARED_TTL", 3600)
+# Outlives every local entry cached before a bump, so an expired stamp can't match an old entry again
+VERSION_TTL = LOCAL_TTL + 60
+
+_local = TTLCache(maxsize=4096, ttl=LOCAL_TTL)
+_lock = threading.Lock()
+
+
+def _cache_key(user_id):
+    return f"core:supervisor_sites:{user_id}"
+
+
+def _version_key(user_id):
+    return f"core:supervisor_sites_version:{user_id}"
+
+
+def supervisor_site_ids(user):
+    """Sorted list of site ids the supervisor manages (a literal for `site_id__in`)."""
+    # Read before loading, so an invalidate() meanwhile leaves the new entry stale
+    version = cache.get(_version_key(user.pk), 0)
+    with _lock:
+        entry = _local.get(user.pk)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    key = _cache_key(user.pk)
+    site_ids = cache.get(key)
+    if site_ids is None:
+        site_ids = sorted(user.supervisor_sites.values_list("id", flat=True))
+        cache.set(key, site_ids, SHARED_TTL)
+
+    with _lock:
+        _local[user.pk] = (version, site_ids)
+    return site_ids
+
+
+def invalidate(user_ids):
+    """Drop the users' scopes here now, and in other processes on their next read."""
+    user_ids = list(user_ids)
+    stamp = time.time_ns()
+    cache.set_many({_version_key(user_id): stamp for user_id in user_ids}, VERSION_TTL)
+    with _lock:
+        for user_id in user_ids:
+            _local.pop(user_id, None)
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,184 @@
+# core/sync.py
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, F, Func
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import ChangeCounter, Tombstone
+from .site_scope import supervisor_site_ids
+
+SYNC_TOKEN_HEADER = "X-Sync-Token"
+# Tombstone.model of the "scope changed" markers written by record_scope_resets()
+SCOPE_RESET = "scope"
+
+
+# ---------- Change sequence ----------
+# Lowest lease held by another open transaction; see core_next_change_seq() in migration 0012.
+# Leases are bigint advisory locks (objsubid = 1), whose key is split over classid/objid.
+_OLDEST_LEASE_SQL = """
+    SELECT min((classid::bigint << 32) | objid::bigint) FROM pg_locks
+    WHERE locktype = 'advisory' AND objsubid = 1 AND pid <> pg_backend_pid()
+      AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+"""
+
+
+class NextChangeSeq(Func):
+    """Draws the next change marker inside the statement that writes the row (Postgres)."""
+    function = "core_next_change_seq"
+    output_field = BigIntegerField()
+
+
+def next_change_seq():
+    """
+    Reserve the next value of the global change sequence.
+
+    Every write to a tracked model stamps `change_seq` with this value
+    (see core.signals), so "everything changed after N" is an index range
+    scan. Bulk writes that bypass save() should stamp one value for the
+    whole batch, and draw it inside the transaction that writes the rows:
+    on Postgres the draw leases the value until that transaction ends.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT core_next_change_seq()")
+            return cursor.fetchone()[0]
+
+    with transaction.atomic():
+        updated = ChangeCounter.objects.filter(pk=1).update(value=F("value") + 1)
+        if not updated:
+            ChangeCounter.objects.create(pk=1, value=1)
+        return ChangeCounter.objects.values_list("value", flat=True).get(pk=1)
+
+
+def current_change_seq():
+    """
+    Highest change marker below which every write has settled (used as the
+    next sync token).
+
+    Transactions commit in any order, so the last value handed out is not
+    safe: a row stamped N may still be uncommitted when N + 1 is visible.
+    On Postgres the token is capped below the oldest lease still held by an
+    open transaction. (SQLite, used for development, has a single writer.)
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            # Sequence first, then leases: a value drawn before this read is either settled or leased
+            cursor.execute("SELECT last_value, is_called FROM core_change_seq")
+            last_value, is_called = cursor.fetchone()
+            cursor.execute(_OLDEST_LEASE_SQL)
+            oldest_lease = cursor.fetchone()[0]
+        issued = last_value if is_called else 0
+        return issued if oldest_lease is None else min(issued, oldest_lease - 1)
+
+    return ChangeCounter.objects.filter(pk=1).values_list("value", flat=True).first() or 0
+
+
+def record_departures(model_name, object_ids, seq, site_id=None, user_id=None):
+    """
+    Tombstones for rows that left the scope of `site_id` / `user_id` without
+    being deleted (a shift moved to another site or guard). Callers that can
+    still see the row never get these; see DeltaSyncMixin.
+    """
+    Tombstone.objects.bulk_create([
+        Tombstone(model=model_name, object_id=pk, change_seq=seq, site_id=site_id, user_id=user_id)
+        for pk in object_ids
+    ])
+
+
+def record_scope_resets(user_ids, seq):
+    """Make these users' next delta poll a full reload (their set of sites changed)."""
+    Tombstone.objects.bulk_create([
+        Tombstone(model=SCOPE_RESET, object_id=user_id, change_seq=seq, user_id=user_id)
+        for user_id in user_ids
+    ])
+
+
+def record_tombstone(instance, site_id=None, user_id=None):
+    seq = next_change_seq()
+    Tombstone.objects.create(
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        change_seq=seq,
+        site_id=site_id,
+        user_id=user_id,
+    )
+    return seq
+
+
+# ---------- Viewset support ----------
+class DeltaSyncMixin:
+    """
+    Adds `?since=<token>` to a viewset's list action.
+
+    Without `since` the list behaves as before and the response carries the
+    current token in the X-Sync-Token header. With `since`, only rows whose
+    change_seq moved past the token are returned, together with the ids
+    deleted (or moved out of the caller's scope) in the same window and a
+    fresh token:
+
+        {"since": 1234, "reset": false, "changes": [...], "deleted": [ids]}
+
+    `reset` is true when `changes` is the caller's whole list rather than a
+    delta (since=0, or a supervisor whose sites changed); the client should
+    then drop anything it holds that is not in it.
+
+    Set `tombstone_scoped = True` on viewsets whose get_queryset() is scoped
+    by role so deletions are filtered the same way.
+    """
+    tombstone_scoped = False
+
+    def list(self, request, *args, **kwargs):
+        since = request.query_params.get("since")
+        # Read the token before the rows so nothing committed in between is skipped
+        token = self.sync_token = current_change_seq()
+        if since is None:
+            response = super().list(request, *args, **kwargs)
+            response[SYNC_TOKEN_HEADER] = str(token)
+            return response
+
+        try:
+            since = int(since)
+        except ValueError:
+            raise ValidationError({"since": "Must be an integer sync token."})
+
+        visible = self.filter_queryset(self.get_queryset())
+        queryset = visible.filter(change_seq__lte=token)
+        reset = since <= 0 or self.scope_changed(since, token)
+        deleted = []
+        if not reset:
+            queryset = queryset.filter(change_seq__gt=since)
+            gone = set(
+                self.scope_tombstones(
+                    Tombstone.objects.filter(
+                        model=queryset.model._meta.model_name,
+                        change_seq__gt=since,
+                        change_seq__lte=token,
+                    )
+                ).values_list("object_id", flat=True)
+            )
+            if gone:
+                # Rows that only left someone else's scope (or came back) are still visible here
+                gone -= set(visible.filter(pk__in=gone).values_list("pk", flat=True))
+            deleted = sorted(gone)
+
+        serializer = self.get_serializer(queryset, many=True)
+        response = Response({"since": token, "reset": reset, "changes": serializer.data, "deleted": deleted})
+        response[SYNC_TOKEN_HEADER] = str(token)
+        return response
+
+    def scope_changed(self, since, token):
+        """Whether the caller's site set changed in (since, token]."""
+        user = self.request.user
+        if not self.tombstone_scoped or user.role != "supervisor":
+            return False
+        return Tombstone.objects.filter(
+            model=SCOPE_RESET, user_id=user.id, change_seq__gt=since, change_seq__lte=token,
+        ).exists()
+
+    def scope_tombstones(self, tombstones):
+        user = self.request.user
+        if not self.tombstone_scoped or user.role == "admin":
+            return tombstones
+        if user.role == "supervisor":
+            return tombstones.filter(site_id__in=supervisor_site_ids(user))
+        return tombstones.filter(user_id=user.id)
@@ -1,3 +1,869 @@
-from django.test import TestCase
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from cachetools import TTLCache
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from core import token_cache
+from core.fieldsets import SparseFieldsMixin
+from core.firebase_client import get_client
+from core import attendance_sync, classifier, consumers, firebase_jobs, geofence, roster, site_scope, timesheets
+from core.attendance import close_open_record
+from core.routing import websocket_urlpatterns
+from core.models import (
+    AttendanceRecord, DailyAttendanceRollup, FirebaseJob, IncidentReport, JobCheckpoint, ShiftTemplate, Site, UserProfile,
+    WorkShift,
+)
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+
+    def test_profile_edit_invalidates_entries_held_by_other_workers(self):
+        profile = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        key, exp = token_cache.token_key("id-token"), time.time() + 600
+        version = token_cache.profile_version(profile.uid)
+        token_cache.set_profile(key, profile, exp, version)
+        self.assertEqual(token_cache.get_profile(key), profile)
+
+        profile.role = "supervisor"
+        profile.save()
+        # Another process still holds the entry it cached before the edit
+        token_cache.set_profile(key, profile, exp, version)
+        self.assertIsNone(token_cache.get_profile(key))
+
+
+class SiteScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supervisor = UserProfile.objects.create(uid="sup", email="sup@example.com", full_name="Sup",
+                                                     role="supervisor")
+        self.depot, self.harbour = Site.objects.create(name="Depot"), Site.objects.create(name="Harbour")
+        self.supervisor.supervisor_sites.add(self.depot, self.harbour)
+
+    def test_revoked_site_leaves_other_workers_local_caches(self):
+        other_worker = TTLCache(maxsize=16, ttl=site_scope.LOCAL_TTL)
+        both = sorted([self.depot.pk, self.harbour.pk])
+        with mock.patch.object(site_scope, "_local", other_worker):
+            self.assertEqual(site_scope.supervisor_site_ids(self.supervisor), both)
+        self.assertEqual(site_scope.supervisor_site_ids(self.supervisor), both)
+
+        # Revoked in this process; the other one still holds its local copy
+        self.supervisor.supervisor_sites.remove(self.harbour)
+        self.assertIn(self.supervisor.pk, other_worker)
+        with mock.patch.object(site_scope, "_local", other_worker):
+            self.assertEqual(site_scope.supervisor_site_ids(self.supervisor), [self.depot.pk])
+
+
+@override_settings(FIREBASE_CLIENT="core.firebase_client.FakeFirebaseClient")
+class UserImportTests(TestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.firebase = get_client()
+        self.firebase.users.clear()
+
+    def test_imports_rows_and_reports_each(self):
+        users = [{"full_name": f"Guard {i}", "email": f"guard{i}@example.com", "role": "guard"} for i in range(3)]
+        response = self.client.post("/api/users/import/", users, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual([r["row"] for r in response.data["results"]], [1, 2, 3])
+        self.assertEqual(UserProfile.objects.filter(role="guard").count(), 3)
+        self.assertEqual(
+            {u["claims"]["role"] for u in self.firebase.users.values()}, {"guard"}
+        )
+
+    def test_invalid_rows_abort_the_import(self):
+        users = [
+            {"full_name": "Ok", "email": "ok@example.com", "role": "guard"},
+            {"full_name": "Dup", "email": "ADMIN@example.com", "role": "guard"},
+            {"full_name": "Bad", "email": "not-an-email", "role": "pilot"},
+        ]
+        response = self.client.post("/api/users/import/", users, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["row"] for r in response.data["results"]], [2, 3])
+        self.assertFalse(UserProfile.objects.filter(email="ok@example.com").exists())
+        self.assertEqual(self.firebase.users, {})
+
+
+@override_settings(FIREBASE_CLIENT="core.firebase_client.FakeFirebaseClient")
+class FirebaseOutboxTests(TestCase):
+    def setUp(self):
+        self.firebase = get_client()
+        self.firebase.users.clear()
+
+    def make_due(self):
+        FirebaseJob.objects.filter(status="pending").update(available_at=now())
+
+    def test_new_user_job_holds_no_password(self):
+        admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.post("/api/users/", {"full_name": "Guard", "email": "guard@example.com", "role": "guard",
+                                               "password": "s3cret-pass"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        job = FirebaseJob.objects.get()
+        self.assertNotIn("password", job.payload)
+        self.assertNotIn("s3cret-pass", str(job.payload))
+        self.assertEqual(firebase_jobs.run_batch()["done"], 1)
+        self.assertEqual(self.firebase.users[job.uid]["claims"], {"role": "guard"})
+
+    def test_failed_account_creation_is_visible_to_admins(self):
+        admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        client = APIClient()
+        client.force_authenticate(admin)
+        guard = {"full_name": "Guard", "email": "guard@example.com", "role": "guard"}
+        response = client.post("/api/users/", {**guard, "password": "12345"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserProfile.objects.filter(email="guard@example.com").exists())
+
+        # Taken in Firebase by an account this database doesn't know about
+        self.firebase.users["stray"] = {"uid": "stray", "email": "guard@example.com", "display_name": None, "claims": {}}
+        response = client.post("/api/users/", guard, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["firebase_error"], "")
+        since = client.get("/api/users/?since=0").data["since"]
+
+        self.assertEqual(firebase_jobs.run_batch()["failed"], 1)
+        delta = client.get(f"/api/users/?since={since}").data
+        self.assertEqual([row["email"] for row in delta["changes"]], ["guard@example.com"])
+        self.assertIn("EmailAlreadyExistsError", delta["changes"][0]["firebase_error"])
+
+        # Stray account removed and the job requeued: success clears the error
+        del self.firebase.users["stray"]
+        FirebaseJob.objects.filter(status="failed").delete()
+        firebase_jobs.enqueue("create_user", response.data["uid"], email="guard@example.com", role="guard")
+        self.assertEqual(firebase_jobs.run_batch()["done"], 1)
+        self.assertEqual(UserProfile.objects.get(pk=response.data["id"]).firebase_error, "")
+
+    def test_jobs_for_a_uid_wait_for_earlier_ones_across_batches(self):
+        firebase_jobs.enqueue("create_user", "u1", email="u1@example.com", role="guard")
+        firebase_jobs.enqueue("set_claims", "u1", role="supervisor")
+        firebase_jobs.enqueue("create_user", "u2", email="u2@example.com")
+
+        with mock.patch.object(self.firebase, "create_user", side_effect=[RuntimeError("unavailable"), None]):
+            stats = firebase_jobs.run_batch()
+        self.assertEqual((stats["retried"], stats["done"]), (1, 1))
+
+        # Backing off: neither the failed job nor the one queued behind it is due
+        self.assertEqual(sum(firebase_jobs.run_batch().values()), 0)
+        self.make_due()
+        self.assertEqual(firebase_jobs.run_batch()["done"], 1)
+        self.assertEqual(self.firebase.users["u1"]["claims"], {"role": "guard"})
+        self.assertEqual(firebase_jobs.run_batch()["done"], 1)
+        self.assertEqual(self.firebase.users["u1"]["claims"], {"role": "supervisor"})
+        self.assertFalse(FirebaseJob.objects.exists())
+
+    def test_claimed_jobs_are_hidden_from_other_workers_during_the_call(self):
+        firebase_jobs.enqueue("create_user", "u1", email="u1@example.com")
+
+        def create_user(**kwargs):
+            # What a second worker would see mid-call
+            self.assertEqual(sum(firebase_jobs.run_batch().values()), 0)
+
+        with mock.patch.object(self.firebase, "create_user", side_effect=create_user):
+            self.assertEqual(firebase_jobs.run_batch()["done"], 1)
+
+    def test_permanent_errors_fail_the_job_and_drop_credentials(self):
+        firebase_jobs.enqueue("update_user", "missing", display_name="Ghost")
+        firebase_jobs.enqueue("create_user", "u1", email="u1@example.com",
+                              **{"password_hash": "aGFzaA==", "password_salt": "c2FsdA==", "password_rounds": 1})
+        self.firebase.users["taken"] = {"uid": "taken", "email": "u1@example.com", "display_name": None, "claims": {}}
+
+        self.assertEqual(firebase_jobs.run_batch()["failed"], 2)
+        failed = FirebaseJob.objects.get(uid="u1")
+        self.assertEqual(failed.status, "failed")
+        self.assertEqual(failed.payload, {"email": "u1@example.com"})
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        site = Site.objects.create(name="Depot", latitude="51.500000", longitude="-0.120000")
+        start = now().replace(microsecond=0)
+        for day in range(3):
+            shift = WorkShift.objects.create(site=site, assigned_user=guard, start=start + timedelta(days=day),
+                                             end=start + timedelta(days=day, hours=8))
+            AttendanceRecord.objects.create(shift=shift, user=guard, check_in_time=shift.start,
+                                            check_in_lat="51.500100", check_in_lng="-0.120100")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_values_fast_path_matches_model_serialization(self):
+        for path in ("/api/attendance/", "/api/attendance/?page_size=2", "/api/shifts/", "/api/users/"):
+            fast = self.client.get(path)
+            with mock.patch.object(SparseFieldsMixin, "values_plan", lambda self: None):
+                slow = self.client.get(path)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, slow.content, path)
+
+    def test_fields_param_trims_fields_and_rejects_unknown_ones(self):
+        response = self.client.get("/api/attendance/?fields=id,site_name")
+        self.assertEqual([set(row) for row in response.data], [{"id", "site_name"}] * 3)
+
+        response = self.client.get("/api/attendance/?fields=id,nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("nope", response.data["fields"])
+
+
+class ContentNegotiationTests(TestCase):
+    def setUp(self):
+        admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        Site.objects.create(name="Depot", latitude="51.500000", longitude="-0.120000")
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_msgpack_and_json_carry_the_same_data(self):
+        as_json = self.client.get("/api/sites/", HTTP_ACCEPT="application/json")
+        as_msgpack = self.client.get("/api/sites/", HTTP_ACCEPT="application/msgpack")
+
+        self.assertEqual(as_json["Content-Type"], "application/json")
+        self.assertEqual(as_msgpack["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(as_msgpack.content), as_json.json())
+        # A cached JSON body must not be revalidated as a MessagePack one
+        self.assertNotEqual(as_json["ETag"], as_msgpack["ETag"])
+
+    def test_msgpack_request_bodies_are_parsed(self):
+        response = self.client.post("/api/sites/", msgpack.packb({"name": "Harbour"}),
+                                    content_type="application/msgpack", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content)["name"], "Harbour")
+
+
+class SiteQueryBudgetTests(TestCase):
+    # Sync token, ETag version (sites, tombstones, supervisors), sites, prefetched supervisors, plus
+    # the profile lookup real token auth adds (force_authenticate skips it)
+    BUDGET = 7
+
+    def setUp(self):
+        self.admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_sites(self, count):
+        for _ in range(count):
+            n = Site.objects.count()
+            site = Site.objects.create(name=f"Site {n}")
+            for i in range(2):
+                site.supervisors.add(UserProfile.objects.create(
+                    uid=f"sup-{n}-{i}", email=f"sup{n}.{i}@example.com", full_name=f"Sup {n}.{i}", role="supervisor",
+                ))
+
+    def list_sites(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/sites/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_site_list_runs_a_constant_number_of_queries(self):
+        self.add_sites(2)
+        _, few = self.list_sites()
+        self.add_sites(20)
+        response, many = self.list_sites()
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, self.BUDGET)
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(set(response.data[0]["supervisors"][0]), {"id", "full_name"})
+
+
+class AttendanceSyncTests(TestCase):
+    def setUp(self):
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        site = Site.objects.create(name="Depot")
+        self.start = now().replace(microsecond=0) - timedelta(hours=10)
+        self.shift = WorkShift.objects.create(site=site, assigned_user=self.guard, start=self.start,
+                                              end=self.start + timedelta(hours=8))
+        self.client = APIClient()
+        self.client.force_authenticate(self.guard)
+
+    def event(self, kind, minutes, shift=None):
+        return {"id": str(uuid.uuid4()), "type": kind, "shift": shift or self.shift.pk,
+                "timestamp": (self.start + timedelta(minutes=minutes)).isoformat()}
+
+    def sync(self, events):
+        response = self.client.post("/api/attendance/sync/", {"events": events}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [(r["status"], r.get("error")) for r in response.data["results"]]
+
+    def test_applies_queued_events_in_time_order_and_is_idempotent(self):
+        check_out, check_in = self.event("check_out", 480), self.event("check_in", 2)
+        self.assertEqual(self.sync([check_out, check_in]), [("applied", None), ("applied", None)])
+
+        record = AttendanceRecord.objects.get()
+        self.assertEqual(record.check_in_time, self.start + timedelta(minutes=2))
+        self.assertEqual(record.check_out_time, self.start + timedelta(minutes=480))
+
+        self.assertEqual(self.sync([check_in, check_out]), [("duplicate", None)] * 2)
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_rejects_events_that_do_not_apply(self):
+        results = self.sync([
+            self.event("check_out", 5),
+            self.event("check_in", 10, shift=999999),
+            {"id": "not-a-uuid", "type": "check_in", "shift": self.shift.pk, "timestamp": "soon"},
+        ])
+        self.assertEqual([status for status, _ in results], ["rejected"] * 3)
+        self.assertEqual(results[0][1], "No open check-in record found")
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_late_synced_check_in_replaces_the_absence(self):
+        classifier.classify()
+        absent = AttendanceRecord.objects.get(status="absent")
+
+        self.assertEqual(self.sync([self.event("check_in", 3), self.event("check_out", 470)]), [("applied", None)] * 2)
+        record = AttendanceRecord.objects.get()
+        self.assertNotEqual(record.pk, absent.pk)
+        self.assertEqual(
+            list(DailyAttendanceRollup.objects.values_list("worked_seconds", "absent_count")), [(467 * 60, 0)]
+        )
+
+    def test_retries_a_colliding_batch_a_bounded_number_of_times(self):
+        apply_batch, calls = attendance_sync._apply_batch, []
+
+        def collide_once(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise IntegrityError("concurrent replay")
+            return apply_batch(*args)
+
+        with mock.patch.object(attendance_sync, "_apply_batch", side_effect=collide_once):
+            self.assertEqual(self.sync([self.event("check_in", 2)]), [("applied", None)])
+
+        with mock.patch.object(attendance_sync, "_apply_batch", side_effect=IntegrityError("always")) as always:
+            results = self.sync([self.event("check_out", 400)])
+        self.assertEqual(always.call_count, attendance_sync.MAX_PASSES)
+        self.assertEqual(results, [("rejected", "Conflicting sync in progress; retry.")])
+
+class CheckInOutTests(TransactionTestCase):
+    # TransactionTestCase: the duplicate check-in is refused by the database constraint
+    def setUp(self):
+        cache.clear()
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        self.shift = WorkShift.objects.create(site=Site.objects.create(name="Depot"), assigned_user=self.guard,
+                                              start=now(), end=now() + timedelta(hours=8))
+        patcher = mock.patch("core.auth.aauthenticate_id_token", mock.AsyncMock(return_value=self.guard))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, action, key=None):
+        headers = {"Authorization": "Bearer token"}
+        if key:
+            headers["Idempotency-Key"] = key
+        return self.client.post(f"/api/attendance/{action}/", {"shift": self.shift.pk},
+                                content_type="application/json", headers=headers)
+
+    def test_idempotency_key_replays_the_first_response(self):
+        first, retry = self.post("check_in", key="tap-1"), self.post("check_in", key="tap-1")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_one_open_record_and_single_check_out(self):
+        self.assertEqual(self.post("check_in").status_code, 200)
+        self.assertEqual(self.post("check_in").status_code, 409)
+
+        response = self.post("check_out")
+        self.assertEqual(response.status_code, 200)
+        record = AttendanceRecord.objects.get()
+        self.assertIsNotNone(record.check_out_time)
+        self.assertEqual(response.json()["id"], record.pk)
+        self.assertGreater(record.change_seq, 0)
+        self.assertEqual(self.post("check_out").status_code, 400)
+
+    async def test_async_check_in_and_check_out(self):
+        client = AsyncClient()
+
+        async def post(action, shift):
+            return await client.post(f"/api/attendance/{action}/", {"shift": shift},
+                                     content_type="application/json", headers={"Authorization": "Bearer token"})
+
+        self.assertEqual((await post("check_in", 999999)).status_code, 400)
+        first = await post("check_in", self.shift.pk)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((await post("check_in", self.shift.pk)).status_code, 409)
+        response = await post("check_out", self.shift.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], first.json()["id"])
+        self.assertEqual((await post("check_out", self.shift.pk)).status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        shift = WorkShift.objects.create(site=Site.objects.create(name="Depot"), assigned_user=guard,
+                                         start=now(), end=now() + timedelta(hours=8))
+        self.records = [AttendanceRecord.objects.create(shift=shift, user=guard, check_in_time=now(),
+                                                        check_out_time=now()) for _ in range(3)]
+
+    def test_streams_csv_and_ndjson(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get("/api/attendance/export/")
+        self.assertFalse(response.is_async)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "shift_id", "shift__site__name"])
+        self.assertEqual(len(lines), 4)
+
+        response = client.get("/api/attendance/export/", {"output": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 3)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        with mock.patch("core.auth.authenticate_id_token", return_value=self.admin):
+            response = await AsyncClient().get("/api/attendance/export/", {"output": "ndjson"},
+                                               headers={"Authorization": "Bearer token"})
+            self.assertTrue(response.is_async)
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        ids = sorted(int(line.split(b",")[0].removeprefix(b'{"id":')) for line in body.splitlines())
+        self.assertEqual(ids, [record.pk for record in self.records])
+
+
+class TimesheetRollupTests(TestCase):
+    def setUp(self):
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        self.site = Site.objects.create(name="Depot")
+        self.start = now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        self.shift = WorkShift.objects.create(site=self.site, assigned_user=self.guard, start=self.start,
+                                              end=self.start + timedelta(hours=8))
+
+    def rollups(self):
+        return list(DailyAttendanceRollup.objects.order_by("site_id").values_list(
+            "site_id", "worked_seconds", "records", "late_count", "absent_count"))
+
+    def test_rollup_follows_record_changes(self):
+        record = AttendanceRecord.objects.create(shift=self.shift, user=self.guard, check_in_time=self.start)
+        self.assertEqual(self.rollups(), [])  # open records are not counted yet
+
+        close_open_record(self.shift, self.guard, self.start + timedelta(hours=8), None)
+        self.assertEqual(self.rollups(), [(self.site.pk, 8 * 3600, 1, 0, 0)])
+
+        record.refresh_from_db()
+        record.status = "late"
+        record.save()
+        self.assertEqual(self.rollups(), [(self.site.pk, 8 * 3600, 1, 1, 0)])
+
+        record.delete()
+        self.assertEqual(self.rollups(), [])
+
+    def test_rollup_moves_with_the_shift_and_matches_a_rebuild(self):
+        AttendanceRecord.objects.create(shift=self.shift, user=self.guard, check_in_time=self.start,
+                                        check_out_time=self.start + timedelta(hours=4))
+        other_site = Site.objects.create(name="Harbour")
+        self.shift.site = other_site
+        self.shift.save()
+        incremental = self.rollups()
+        self.assertEqual(incremental, [(other_site.pk, 4 * 3600, 1, 0, 0)])
+
+        self.assertEqual(timesheets.rebuild(), 1)
+        self.assertEqual(self.rollups(), incremental)
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        self.supervisor = UserProfile.objects.create(uid="sup", email="sup@example.com", full_name="Sup",
+                                                     role="supervisor")
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        self.other = UserProfile.objects.create(uid="other", email="other@example.com", full_name="Other", role="guard")
+        self.depot, self.harbour = Site.objects.create(name="Depot"), Site.objects.create(name="Harbour")
+        self.depot.supervisors.add(self.supervisor)
+        self.past = now() - timedelta(days=1)
+
+        # Depot: guard misses one shift outright and one the classifier marked absent, works one, is on duty now
+        self.shift(self.depot, self.guard)
+        absent = self.shift(self.depot, self.guard)
+        AttendanceRecord.objects.create(shift=absent, user=self.guard, check_in_time=absent.start,
+                                        check_out_time=absent.start, status="absent")
+        worked = self.shift(self.depot, self.guard)
+        AttendanceRecord.objects.create(shift=worked, user=self.guard, check_in_time=worked.start,
+                                        check_out_time=worked.end)
+        self.on_duty(self.depot, self.guard)
+        # The other guard misses one shift at each site and is on duty at the harbour
+        self.shift(self.depot, self.other)
+        self.shift(self.harbour, self.other)
+        self.on_duty(self.harbour, self.other)
+
+    def shift(self, site, guard, start=None):
+        start = start or self.past
+        return WorkShift.objects.create(site=site, assigned_user=guard, start=start, end=start + timedelta(hours=8))
+
+    def on_duty(self, site, guard):
+        shift = self.shift(site, guard, start=now() - timedelta(hours=1))
+        AttendanceRecord.objects.create(shift=shift, user=guard, check_in_time=shift.start)
+        IncidentReport.objects.create(shift=shift, user=guard, severity="low", description="Gate left open")
+
+    def summary(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get("/api/dashboard/summary/")
+        self.assertEqual(response.status_code, 200)
+        return {key: response.data[key] for key in
+                ("today_incidents", "pending_reviews", "active_shifts", "on_duty", "missed_shifts")}
+
+    def counts(self, incidents, active, missed):
+        return {"today_incidents": incidents, "pending_reviews": incidents, "active_shifts": active,
+                "on_duty": active, "missed_shifts": missed}
+
+    def test_counts_are_scoped_by_role(self):
+        self.assertEqual(self.summary(self.admin), self.counts(2, 2, 4))
+        self.assertEqual(self.summary(self.supervisor), self.counts(1, 1, 3))
+        self.assertEqual(self.summary(self.guard), self.counts(1, 1, 2))
+        self.assertEqual(self.summary(self.other), self.counts(1, 1, 2))
+
+    def test_runs_a_fixed_number_of_queries(self):
+        # Four counts, plus the supervisor's site ids on a cold cache
+        for user in (self.admin, self.supervisor, self.guard):
+            with self.subTest(role=user.role):
+                site_scope.invalidate([user.pk])
+                with CaptureQueriesContext(connection) as few:
+                    self.summary(user)
+                for _ in range(5):
+                    self.shift(self.depot, self.guard)
+                    self.on_duty(self.depot, self.guard)
+                site_scope.invalidate([user.pk])
+                with CaptureQueriesContext(connection) as many:
+                    self.summary(user)
+                self.assertEqual(len(few), len(many))
+                self.assertLessEqual(len(many), 5)
+
+
+class ClassifierTests(TestCase):
+    def setUp(self):
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        self.site = Site.objects.create(name="Depot")
+        self.day = now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=10)
+
+    def shift(self, days):
+        start = self.day + timedelta(days=days)
+        return WorkShift.objects.create(site=self.site, assigned_user=self.guard, start=start,
+                                        end=start + timedelta(hours=8))
+
+    def test_marks_late_check_ins_and_missed_shifts(self):
+        on_time, late_shift, missed = self.shift(0), self.shift(1), self.shift(2)
+        WorkShift.objects.create(site=self.site, start=self.day, end=self.day + timedelta(hours=8))  # unassigned
+        for shift, delay in ((on_time, 5), (late_shift, 30)):
+            AttendanceRecord.objects.create(shift=shift, user=self.guard,
+                                            check_in_time=shift.start + timedelta(minutes=delay))
+
+        self.assertEqual(classifier.classify(), (1, 1))
+        statuses = dict(AttendanceRecord.objects.values_list("shift_id", "status"))
+        self.assertEqual(statuses, {on_time.pk: "pending", late_shift.pk: "late", missed.pk: "absent"})
+        self.assertEqual(
+            sorted(DailyAttendanceRollup.objects.values_list("late_count", "absent_count")), [(0, 1), (1, 0)]
+        )
+        self.assertEqual(classifier.classify(), (0, 0))
+
+        # Reassigned after it ended: the new guard was absent too
+        other = UserProfile.objects.create(uid="other", email="other@example.com", full_name="Other", role="guard")
+        late_shift.assigned_user = other
+        late_shift.save()
+        self.assertEqual(classifier.classify(), (0, 1))
+        self.assertTrue(AttendanceRecord.objects.filter(shift=late_shift, user=other, status="absent").exists())
+
+    def test_works_in_chunks_and_resumes_after_a_failure(self):
+        missed = [self.shift(day) for day in range(5)]
+        refresh = classifier._refresh_rollups
+        calls = []
+
+        def fail_second_chunk(rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError("interrupted")
+            refresh(rows)
+
+        with mock.patch.object(classifier, "BATCH_SIZE", 2):
+            with mock.patch.object(classifier, "_refresh_rollups", side_effect=fail_second_chunk):
+                with self.assertRaises(RuntimeError):
+                    classifier.classify()
+            # The first chunk and its watermark were kept
+            self.assertEqual(AttendanceRecord.objects.count(), 2)
+            checkpoint = JobCheckpoint.objects.get(name=classifier.CHECKPOINT)
+            self.assertEqual(checkpoint.ran_at, missed[1].end)
+
+            self.assertEqual(classifier.classify(), (0, 3))
+        self.assertEqual(
+            sorted(AttendanceRecord.objects.values_list("shift_id", flat=True)), [shift.pk for shift in missed]
+        )
+
+
+class ShiftOverlapTests(TestCase):
+    def setUp(self):
+        admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        self.site = Site.objects.create(name="Depot")
+        self.other_site = Site.objects.create(name="Harbour")
+        self.start = now().replace(microsecond=0) + timedelta(days=1)
+        self.booked = WorkShift.objects.create(site=self.site, assigned_user=self.guard, start=self.start,
+                                               end=self.start + timedelta(hours=8))
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def book(self, site, hours_from_start, hours):
+        start = self.start + timedelta(hours=hours_from_start)
+        return self.client.post("/api/shifts/", {
+            "site": site.pk, "assigned_user": self.guard.pk,
+            "start": start.isoformat(), "end": (start + timedelta(hours=hours)).isoformat(),
+        }, format="json")
+
+    def test_adjacent_shifts_are_allowed(self):
+        self.assertEqual(self.book(self.site, 8, 8).status_code, 201)
+        self.assertEqual(self.book(self.site, -4, 4).status_code, 201)
+
+    def test_double_booking_is_rejected_on_any_site(self):
+        for site in (self.site, self.other_site):
+            response = self.book(site, 6, 8)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(f"shift #{self.booked.pk}", str(response.data["assigned_user"]))
+        self.assertEqual(WorkShift.objects.count(), 1)
+
+    def test_conflicts_report_lists_overlapping_pairs(self):
+        # Written around the API check, as imported or legacy rows could be
+        clash = WorkShift.objects.create(site=self.other_site, assigned_user=self.guard,
+                                         start=self.start + timedelta(hours=6), end=self.start + timedelta(hours=12))
+        WorkShift.objects.create(site=self.site, assigned_user=self.guard,
+                                 start=self.start + timedelta(hours=12), end=self.start + timedelta(hours=16))
+
+        response = self.client.get("/api/shifts/conflicts/", {"start": (self.start - timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+        pair = response.data["conflicts"][0]
+        self.assertEqual((pair["shift"], pair["other_shift"]), (self.booked.pk, clash.pk))
+        self.assertEqual((pair["overlap_start"], pair["overlap_end"]), (clash.start, self.booked.end))
+
+    def test_generate_counts_only_rows_it_inserted(self):
+        template = ShiftTemplate.objects.create(site=self.site, weekdays="0123456", assigned_user=self.guard,
+                                                start_time=self.start.time(), end_time=self.start.time())
+        day = self.start.date() + timedelta(days=7)
+        batch = roster.shifts_overlapping_batch
+
+        def concurrent_run(shifts):
+            # Another run inserts the first occurrence after our existence check
+            first = shifts[0]
+            WorkShift.objects.create(site=self.site, template=template, start=first.start, end=first.end)
+            return batch(shifts)
+
+        with mock.patch("core.roster.shifts_overlapping_batch", side_effect=concurrent_run):
+            created, skipped, unassigned = roster.generate_shifts([template], day, day + timedelta(days=1))
+        self.assertEqual((created, skipped, unassigned), (1, 1, 0))
+        self.assertEqual(WorkShift.objects.filter(template=template).count(), 2)
+
+
+class GeofenceTests(TestCase):
+    # ~55 m and ~330 m north of the site; the fence is 100 m plus GEOFENCE_TOLERANCE_M
+    NEAR, FAR = (51.5005, -0.12), (51.503, -0.12)
+
+    def setUp(self):
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        self.site = Site.objects.create(name="Depot", latitude="51.500000", longitude="-0.120000",
+                                        geofence_radius_m=100)
+        self.shift = WorkShift.objects.create(site=self.site, assigned_user=self.guard, start=now(),
+                                              end=now() + timedelta(hours=8))
+        patcher = mock.patch("core.auth.aauthenticate_id_token", mock.AsyncMock(return_value=self.guard))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check_in(self, point=None):
+        lat, lng = point or ("", "")
+        return self.client.post("/api/attendance/check_in/", {"shift": self.shift.pk, "lat": lat, "lng": lng},
+                                content_type="application/json", headers={"Authorization": "Bearer token"})
+
+    def test_fence_violation(self):
+        self.assertIsNone(geofence.fence_violation(self.site, self.NEAR))
+        self.assertEqual(geofence.fence_violation(self.site, None), {"error": "Location is required at this site"})
+        violation = geofence.fence_violation(self.site, self.FAR)
+        self.assertEqual(violation["radius_m"], 100)
+        self.assertAlmostEqual(violation["distance_m"], 334, delta=2)
+        # Sites without coordinates are not fenced
+        self.assertIsNone(geofence.fence_violation(Site(name="Mobile"), None))
+
+    def test_check_in_outside_the_fence_is_rejected(self):
+        response = self.check_in(self.FAR)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "You are outside the site geofence")
+        self.assertEqual(self.check_in().status_code, 400)
+        self.assertEqual(self.check_in(("91", "0")).json()["error"], "Invalid coordinates")
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+        self.assertEqual(self.check_in(self.NEAR).status_code, 200)
+        record = AttendanceRecord.objects.get()
+        self.assertEqual((float(record.check_in_lat), float(record.check_in_lng)), self.NEAR)
+
+    def test_audit_flags_records_outside_the_fence(self):
+        AttendanceRecord.objects.create(shift=self.shift, user=self.guard, check_in_time=now(),
+                                        check_in_lat=self.NEAR[0], check_in_lng=self.NEAR[1], check_out_time=now())
+        outside = AttendanceRecord.objects.create(shift=self.shift, user=self.guard, check_in_time=now(),
+                                                  check_in_lat=self.NEAR[0], check_in_lng=self.NEAR[1],
+                                                  check_out_time=now(),
+                                                  check_out_lat=self.FAR[0], check_out_lng=self.FAR[1])
+        AttendanceRecord.objects.create(shift=self.shift, user=self.guard, check_in_time=now(), check_out_time=now())
+
+        summary = geofence.audit(AttendanceRecord.objects.all(), chunk_size=2)
+        self.assertEqual((summary["checked"], summary["outside"], summary["missing_location"]), (3, 1, 1))
+        self.assertEqual([r["id"] for r in summary["results"]], [outside.pk])
+        self.assertEqual(summary["results"][0]["check_in_distance_m"], 56)
+
+
+class PushSocketTests(TestCase):
+    def setUp(self):
+        self.guard = UserProfile.objects.create(uid="guard", email="guard@example.com", full_name="Guard", role="guard")
+        patcher = mock.patch("core.auth.aauthenticate_id_token", mock.AsyncMock(return_value=self.guard))
+        self.authenticate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open(self, path="/ws/guard/"):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_authenticates_with_the_first_message(self):
+        communicator = await self.open()
+        await communicator.send_json_to({"type": "auth", "token": "id-token"})
+        self.assertEqual(await communicator.receive_json_from(), {"type": "ready"})
+        self.authenticate.assert_awaited_once_with("id-token")
+
+        event = {"type": "changes", "changes": []}
+        await get_channel_layer().group_send(f"guard_{self.guard.pk}", {"type": "broadcast_event", "event": event})
+        self.assertEqual(await communicator.receive_json_from(), event)
+        await communicator.disconnect()
+
+    async def test_closes_without_a_valid_auth_message(self):
+        communicator = await self.open("/ws/guard/?token=id-token")  # ignored: tokens never go in the URL
+        await communicator.send_json_to({"type": "subscribe"})
+        self.assertEqual(await communicator.receive_output(), {"type": "websocket.close", "code": 4401})
+
+        communicator = await self.open("/ws/admin/")
+        await communicator.send_json_to({"type": "auth", "token": "id-token"})
+        self.assertEqual(await communicator.receive_output(), {"type": "websocket.close", "code": 4403})
+
+        with mock.patch.object(consumers, "AUTH_TIMEOUT", 0):
+            communicator = await self.open()
+            self.assertEqual(await communicator.receive_output(), {"type": "websocket.close", "code": 4401})
+        self.authenticate.assert_awaited_once()
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_walk_through_equal_sort_keys(self):
+        admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        site = Site.objects.create(name="Depot")
+        start = now().replace(microsecond=0)
+        same_start = [WorkShift.objects.create(site=site, start=start, end=start + timedelta(hours=8)).pk
+                      for _ in range(5)]
+        earlier = WorkShift.objects.create(site=site, start=start - timedelta(days=1), end=start).pk
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        seen, url = [], "/api/shifts/?page_size=2"
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, sorted(same_start, reverse=True) + [earlier])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        admin = UserProfile.objects.create(uid="admin", email="admin@example.com", full_name="Admin", role="admin")
+        site = Site.objects.create(name="Depot")
+        self.shifts = [WorkShift.objects.create(site=site, start=now(), end=now() + timedelta(hours=8))
+                       for _ in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_matching_etag_is_304_until_a_row_is_deleted(self):
+        etag = self.client.get("/api/shifts/")["ETag"]
+        response = self.client.get("/api/shifts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # The oldest row: neither the max change_seq of the rows nor any count of them is needed
+        self.shifts[0].delete()
+        response = self.client.get("/api/shifts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_no_etag_while_a_write_below_the_version_may_be_in_flight(self):
+        with mock.patch("core.sync.current_change_seq", return_value=self.shifts[0].change_seq):
+            response = self.client.get("/api/shifts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.site = Site.objects.create(name="Depot")
+        self.other_site = Site.objects.create(name="Harbour")
+        self.guard = UserProfile.objects.create(uid="a", email="a@example.com", full_name="A", role="guard")
+        self.other_guard = UserProfile.objects.create(uid="b", email="b@example.com", full_name="B", role="guard")
+        self.supervisor = UserProfile.objects.create(uid="s", email="s@example.com", full_name="S", role="supervisor")
+        self.supervisor.supervisor_sites.add(self.site)
+        start = now().replace(microsecond=0)
+        self.kept, self.moved, self.removed = [
+            WorkShift.objects.create(site=self.site, assigned_user=self.guard,
+                                     start=start + timedelta(days=day), end=start + timedelta(days=day, hours=8))
+            for day in range(3)
+        ]
+
+    def poll(self, user, since):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(f"/api/shifts/?since={since}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_deleted_and_reassigned_rows_come_back_as_tombstones(self):
+        token = self.poll(self.guard, 0)["since"]
+        self.kept.save()
+        self.moved.assigned_user = self.other_guard
+        self.moved.save()
+        removed_id = self.removed.pk
+        self.removed.delete()
+
+        delta = self.poll(self.guard, token)
+        self.assertFalse(delta["reset"])
+        self.assertEqual([row["id"] for row in delta["changes"]], [self.kept.pk])
+        self.assertEqual(delta["deleted"], sorted([self.moved.pk, removed_id]))
+        # The new guard gets the shift as a change, not as a deletion
+        delta = self.poll(self.other_guard, token)
+        self.assertEqual([row["id"] for row in delta["changes"]], [self.moved.pk])
+        self.assertEqual(delta["deleted"], [])
+
+    def test_shift_moved_to_another_site_leaves_the_old_supervisor(self):
+        token = self.poll(self.supervisor, 0)["since"]
+        self.moved.site = self.other_site
+        self.moved.save()
+        self.assertEqual(self.poll(self.supervisor, token)["deleted"], [self.moved.pk])
+
+    def test_supervisor_site_change_forces_a_full_reload(self):
+        token = self.poll(self.supervisor, 0)["since"]
+        extra = WorkShift.objects.create(site=self.other_site, start=now(), end=now() + timedelta(hours=8))
+        WorkShift.objects.filter(pk=extra.pk).update(change_seq=0)  # an old row, unchanged since
+        self.supervisor.supervisor_sites.add(self.other_site)
+
+        delta = self.poll(self.supervisor, token)
+        self.assertTrue(delta["reset"])
+        self.assertIn(extra.pk, [row["id"] for row in delta["changes"]])
+        self.assertEqual(len(delta["changes"]), 4)
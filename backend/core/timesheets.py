@@ -0,0 +1,113 @@
+# core/timesheets.py
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils.timezone import localdate, make_aware
+
+from .models import AttendanceRecord, DailyAttendanceRollup
+
+
+def bucket_for(user_id, site_id, check_in_time):
+    """(guard, site, local date) rollup key of an attendance record."""
+    return (user_id, site_id, localdate(check_in_time))
+
+
+def _day_bounds(day):
+    start = make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def summarize(rows):
+    """Fold (check_in, check_out, status) rows into rollup counters."""
+    totals = {"worked_seconds": 0, "records": 0, "late_count": 0, "absent_count": 0}
+    for check_in, check_out, status in rows:
+        totals["records"] += 1
+        if status == "absent":
+            totals["absent_count"] += 1
+            continue
+        if status == "late":
+            totals["late_count"] += 1
+        if check_out is not None and check_out > check_in:
+            totals["worked_seconds"] += int((check_out - check_in).total_seconds())
+    return totals
+
+
+def refresh_buckets(keys):
+    """
+    Recompute the given (guard, site, date) rollups from their source rows.
+
+    A bucket holds one guard's records for one site and day, usually one or
+    two rows, so this stays cheap. Because it re-reads the source, it is
+    idempotent and also picks up status changes and deletions.
+    """
+    for user_id, site_id, day in set(keys):
+        if user_id is None:
+            continue
+        day_start, day_end = _day_bounds(day)
+        rows = list(
+            AttendanceRecord.objects
+            .filter(user_id=user_id, shift__site_id=site_id,
+                    check_in_time__gte=day_start, check_in_time__lt=day_end)
+            .values_list("check_in_time", "check_out_time", "status")
+        )
+        with transaction.atomic():
+            if not rows:
+                DailyAttendanceRollup.objects.filter(guard_id=user_id, site_id=site_id, date=day).delete()
+                continue
+            DailyAttendanceRollup.objects.update_or_create(
+                guard_id=user_id, site_id=site_id, date=day, defaults=summarize(rows),
+            )
+
+
+def rebuild(start_date=None, end_date=None, chunk_size=5000):
+    """
+    Rebuild every rollup in [start_date, end_date] (inclusive; open-ended
+    when omitted) from AttendanceRecord in one streaming pass.
+
+    Records are read in (guard, check-in) order, so each guard-day is
+    complete before the next one starts and only one day of buckets is held
+    in memory at a time. Returns the number of rollup rows written.
+    """
+    records = AttendanceRecord.objects.all()
+    rollups = DailyAttendanceRollup.objects.all()
+    if start_date:
+        records = records.filter(check_in_time__gte=_day_bounds(start_date)[0])
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        records = records.filter(check_in_time__lt=_day_bounds(end_date)[1])
+        rollups = rollups.filter(date__lte=end_date)
+
+    rows = (
+        records.order_by("user_id", "check_in_time")
+        .values_list("user_id", "shift__site_id", "check_in_time", "check_out_time", "status")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    def generate():
+        current_day, buckets = None, {}
+        for user_id, site_id, check_in, check_out, status in rows:
+            key = bucket_for(user_id, site_id, check_in)
+            if key[::2] != current_day:
+                yield from _rollups(buckets)
+                current_day, buckets = key[::2], {}
+            buckets.setdefault(key, []).append((check_in, check_out, status))
+        yield from _rollups(buckets)
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for rollup in generate():
+            batch.append(rollup)
+            if len(batch) >= chunk_size:
+                DailyAttendanceRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyAttendanceRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def _rollups(buckets):
+    for (user_id, site_id, day), source in buckets.items():
+        yield DailyAttendanceRollup(guard_id=user_id, site_id=site_id, date=day, **summarize(source))
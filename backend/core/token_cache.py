@@ -0,0 +1,121 @@
+# core/token_cache.py
+import hashlib
+import threading
+import time
+
+from cachetools import TLRUCache
+from django.conf import settings
+from django.core.cache import cache
+
+# Bounded, per-process cache of verified Firebase ID tokens -> UserProfile.
+# Kept separate from core.auth so signal handlers can invalidate entries
+# without initializing the Firebase Admin SDK.
+#
+# Each entry remembers the uid's version stamp from the shared Django cache
+# at the time the profile was loaded. invalidate_uid() bumps the stamp, so
+# a hit in any worker process is only served while the stamp still matches
+# (one shared-cache GET instead of a signature check and a profile query).
+TOKEN_CACHE_SIZE = getattr(settings, "FIREBASE_TOKEN_CACHE_SIZE", 1024)
+TOKEN_CACHE_TTL = getattr(settings, "FIREBASE_TOKEN_CACHE_TTL", 300)
+# Outlives every entry cached before a bump, so an expired stamp can't match an old entry again
+VERSION_TTL = TOKEN_CACHE_TTL + 60
+
+
+def _time_to_use(key, value, now):
+    # Never serve a token past its own `exp`, and re-verify at least every TTL
+    _, exp, _ = value
+    return min(exp, now + TOKEN_CACHE_TTL)
+
+
+_cache = TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=_time_to_use, timer=time.time)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+
+def token_key(id_token):
+    """Hash the raw token so bearer credentials are never held as cache keys."""
+    return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+
+def _version_key(uid):
+    return f"core:profile_version:{uid}"
+
+
+def profile_version(uid):
+    """Current version stamp of a uid; read it before loading the profile."""
+    return cache.get(_version_key(uid), 0)
+
+
+async def aprofile_version(uid):
+    return await cache.aget(_version_key(uid), 0)
+
+
+def _local_entry(key):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+        return entry
+
+
+def _checked(key, entry, version):
+    """The entry's profile if its stamp is still current, else drop it."""
+    profile, _, cached_version = entry
+    with _lock:
+        if version != cached_version:
+            _cache.pop(key, None)
+            _stats["stale"] += 1
+            return None
+        _stats["hits"] += 1
+    return profile
+
+
+def get_profile(key):
+    """Return the cached UserProfile for a token hash, or None on a miss."""
+    entry = _local_entry(key)
+    if entry is None:
+        return None
+    return _checked(key, entry, profile_version(entry[0].uid))
+
+
+async def aget_profile(key):
+    """get_profile for async callers: the stamp check doesn't block the event loop."""
+    entry = _local_entry(key)
+    if entry is None:
+        return None
+    return _checked(key, entry, await aprofile_version(entry[0].uid))
+
+
+def set_profile(key, profile, exp, version):
+    if exp is None or exp <= time.time():
+        return
+    with _lock:
+        _cache[key] = (profile, exp, version)
+
+
+def invalidate_uid(uid):
+    """
+    Invalidate every cached token belonging to a Firebase UID (e.g. after a
+    role change) in this process now, and in other processes on their next hit.
+    """
+    cache.set(_version_key(uid), time.time_ns(), VERSION_TTL)
+    with _lock:
+        stale = [k for k, (profile, _, _) in _cache.items() if profile.uid == uid]
+        for k in stale:
+            _cache.pop(k, None)
+        _stats["invalidations"] += len(stale)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"] + _stats["stale"]
+        return {
+            **_stats,
+            "size": len(_cache),
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -3,21 +3,32 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     SiteViewSet,
+    ShiftTemplateViewSet,
     WorkShiftViewSet,
     AttendanceViewSet,
     IncidentViewSet,
     UserProfileViewSet,   # NEW
-    whoami,
+    auth_cache_stats,
+    dashboard_summary,
+    timesheets,
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register('sites', SiteViewSet)
 router.register('shifts', WorkShiftViewSet)
+router.register('shift-templates', ShiftTemplateViewSet)
 router.register('attendance', AttendanceViewSet, basename='attendance')
 router.register('incidents', IncidentViewSet)
 router.register('users', UserProfileViewSet)  # NEW
 
 urlpatterns = [
-    path("whoami/", whoami, name="whoami"),
+    path("whoami/", async_views.whoami, name="whoami"),
+    # Async check-in/out, routed ahead of the router's attendance/<pk>/ detail
+    path("attendance/check_in/", async_views.check_in, name="attendance-check-in"),
+    path("attendance/check_out/", async_views.check_out, name="attendance-check-out"),
+    path("auth/cache-stats/", auth_cache_stats, name="auth-cache-stats"),
+    path("dashboard/summary/", dashboard_summary, name="dashboard-summary"),
+    path("timesheets/", timesheets, name="timesheets"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,154 @@
+# core/user_import.py
+import csv
+import io
+import json
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from . import firebase_jobs
+from .firebase_client import BULK_LIMIT, get_client
+from .models import UserProfile
+from .sync import next_change_seq
+
+MAX_ROWS = 5000
+DEFAULT_PASSWORD = "default123"  # same fallback as UserProfileViewSet.create
+
+
+class ImportRowSerializer(serializers.Serializer):
+    full_name = serializers.CharField(max_length=120)
+    email = serializers.EmailField()
+    role = serializers.ChoiceField(choices=UserProfile.ROLE_CHOICES)
+    # Firebase rejects passwords shorter than 6 characters
+    password = serializers.CharField(min_length=6, required=False, allow_blank=True)
+
+
+def parse_rows(request):
+    """
+    Rows from a multipart `file` (CSV with a header line, or a .json list)
+    or from a JSON body: either a list of users or {"users": [...]}.
+    """
+    upload = request.FILES.get("file")
+    if upload is not None:
+        try:
+            text = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValidationError({"file": "File must be UTF-8 encoded."})
+        if upload.name.lower().endswith(".json") or upload.content_type == "application/json":
+            try:
+                data = json.loads(text)
+            except ValueError:
+                raise ValidationError({"file": "Invalid JSON."})
+        else:
+            data = list(csv.DictReader(io.StringIO(text)))
+    else:
+        data = request.data
+    if isinstance(data, dict):
+        data = data.get("users")
+    if not isinstance(data, list) or not data:
+        raise ValidationError({"file": "Upload a CSV/JSON file or send a JSON list of users."})
+    if len(data) > MAX_ROWS:
+        raise ValidationError({"file": f"At most {MAX_ROWS} users per import."})
+    return data
+
+
+def validate_rows(rows):
+    """
+    Validate every row before anything is created. Returns (invalid, valid):
+    error entries for the report, and (row number, data) pairs. Row numbers
+    are 1-based and don't count the CSV header.
+    """
+    invalid, valid, seen = [], [], set()
+    for number, row in enumerate(rows, start=1):
+        serializer = ImportRowSerializer(data=row if isinstance(row, dict) else {})
+        if not serializer.is_valid():
+            invalid.append({"row": number, "status": "invalid", "errors": serializer.errors})
+            continue
+        data = serializer.validated_data
+        email = data["email"].lower()
+        if email in seen:
+            invalid.append({"row": number, "email": data["email"], "status": "invalid",
+                            "errors": {"email": ["Duplicate email in this file."]}})
+            continue
+        seen.add(email)
+        valid.append((number, data))
+
+    existing = set(
+        UserProfile.objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=seen)
+        .values_list("email_lower", flat=True)
+    )
+    if existing:
+        still_valid = []
+        for number, data in valid:
+            if data["email"].lower() in existing:
+                invalid.append({"row": number, "email": data["email"], "status": "invalid",
+                                "errors": {"email": ["A user with this email already exists."]}})
+            else:
+                still_valid.append((number, data))
+        valid = still_valid
+    invalid.sort(key=lambda entry: entry["row"])
+    return invalid, valid
+
+
+def import_rows(valid, client=None):
+    """
+    Provision validated rows in batches of 1000: one Firebase import_users()
+    call, then one bulk INSERT of the profiles Firebase accepted. Returns
+    the per-row report.
+    """
+    client = client or get_client()
+    report = []
+    for i in range(0, len(valid), BULK_LIMIT):
+        batch = [(number, data, uuid.uuid4().hex) for number, data in valid[i:i + BULK_LIMIT]]
+        users = [{
+            "uid": uid,
+            "email": data["email"],
+            "display_name": data["full_name"],
+            "password": data.get("password") or DEFAULT_PASSWORD,
+            "claims": {"role": data["role"]},
+        } for _, data, uid in batch]
+        try:
+            failures = dict(client.import_users(users))
+        except Exception as e:
+            failures = {index: f"Firebase import failed: {e}" for index in range(len(batch))}
+
+        accepted = [entry for index, entry in enumerate(batch) if index not in failures]
+        report.extend(
+            {"row": number, "email": data["email"], "status": "error", "error": str(failures[index])}
+            for index, (number, data, _) in enumerate(batch) if index in failures
+        )
+        if not accepted:
+            continue
+
+        profiles = [
+            UserProfile(uid=uid, full_name=data["full_name"], email=data["email"], role=data["role"])
+            for _, data, uid in accepted
+        ]
+        try:
+            with transaction.atomic():
+                # bulk_create skips signals, so stamp the delta-sync sequence here
+                seq = next_change_seq()
+                for profile in profiles:
+                    profile.change_seq = seq
+                UserProfile.objects.bulk_create(profiles)
+        except IntegrityError:
+            # Lost a race for one of the emails: roll the batch back everywhere
+            with transaction.atomic():
+                for _, _, uid in accepted:
+                    firebase_jobs.enqueue("delete_user", uid)
+            report.extend(
+                {"row": number, "email": data["email"], "status": "error",
+                 "error": "Email was taken while importing; retry these rows."}
+                for number, data, _ in accepted
+            )
+            continue
+        report.extend(
+            {"row": number, "email": data["email"], "status": "created", "id": profile.pk, "uid": profile.uid}
+            for (number, data, _), profile in zip(accepted, profiles)
+        )
+    report.sort(key=lambda entry: entry["row"])
+    return report
@@ -2,37 +2,156 @@ from rest_framework import status, viewsets, mixins
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils.timezone import now
-from firebase_admin import auth as firebase_auth
-
-from .models import Site, WorkShift, AttendanceRecord, IncidentReport, UserProfile
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Sum
+from django.utils.dateparse import parse_datetime, parse_date
+from django.utils.timezone import localdate, make_aware, now
+from datetime import datetime, time, timedelta
+import uuid
+
+from .models import (
+    Site, ShiftTemplate, WorkShift, AttendanceRecord, IncidentReport, UserProfile, DailyAttendanceRollup,
+)
 from .serializers import (
     SiteSerializer,
+    ShiftTemplateSerializer,
+    RosterGenerateSerializer,
     WorkShiftSerializer,
     AttendanceSerializer,
     IncidentSerializer,
     UserProfileSerializer,
 )
-from .permissions import IsAdmin, IsSupervisor, IsGuard
+from .permissions import IsAdmin, IsGuard, IsSupervisor
+from .pagination import KeysetPagination
+from .sync import DeltaSyncMixin
+from .conditional import ConditionalGetMixin
+from .fieldsets import ValuesListMixin
+from .roster import generate_shifts
+from .overlaps import ensure_no_overlap, find_overlaps
+from .exports import date_window, export_response
+from .firebase_client import hash_password
+from . import attendance_sync, firebase_jobs, geofence, token_cache, user_import
+from .site_scope import supervisor_site_ids
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def auth_cache_stats(request):
+    """Hit/miss counters for the per-process Firebase token cache."""
+    return Response(token_cache.stats())
 
 
+# ---------- Dashboard ----------
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def whoami(request):
+def dashboard_summary(request):
+    """
+    KPI counters for the portals, aggregated in the database and scoped
+    by role the same way as the list endpoints.
+    """
     user = request.user
+    current = now()
+    day_start = make_aware(datetime.combine(localdate(current), time.min))
+    day_end = day_start + timedelta(days=1)
+
+    shifts = WorkShift.objects.all()
+    attendance = AttendanceRecord.objects.all()
+    incidents = IncidentReport.objects.all()
+    if user.role == "supervisor":
+        site_ids = supervisor_site_ids(user)
+        shifts = shifts.filter(site_id__in=site_ids)
+        attendance = attendance.filter(shift__site_id__in=site_ids)
+        incidents = incidents.filter(shift__site_id__in=site_ids)
+    elif user.role != "admin":
+        shifts = shifts.filter(assigned_user=user)
+        attendance = attendance.filter(user=user)
+        incidents = incidents.filter(user=user)
+
+    incident_counts = incidents.aggregate(
+        today_incidents=Count("id", filter=Q(created_at__gte=day_start, created_at__lt=day_end)),
+        pending_reviews=Count("id", filter=Q(status="pending")),
+    )
+    shift_counts = shifts.aggregate(
+        active_shifts=Count("id", filter=Q(start__lte=current, end__gte=current)),
+    )
+    # Ended shifts that never got a check-in (replaces the client's shifts x attendance scan);
+    # "absent" rows from the classifier don't count as one
+    missed_shifts = (
+        shifts.filter(end__lt=current)
+        .filter(~Exists(AttendanceRecord.objects.filter(shift=OuterRef("pk")).exclude(status="absent")))
+        .count()
+    )
+    on_duty = attendance.filter(check_out_time__isnull=True).count()
+
     return Response({
-        "uid": user.uid,
-        "email": user.email,
-        "full_name": user.full_name,
-        "role": user.role,
+        **incident_counts,
+        **shift_counts,
+        "on_duty": on_duty,
+        "missed_shifts": missed_shifts,
+        "generated_at": current,
     })
 
 
+# ---------- Timesheets ----------
+TIMESHEET_GROUPS = {
+    "guard": ("guard_id", "guard__full_name"),
+    "site": ("site_id", "site__name"),
+    "guard_site": ("guard_id", "guard__full_name", "site_id", "site__name"),
+}
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def timesheets(request):
+    """
+    Period totals answered from DailyAttendanceRollup.
+    ?from=&to= are inclusive dates (default: month to date),
+    ?group_by=guard|site|guard_site (default guard).
+    """
+    today = localdate()
+    start = parse_date(request.query_params.get("from", "")) or today.replace(day=1)
+    end = parse_date(request.query_params.get("to", "")) or today
+    group_by = request.query_params.get("group_by", "guard")
+    if group_by not in TIMESHEET_GROUPS:
+        return Response({"error": f"group_by must be one of {', '.join(TIMESHEET_GROUPS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if end < start:
+        return Response({"error": "to must be on or after from"}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    rollups = DailyAttendanceRollup.objects.filter(date__gte=start, date__lte=end)
+    if user.role == "supervisor":
+        rollups = rollups.filter(site_id__in=supervisor_site_ids(user))
+    elif user.role != "admin":
+        rollups = rollups.filter(guard=user)
+
+    fields = TIMESHEET_GROUPS[group_by]
+    rows = (
+        rollups.values(*fields)
+        .annotate(
+            worked_seconds=Sum("worked_seconds"),
+            records=Sum("records"),
+            late=Sum("late_count"),
+            absent=Sum("absent_count"),
+            days=Count("date", distinct=True),
+        )
+        .order_by(*fields[1::2])
+    )
+    results = [
+        {**row, "worked_hours": round(row["worked_seconds"] / 3600, 2)}
+        for row in rows
+    ]
+    return Response({"from": start, "to": end, "group_by": group_by, "results": results})
+
+
 # ---------- Sites ----------
-class SiteViewSet(viewsets.ModelViewSet):
-    queryset = Site.objects.all().order_by("name")
+class SiteViewSet(DeltaSyncMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
+    queryset = Site.objects.prefetch_related(
+        Prefetch("supervisors", queryset=UserProfile.objects.only("id", "full_name"))
+    ).order_by("name")
     serializer_class = SiteSerializer
     permission_classes = [IsAuthenticated]
+    etag_dependencies = (UserProfile,)   # nested supervisors
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
@@ -55,19 +174,30 @@ class SiteViewSet(viewsets.ModelViewSet):
 
 
 # ---------- Shifts ----------
-class WorkShiftViewSet(viewsets.ModelViewSet):
+class WorkShiftViewSet(DeltaSyncMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = WorkShift.objects.select_related("site", "assigned_user").all().order_by("-start")
     serializer_class = WorkShiftSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = "-start"
+    tombstone_scoped = True
+    etag_dependencies = (Site, UserProfile)   # site_name, assigned_user_name
 
     def get_queryset(self):
         user = self.request.user
         if user.role == "admin":
-            return self.queryset
+            return self.queryset.all()  # fresh clone; the class attribute would cache its rows
         if user.role == "supervisor":
-            return self.queryset.filter(site__in=user.supervisor_sites.all())
+            return self.queryset.filter(site_id__in=supervisor_site_ids(user))
         return self.queryset.filter(assigned_user=user).order_by("-start")
 
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        assigned_user = data.get("assigned_user")
+        with transaction.atomic():
+            ensure_no_overlap(assigned_user and assigned_user.pk, data["start"], data["end"])
+            serializer.save()
+
     def perform_update(self, serializer):
         """
         Allow updates where frontend may send numeric strings or empty strings.
@@ -87,14 +217,103 @@ class WorkShiftViewSet(viewsets.ModelViewSet):
         site_id = normalize(site_val)
         assigned_user_id = normalize(assigned_user_val)
 
-        serializer.save(
-            site_id=site_id,
-            assigned_user_id=assigned_user_id
+        instance = serializer.instance
+        data = serializer.validated_data
+        with transaction.atomic():
+            ensure_no_overlap(
+                assigned_user_id,
+                data.get("start", instance.start),
+                data.get("end", instance.end),
+                exclude_pk=instance.pk,
+            )
+            serializer.save(
+                site_id=site_id,
+                assigned_user_id=assigned_user_id
+            )
+
+    @action(methods=["get"], detail=False, permission_classes=[IsAuthenticated])
+    def conflicts(self, request):
+        """
+        Overlapping shift pairs per guard within ?start=&end= (ISO date or
+        datetime; defaults to the next 30 days), found with a sweep-line pass.
+        """
+        def parse(value, default):
+            if not value:
+                return default
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                if day is None:
+                    return None
+                parsed = datetime.combine(day, time.min)
+            return parsed if parsed.tzinfo else make_aware(parsed)
+
+        window_start = parse(request.query_params.get("start"), now())
+        window_end = parse(request.query_params.get("end"), window_start + timedelta(days=30))
+        if window_start is None or window_end is None or window_end <= window_start:
+            return Response({"error": "Invalid start/end window"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = (
+            self.get_queryset()
+            .filter(assigned_user__isnull=False, end__gt=window_start, start__lt=window_end)
+            .order_by("assigned_user_id", "start")
+            .values_list("id", "assigned_user_id", "start", "end")
+        )
+        pairs = [
+            {"guard": user_id, "shift": first, "other_shift": second,
+             "overlap_start": overlap_start, "overlap_end": overlap_end}
+            for user_id, first, second, overlap_start, overlap_end in find_overlaps(rows.iterator())
+        ]
+        return Response({"start": window_start, "end": window_end, "count": len(pairs), "conflicts": pairs})
+
+
+# ---------- Shift Templates ----------
+class ShiftTemplateViewSet(ValuesListMixin, viewsets.ModelViewSet):
+    queryset = ShiftTemplate.objects.select_related("site", "assigned_user").all().order_by("site__name", "start_time")
+    serializer_class = ShiftTemplateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_permissions(self):
+        if self.action in ["create", "update", "partial_update", "destroy", "generate"]:
+            return [IsAdmin()]
+        return super().get_permissions()
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == "admin":
+            return self.queryset.all()  # fresh clone; the class attribute would cache its rows
+        if user.role == "supervisor":
+            return self.queryset.filter(site_id__in=supervisor_site_ids(user))
+        return self.queryset.filter(assigned_user=user)
+
+    @action(methods=["post"], detail=False)
+    def generate(self, request):
+        """
+        Expand active templates into shifts for start_date..end_date (inclusive).
+        Optional `templates` (ids) or `site` narrow the set.
+        """
+        params = RosterGenerateSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        templates = ShiftTemplate.objects.filter(active=True)
+        if data.get("templates"):
+            templates = templates.filter(pk__in=[t.pk for t in data["templates"]])
+        if data.get("site"):
+            templates = templates.filter(site=data["site"])
+
+        created, skipped, unassigned = generate_shifts(templates, data["start_date"], data["end_date"])
+        return Response(
+            {"created": created, "skipped": skipped, "unassigned_conflicts": unassigned},
+            status=status.HTTP_201_CREATED,
         )
 
 
 # ---------- Attendance ----------
 class AttendanceViewSet(
+    DeltaSyncMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.UpdateModelMixin,
@@ -105,59 +324,69 @@ class AttendanceViewSet(
                                      .all().order_by("-check_in_time")
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = "-check_in_time"
+    tombstone_scoped = True
+    etag_dependencies = (Site, WorkShift, UserProfile)   # shift times, site_name, user_name
 
     def get_queryset(self):
         user = self.request.user
         if user.role == "admin":
-            return self.queryset
+            return self.queryset.all()  # fresh clone; the class attribute would cache its rows
         if user.role == "supervisor":
-            return self.queryset.filter(shift__site__in=user.supervisor_sites.all())
+            return self.queryset.filter(shift__site_id__in=supervisor_site_ids(user))
         return self.queryset.filter(user=user).order_by("-check_in_time")
 
-    @action(methods=["post"], detail=False, permission_classes=[IsGuard])
-    def check_in(self, request):
-        user = request.user
-        shift_id = request.data.get("shift")
-        lat = request.data.get("lat")
-        lng = request.data.get("lng")
-        ar = AttendanceRecord.objects.create(
-            shift_id=shift_id,
-            user=user,
-            check_in_time=now(),
-            check_in_lat=lat,
-            check_in_lng=lng,
-        )
-        return Response(AttendanceSerializer(ar).data)
+    EXPORT_COLUMNS = (
+        "id", "shift_id", "shift__site__name", "shift__start", "shift__end",
+        "user_id", "user__full_name", "check_in_time", "check_out_time",
+        "check_in_lat", "check_in_lng", "check_out_lat", "check_out_lng", "status",
+    )
+
+    @action(methods=["get"], detail=False)
+    def export(self, request):
+        """Stream attendance as CSV/NDJSON (?output=, ?from=, ?to= on check-in date)."""
+        start, end = date_window(request)
+        queryset = self.get_queryset().select_related(None)
+        if start:
+            queryset = queryset.filter(check_in_time__gte=start)
+        if end:
+            queryset = queryset.filter(check_in_time__lt=end)
+        return export_response(queryset, self.EXPORT_COLUMNS, request, "attendance")
 
     @action(methods=["post"], detail=False, permission_classes=[IsGuard])
-    def check_out(self, request):
-        user = request.user
-        shift_id = request.data.get("shift")
-
-        # Grab the latest open record (no check_out_time yet)
-        ar = (
-            AttendanceRecord.objects
-            .filter(shift_id=shift_id, user=user, check_out_time__isnull=True)
-            .order_by("-check_in_time")
-            .first()
-        )
-        if not ar:
-            return Response(
-                {"error": "No open check-in record found"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        ar.check_out_time = now()
-        ar.save()
-        return Response(AttendanceSerializer(ar).data)
+    def sync(self, request):
+        """
+        Apply a batch of queued check-in/check-out events:
+        {"events": [{"id": uuid, "type": "check_in"|"check_out", "shift", "timestamp", "lat", "lng"}]}.
+        Idempotent per event id; returns one outcome per event.
+        """
+        results = attendance_sync.apply_events(request.user, attendance_sync.parse_events(request))
+        counts = {key: sum(1 for r in results if r["status"] == key) for key in ("applied", "duplicate", "rejected")}
+        return Response({**counts, "results": results})
+
+    @action(methods=["get"], detail=False, url_path="geofence-audit", permission_classes=[IsAdmin | IsSupervisor])
+    def geofence_audit(self, request):
+        """Records checked in/out outside their site's fence (?from=, ?to= on check-in date)."""
+        start, end = date_window(request)
+        queryset = self.get_queryset().select_related(None)
+        if start:
+            queryset = queryset.filter(check_in_time__gte=start)
+        if end:
+            queryset = queryset.filter(check_in_time__lt=end)
+        return Response(geofence.audit(queryset))
 
 
 # ---------- Incidents ----------
-class IncidentViewSet(viewsets.ModelViewSet):
+class IncidentViewSet(DeltaSyncMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = IncidentReport.objects.select_related("shift__site", "user")\
                                      .all().order_by("-created_at")
     serializer_class = IncidentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = "-created_at"
+    tombstone_scoped = True
+    etag_dependencies = (Site, UserProfile)   # site_name, user_name
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user, status="pending")
@@ -165,11 +394,27 @@ class IncidentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == "admin":
-            return self.queryset
+            return self.queryset.all()  # fresh clone; the class attribute would cache its rows
         if user.role == "supervisor":
-            return self.queryset.filter(shift__site__in=user.supervisor_sites.all())
+            return self.queryset.filter(shift__site_id__in=supervisor_site_ids(user))
         return self.queryset.filter(user=user).order_by("-created_at")
 
+    EXPORT_COLUMNS = (
+        "id", "created_at", "shift_id", "shift__site__name", "user_id", "user__full_name",
+        "severity", "status", "description", "attachment_url",
+    )
+
+    @action(methods=["get"], detail=False)
+    def export(self, request):
+        """Stream incidents as CSV/NDJSON (?output=, ?from=, ?to= on created date)."""
+        start, end = date_window(request)
+        queryset = self.get_queryset().select_related(None)
+        if start:
+            queryset = queryset.filter(created_at__gte=start)
+        if end:
+            queryset = queryset.filter(created_at__lt=end)
+        return export_response(queryset, self.EXPORT_COLUMNS, request, "incidents")
+
     @action(detail=True, methods=["post"], permission_classes=[IsSupervisor])
     def update_status(self, request, pk=None):
         incident = self.get_object()
@@ -182,7 +427,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
 
 
 # ---------- Users ----------
-class UserProfileViewSet(viewsets.ModelViewSet):
+class UserProfileViewSet(DeltaSyncMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = UserProfile.objects.all().order_by("full_name")
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
@@ -204,44 +449,63 @@ class UserProfileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            # create Firebase user
-            firebase_user = firebase_auth.create_user(
-                email=email,
-                password=password,
-                display_name=full_name
+        if not isinstance(password, str) or len(password) < 6:  # Firebase would reject the account later, leaving the profile orphaned
+            return Response(
+                {"error": "password must be at least 6 characters"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            firebase_auth.set_custom_user_claims(firebase_user.uid, {"role": role})
 
-            # create local profile
+        if UserProfile.objects.filter(email__iexact=email).exists():
+            return Response(
+                {"error": "A user with this email already exists"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # The uid is chosen here so the local profile exists right away; the
+        # Firebase account itself is created by the run_firebase_jobs worker,
+        # which records a permanent failure in the profile's firebase_error.
+        uid = uuid.uuid4().hex
+        with transaction.atomic():
             user_profile = UserProfile.objects.create(
-                uid=firebase_user.uid,
+                uid=uid,
                 full_name=full_name,
                 email=email,
                 role=role
             )
-            serializer = self.get_serializer(user_profile)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            firebase_jobs.enqueue(
+                "create_user", uid, email=email, display_name=full_name, role=role, **hash_password(password),
+            )
+        serializer = self.get_serializer(user_profile)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    @action(methods=["post"], detail=False, url_path="import", permission_classes=[IsAdmin])
+    def bulk_import(self, request):
+        """
+        Create many users from a CSV/JSON upload (full_name, email, role,
+        optional password). Every row is validated first; if any is invalid
+        nothing is imported. ?dry_run=1 validates only.
+        """
+        invalid, valid = user_import.validate_rows(user_import.parse_rows(request))
+        if invalid:
+            return Response(
+                {"error": f"{len(invalid)} row(s) are invalid; nothing was imported", "results": invalid},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if request.query_params.get("dry_run"):
+            return Response({"valid": len(valid)})
+
+        results = user_import.import_rows(valid)
+        created = sum(1 for entry in results if entry["status"] == "created")
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        try:
-            # also delete Firebase user (if exists)
+        with transaction.atomic():
+            # also delete the Firebase user (queued; the worker retries failures)
             if instance.uid:
-                try:
-                    firebase_auth.delete_user(instance.uid)
-                except Exception as e:
-                    # Log but don’t block DB deletion
-                    print(f"⚠️ Failed to delete Firebase user {instance.uid}: {e}")
-
+                firebase_jobs.enqueue("delete_user", instance.uid)
             self.perform_destroy(instance)
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
-        except Exception as e:
-            return Response(
-                {"error": f"Failed to delete user: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
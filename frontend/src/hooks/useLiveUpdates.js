@@ -0,0 +1,94 @@
+// src/hooks/useLiveUpdates.js
+import { useEffect, useRef } from "react";
+import { useAuth } from "../auth/AuthContext";
+
+// ws(s)://host for the API host, unless VITE_WS_URL says otherwise
+const socketBase = () =>
+  import.meta.env.VITE_WS_URL ||
+  (import.meta.env.VITE_API_URL || window.location.origin)
+    .replace(/^http/, "ws")
+    .replace(/\/api\/?$/, "");
+
+const DEBOUNCE_MS = 500; // one refresh for a burst of change events
+const MAX_RETRY_MS = 30000;
+
+/**
+ * Calls `onChange(models)` when the server pushes changes for this role
+ * (/ws/<role>/, see core.consumers). The ID token goes in the first
+ * message, never in the URL, and the socket counts as up once the server
+ * answers "ready". While it is down the hook falls back to polling every
+ * `pollMs` and keeps reconnecting with backoff; after a reconnect it
+ * refreshes once to catch up on anything it missed. `models` is the Set of
+ * model names pushed since the last call ("shift", "attendance", ...), or
+ * null for a poll or catch-up, when anything may have changed.
+ */
+export function useLiveUpdates(role, onChange, pollMs) {
+  const { token } = useAuth();
+  const callback = useRef(onChange);
+  callback.current = onChange;
+
+  useEffect(() => {
+    if (!token || !role) return undefined;
+
+    let socket = null;
+    let poll = null;
+    let retry = null;
+    let debounce = null;
+    let attempts = 0;
+    let closed = false;
+
+    let pending = new Set();
+    const refresh = (models = null) => {
+      // null (unknown) wins over any list of models in the same burst
+      pending = pending && models ? new Set([...pending, ...models]) : null;
+      clearTimeout(debounce);
+      debounce = setTimeout(() => {
+        const changed = pending;
+        pending = new Set();
+        callback.current(changed);
+      }, DEBOUNCE_MS);
+    };
+    const startPolling = () => {
+      if (!poll) poll = setInterval(() => callback.current(null), pollMs);
+    };
+    const stopPolling = () => {
+      clearInterval(poll);
+      poll = null;
+    };
+
+    const connect = () => {
+      socket = new WebSocket(`${socketBase()}/ws/${role}/`);
+      socket.onopen = () => socket.send(JSON.stringify({ type: "auth", token }));
+      socket.onmessage = (message) => {
+        let data;
+        try {
+          data = JSON.parse(message.data);
+        } catch {
+          return; // not one of ours
+        }
+        if (data.type === "ready") {
+          stopPolling();
+          if (attempts > 0) refresh(null);
+          attempts = 0;
+        } else if (data.type === "changes") {
+          refresh((data.changes || []).map((change) => change.model));
+        }
+      };
+      socket.onclose = () => {
+        if (closed) return;
+        startPolling();
+        attempts += 1;
+        retry = setTimeout(connect, Math.min(MAX_RETRY_MS, 1000 * 2 ** attempts));
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      stopPolling();
+      clearTimeout(retry);
+      clearTimeout(debounce);
+      if (socket) socket.close();
+    };
+  }, [role, token, pollMs]);
+}
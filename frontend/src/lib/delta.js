@@ -0,0 +1,21 @@
+// src/lib/delta.js
+// Client side of the `?since=` delta lists (see core.sync.DeltaSyncMixin)
+
+/**
+ * Apply a {reset, changes, deleted} delta to rows keyed by id: changed
+ * rows are replaced in place, new ones appended, deleted ones dropped.
+ * A reset delta is the whole list.
+ */
+export function mergeDelta(rows, { reset, changes = [], deleted = [] }) {
+  if (reset) return changes;
+  const updates = new Map(changes.map((row) => [row.id, row]));
+  const removed = new Set(deleted);
+  const kept = rows
+    .filter((row) => !removed.has(row.id))
+    .map((row) => {
+      const next = updates.get(row.id);
+      updates.delete(row.id);
+      return next || row;
+    });
+  return [...kept, ...updates.values()];
+}
@@ -1,13 +1,24 @@
 /* eslint-disable react-hooks/exhaustive-deps */
 // src/pages/admin/AdminDashboard.jsx
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import { useApi } from "../../api";
 import { useToast } from "../../hooks/useToast.jsx";
+import { useLiveUpdates } from "../../hooks/useLiveUpdates";
+import { mergeDelta } from "../../lib/delta";
 import Modal from "../../components/Modal";
 import "../../styles/Dash.css";
 import { useNavigate } from "react-router-dom";
 import { auth } from "../../firebase";
 
+// Pushed model -> the list it lives in
+const MODEL_RESOURCES = {
+  shift: "shifts",
+  roster: "shifts",
+  guard_roster: "shifts",
+  attendance: "attendance",
+  incident: "incidents",
+};
+
 export default function AdminDashboard() {
   const api = useApi();
   const { showToast, ToastContainer } = useToast();
@@ -62,39 +73,40 @@ export default function AdminDashboard() {
   const formatDateTime = (val) => (val ? new Date(val).toISOString() : null);
 
   // ---------- Data Fetch ----------
-  const fetchData = async () => {
+  const setters = {
+    sites: setSites,
+    shifts: setShifts,
+    users: setUsers,
+    incidents: setIncidents,
+    attendance: setAttendance,
+  };
+  // Sync token per list; 0 (the first load) returns the whole list
+  const syncTokens = useRef({});
+
+  const syncResource = async (name) => {
+    const delta = await api(`/${name}/?since=${syncTokens.current[name] ?? 0}`);
+    syncTokens.current[name] = delta.since;
+    setters[name]((prev) => mergeDelta(prev, delta));
+  };
+
+  const fetchSummary = async () => {
+    // KPIs (aggregated server-side)
+    const summaryRes = await api("/dashboard/summary/");
+    setKpis({
+      todayIncidents: summaryRes?.today_incidents ?? 0,
+      onDuty: summaryRes?.on_duty ?? 0,
+      missedShifts: summaryRes?.missed_shifts ?? 0,
+    });
+  };
+
+  // `models` comes from useLiveUpdates: only the lists named in a push are
+  // synced; null (first load, poll, reconnect) syncs every list
+  const fetchData = async (models = null) => {
+    const names = models
+      ? [...new Set([...models].map((model) => MODEL_RESOURCES[model]).filter(Boolean))]
+      : Object.keys(setters);
     try {
-      const [sitesRes, shiftsRes, usersRes, incidentsRes, attendanceRes] =
-        await Promise.all([
-          api("/sites/"),
-          api("/shifts/"),
-          api("/users/"),
-          api("/incidents/"),
-          api("/attendance/"),
-        ]);
-
-      setSites(sitesRes || []);
-      setShifts(shiftsRes || []);
-      setUsers(usersRes || []);
-      setIncidents(incidentsRes || []);
-      setAttendance(attendanceRes || []);
-
-      // KPIs
-      const now = new Date();
-      const today = now.toDateString();
-      setKpis({
-        todayIncidents: (incidentsRes || []).filter(
-          (i) => new Date(i.created_at).toDateString() === today
-        ).length,
-        onDuty: (attendanceRes || []).filter(
-          (a) => a.check_in_time && !a.check_out_time
-        ).length,
-        missedShifts: (shiftsRes || []).filter(
-          (s) =>
-            new Date(s.end) < now &&
-            !(attendanceRes || []).some((a) => a.shift === s.id)
-        ).length,
-      });
+      await Promise.all([fetchSummary(), ...names.map(syncResource)]);
     } catch (err) {
       console.error("Fetch error:", err);
       showToast("❌ Failed to load dashboard data", "error");
@@ -103,9 +115,9 @@ export default function AdminDashboard() {
 
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 15000);
-    return () => clearInterval(interval);
   }, []);
+  // Refresh on pushed changes; poll every 15s only while the socket is down
+  useLiveUpdates("admin", fetchData, 15000);
 
   // ---------- Actions (Optimistic Updates) ----------
   const createSite = async (name) => {
@@ -333,7 +345,7 @@ export default function AdminDashboard() {
         </div>
         <div className="flex items-center gap-4">
           <button
-            onClick={fetchData}
+            onClick={() => fetchData()}
             className="text-sm hover:text-white transition-colors"
           >
             Refresh
@@ -579,7 +591,17 @@ export default function AdminDashboard() {
               {users.map((u) => (
                 <tr key={u.id}>
                   <td>{u.full_name}</td>
-                  <td>{u.email}</td>
+                  <td>
+                    {u.email}
+                    {u.firebase_error && (
+                      <span
+                        className="block text-sm text-red-600"
+                        title={u.firebase_error}
+                      >
+                        ⚠ Firebase sync failed
+                      </span>
+                    )}
+                  </td>
                   <td>{u.role}</td>
                   <td>
                     <button
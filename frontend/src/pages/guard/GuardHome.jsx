@@ -6,8 +6,20 @@ import { auth } from "../../firebase";
 import { useNavigate } from "react-router-dom";
 import Modal from "../../components/Modal";
 import { useToast } from "../../hooks/useToast.jsx";
+import { useLiveUpdates } from "../../hooks/useLiveUpdates";
 import "../../styles/Dash.css";
 
+// Device position for the site geofence; {} when unavailable or denied
+const currentPosition = () =>
+  new Promise((resolve) => {
+    if (!navigator.geolocation) return resolve({});
+    navigator.geolocation.getCurrentPosition(
+      (pos) => resolve({ lat: pos.coords.latitude.toFixed(6), lng: pos.coords.longitude.toFixed(6) }),
+      () => resolve({}),
+      { enableHighAccuracy: true, timeout: 10000, maximumAge: 30000 }
+    );
+  });
+
 export default function GuardHome() {
   const api = useApi();
   const navigate = useNavigate();
@@ -67,17 +79,18 @@ export default function GuardHome() {
 
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 20000); // refresh every 20s
-    return () => clearInterval(interval);
   }, []);
+  // Refresh on pushed changes; poll every 20s only while the socket is down
+  useLiveUpdates("guard", fetchData, 20000);
 
   // ---------- Attendance ----------
   const checkIn = async (shiftId) => {
     try {
+      const position = await currentPosition();
       const res = await api("/attendance/check_in/", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ shift: shiftId }),
+        body: JSON.stringify({ shift: shiftId, ...position }),
       });
       // ✅ Replace that record in state
       setAttendance((prev) =>
@@ -96,10 +109,11 @@ export default function GuardHome() {
 
   const checkOut = async (shiftId) => {
     try {
+      const position = await currentPosition();
       const res = await api("/attendance/check_out/", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ shift: shiftId }),
+        body: JSON.stringify({ shift: shiftId, ...position }),
       });
       setAttendance((prev) =>
         prev.map((a) => (a.shift === shiftId ? res : a)).concat(
@@ -7,6 +7,7 @@ import { auth } from "../../firebase";
 import { useNavigate } from "react-router-dom";
 import Modal from "../../components/Modal";
 import { useToast } from "../../hooks/useToast.jsx";
+import { useLiveUpdates } from "../../hooks/useLiveUpdates";
 import "../../styles/Dash.css";
 
 export default function SupervisorPortal() {
@@ -92,12 +93,11 @@ export default function SupervisorPortal() {
     }
   };
 
-  // Auto-refresh every 30s
+  // Refresh on pushed changes; poll every 30s only while the socket is down
   useEffect(() => {
     fetchData();
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
   }, []);
+  useLiveUpdates("supervisor", fetchData, 30000);
 
   // ---------- KPI Calculation ----------
   useEffect(() => {